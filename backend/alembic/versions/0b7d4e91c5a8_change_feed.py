@@ -0,0 +1,46 @@
+"""change feed
+
+Revision ID: 0b7d4e91c5a8
+Revises: f2a8c6e07b13
+Create Date: 2026-02-02 11:37:04.662153
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7d4e91c5a8'
+down_revision: Union[str, None] = 'f2a8c6e07b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'user_change_versions',
+        sa.Column('pruned_change_id', sa.BigInteger(), nullable=False, server_default='0')
+    )
+    op.create_table(
+        'changes',
+        sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Uuid(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('seq', sa.BigInteger(), nullable=False),
+        sa.Column('item_type', sa.Enum('FILE', 'FOLDER', name='changeitemtype'), nullable=False),
+        sa.Column('item_id', sa.Uuid(), nullable=False),
+        sa.Column('action', sa.Enum('UPSERT', 'DELETE', name='changeaction'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_changes_user_id', 'changes', ['user_id', 'id'])
+    op.create_index('ix_changes_user_item', 'changes', ['user_id', 'item_type', 'item_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_changes_user_item', table_name='changes')
+    op.drop_index('ix_changes_user_id', table_name='changes')
+    op.drop_table('changes')
+    sa.Enum(name='changeaction').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='changeitemtype').drop(op.get_bind(), checkfirst=True)
+    op.drop_column('user_change_versions', 'pruned_change_id')
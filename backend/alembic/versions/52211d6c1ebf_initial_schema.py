@@ -19,13 +19,89 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    # Databases that predate Alembic-managed schema already have these tables,
+    # created by Base.metadata.create_all at API startup
+    if sa.inspect(op.get_bind()).has_table('users'):
+        return
+
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Uuid(), primary_key=True),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('is_active', sa.Boolean()),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table(
+        'folders',
+        sa.Column('id', sa.Uuid(), primary_key=True),
+        sa.Column('user_id', sa.Uuid(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('parent_folder_id', sa.Uuid(), sa.ForeignKey('folders.id'), nullable=True),
+        sa.Column('path', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_folders_id', 'folders', ['id'])
+    op.create_index('ix_folders_user_id', 'folders', ['user_id'])
+    op.create_index('ix_folders_parent_folder_id', 'folders', ['parent_folder_id'])
+    op.create_index('ix_folders_path', 'folders', ['path'])
+    op.create_index('ix_folder_user_parent_name', 'folders', ['user_id', 'parent_folder_id', 'name'], unique=True)
+
+    op.create_table(
+        'files',
+        sa.Column('id', sa.Uuid(), primary_key=True),
+        sa.Column('user_id', sa.Uuid(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('mime', sa.String(), nullable=True),
+        sa.Column('folder_id', sa.Uuid(), sa.ForeignKey('folders.id'), nullable=True),
+        sa.Column('storage_key', sa.String(), nullable=False),
+        sa.Column('status', sa.Enum('INITIATED', 'COMPLETED', 'DELETED', name='filestatus'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_files_id', 'files', ['id'])
+    op.create_index('ix_files_user_id', 'files', ['user_id'])
+    op.create_index('ix_files_folder_id', 'files', ['folder_id'])
+    op.create_index('ix_files_storage_key', 'files', ['storage_key'], unique=True)
+
+    op.create_table(
+        'uploads',
+        sa.Column('id', sa.Uuid(), primary_key=True),
+        sa.Column('file_id', sa.Uuid(), sa.ForeignKey('files.id'), nullable=False),
+        sa.Column('upload_id', sa.String(), nullable=False),
+        sa.Column('file_fingerprint', sa.String(), nullable=False),
+        sa.Column('chunk_size', sa.Integer(), nullable=False),
+        sa.Column('total_parts', sa.Integer(), nullable=False),
+        sa.Column('status', sa.Enum('INPROGRESS', 'COMPLETED', 'ABORTED', name='uploadstatus'), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_uploads_id', 'uploads', ['id'])
+    op.create_index('ix_uploads_file_fingerprint', 'uploads', ['file_fingerprint'])
+
+    op.create_table(
+        'upload_parts',
+        sa.Column('upload_id', sa.Uuid(), sa.ForeignKey('uploads.id'), primary_key=True),
+        sa.Column('part_number', sa.Integer(), primary_key=True),
+        sa.Column('etag', sa.String(), nullable=False),
+        sa.Column('uploaded_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.drop_table('upload_parts')
+    op.drop_table('uploads')
+    op.drop_table('files')
+    op.drop_table('folders')
+    op.drop_table('users')
+    sa.Enum(name='uploadstatus').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='filestatus').drop(op.get_bind(), checkfirst=True)
 
@@ -0,0 +1,42 @@
+"""partition files and folders by user
+
+Revision ID: 5e8b3d1f7a94
+Revises: 9c4f2a6d8e17
+Create Date: 2026-02-16 10:05:48.227613
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from core.partitioning import PARTITIONED_TABLES, create_shadow_table, drop_shadow_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8b3d1f7a94'
+down_revision: Union[str, None] = '9c4f2a6d8e17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Fixed for the life of the tables; changing it means repartitioning
+PARTITIONS = 16
+
+
+def upgrade() -> None:
+    # Only creates the empty partitioned shadows, so it is quick on any table size and
+    # adds nothing to writes. python -m jobs.partition_tables then installs the triggers
+    # that keep them in sync, copies existing rows online and swaps the tables in.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in PARTITIONED_TABLES:
+        create_shadow_table(op.get_bind(), table, PARTITIONS)
+
+
+def downgrade() -> None:
+    # Only possible before the swap; afterwards the originals live on as *_unpartitioned
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in reversed(PARTITIONED_TABLES):
+        drop_shadow_table(op.get_bind(), table)
+    op.execute("DROP FUNCTION IF EXISTS partition_sync()")
@@ -0,0 +1,46 @@
+"""file tombstone compaction
+
+Revision ID: 9c4f2a6d8e17
+Revises: 0b7d4e91c5a8
+Create Date: 2026-02-09 14:12:31.508214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4f2a6d8e17'
+down_revision: Union[str, None] = '0b7d4e91c5a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_files_tombstones', 'files', ['id', 'updated_at'],
+        postgresql_where=sa.text("status = 'DELETED'")
+    )
+    op.create_table(
+        'files_archive',
+        sa.Column('id', sa.Uuid(), primary_key=True),
+        sa.Column('user_id', sa.Uuid(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('mime', sa.String(), nullable=True),
+        sa.Column('folder_id', sa.Uuid(), nullable=True),
+        sa.Column('storage_key', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True)),
+        sa.Column('updated_at', sa.DateTime(timezone=True)),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index('ix_files_archive_user_id', 'files_archive', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_archive_user_id', table_name='files_archive')
+    op.drop_table('files_archive')
+    op.drop_index('ix_files_tombstones', table_name='files')
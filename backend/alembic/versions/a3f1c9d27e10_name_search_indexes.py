@@ -0,0 +1,49 @@
+"""name search indexes
+
+Revision ID: a3f1c9d27e10
+Revises: 52211d6c1ebf
+Create Date: 2026-01-12 10:24:41.318902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f1c9d27e10'
+down_revision: Union[str, None] = '52211d6c1ebf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_files_user_name', 'files', ['user_id', 'name', 'id'])
+    op.create_index('ix_folders_user_name', 'folders', ['user_id', 'name', 'id'])
+
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Trigram GIN indexes serve ILIKE prefix/substring patterns and the % similarity operator.
+    # Built concurrently so existing tables stay writable while the index is created.
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_files_name_trgm "
+            "ON files USING gin (name gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_folders_name_trgm "
+            "ON folders USING gin (name gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_folders_name_trgm")
+            op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_files_name_trgm")
+
+    op.drop_index('ix_folders_user_name', table_name='folders')
+    op.drop_index('ix_files_user_name', table_name='files')
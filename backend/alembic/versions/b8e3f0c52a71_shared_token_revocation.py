@@ -0,0 +1,34 @@
+"""shared token revocation
+
+Revision ID: b8e3f0c52a71
+Revises: d41b7e2a9f63
+Create Date: 2026-10-19 09:42:17.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e3f0c52a71'
+down_revision: Union[str, None] = 'd41b7e2a9f63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('tokens_revoked_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('jti', sa.String(), primary_key=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index('ix_revoked_tokens_expires_at', 'revoked_tokens', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_revoked_tokens_expires_at', table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
+    op.drop_column('users', 'tokens_revoked_at')
@@ -0,0 +1,71 @@
+"""usage counters
+
+Revision ID: c7e2b4f81d35
+Revises: a3f1c9d27e10
+Create Date: 2026-01-19 14:08:12.574210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e2b4f81d35'
+down_revision: Union[str, None] = 'a3f1c9d27e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('folders', sa.Column('files_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('folders', sa.Column('total_files', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('folders', sa.Column('total_bytes', sa.BigInteger(), nullable=False, server_default='0'))
+    op.create_table(
+        'user_usage',
+        sa.Column('user_id', sa.Uuid(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('file_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_bytes', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+
+    # Backfill from existing completed files; jobs.reconcile_usage repairs any later drift
+    op.execute("""
+        UPDATE folders SET files_count = direct.n
+        FROM (
+            SELECT folder_id, COUNT(*) AS n FROM files
+            WHERE status = 'COMPLETED' AND folder_id IS NOT NULL
+            GROUP BY folder_id
+        ) AS direct
+        WHERE folders.id = direct.folder_id
+    """)
+    op.execute("""
+        WITH RECURSIVE subtree AS (
+            SELECT id AS ancestor_id, id FROM folders
+            UNION ALL
+            SELECT subtree.ancestor_id, folders.id
+            FROM folders JOIN subtree ON folders.parent_folder_id = subtree.id
+        ),
+        totals AS (
+            SELECT subtree.ancestor_id, COUNT(files.id) AS n, COALESCE(SUM(files.size), 0) AS bytes
+            FROM subtree JOIN files ON files.folder_id = subtree.id AND files.status = 'COMPLETED'
+            GROUP BY subtree.ancestor_id
+        )
+        UPDATE folders SET total_files = totals.n, total_bytes = totals.bytes
+        FROM totals
+        WHERE folders.id = totals.ancestor_id
+    """)
+    op.execute("""
+        INSERT INTO user_usage (user_id, file_count, total_bytes)
+        SELECT user_id, COUNT(*), COALESCE(SUM(size), 0) FROM files
+        WHERE status = 'COMPLETED'
+        GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_usage')
+    op.drop_column('folders', 'total_bytes')
+    op.drop_column('folders', 'total_files')
+    op.drop_column('folders', 'files_count')
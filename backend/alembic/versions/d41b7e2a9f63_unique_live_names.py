@@ -0,0 +1,130 @@
+"""unique live names
+
+Revision ID: d41b7e2a9f63
+Revises: 5e8b3d1f7a94
+Create Date: 2026-02-23 11:27:04.671352
+
+"""
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from core.partitioning import INDEX_SUFFIX, shadow_name
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41b7e2a9f63'
+down_revision: Union[str, None] = '5e8b3d1f7a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, predicate)
+INDEXES = [
+    ('ix_folders_root_name', 'folders', ['user_id', 'name'], "parent_folder_id IS NULL"),
+    ('ix_files_live_name', 'files', ['user_id', 'folder_id', 'name'], "status <> 'DELETED'"),
+    ('ix_files_root_live_name', 'files', ['user_id', 'name'], "folder_id IS NULL AND status <> 'DELETED'"),
+]
+
+# Later rows of each (owner, parent, name) group; the oldest keeps its name
+_DUPLICATE_FILES = sa.text(
+    "SELECT id, user_id, name, copy FROM ("
+    "SELECT id, user_id, name, row_number() OVER ("
+    "PARTITION BY user_id, folder_id, name ORDER BY created_at, id) - 1 AS copy "
+    "FROM files WHERE status <> 'DELETED') AS ranked WHERE copy > 0"
+)
+_DUPLICATE_ROOT_FOLDERS = sa.text(
+    "SELECT id, user_id, name, path, copy FROM ("
+    "SELECT id, user_id, name, path, row_number() OVER ("
+    "PARTITION BY user_id, name ORDER BY created_at, id) - 1 AS copy "
+    "FROM folders WHERE parent_folder_id IS NULL) AS ranked WHERE copy > 0"
+)
+# Rewrite the path prefix of a renamed folder and its descendants
+_RENAME_SUBTREE_PATHS = sa.text(
+    "WITH RECURSIVE subtree AS ("
+    "SELECT id FROM folders WHERE id = :id "
+    "UNION ALL SELECT f.id FROM folders f JOIN subtree s ON f.parent_folder_id = s.id) "
+    "UPDATE folders SET path = :path || substr(path, :old_length + 1) "
+    "WHERE id IN (SELECT id FROM subtree) RETURNING id"
+)
+
+
+def _record_changes(bind, changed: dict) -> None:
+    """Log the renamed items in the change feed so sync clients pick up the new names"""
+    for user_id, items in changed.items():
+        version = bind.execute(sa.text(
+            "UPDATE user_change_versions SET version = version + 1 WHERE user_id = :user_id RETURNING version"
+        ), {"user_id": user_id}).scalar()
+        if version is None:
+            version = 1
+            bind.execute(sa.text(
+                "INSERT INTO user_change_versions (user_id, version) VALUES (:user_id, 1)"
+            ), {"user_id": user_id})
+        bind.execute(sa.text(
+            "INSERT INTO changes (user_id, seq, item_type, item_id, action) "
+            "VALUES (:user_id, :seq, :item_type, :item_id, 'UPSERT')"
+        ), [
+            {"user_id": user_id, "seq": version, "item_type": item_type, "item_id": item_id}
+            for item_type, item_id in items
+        ])
+
+
+def _rename_duplicates(bind) -> None:
+    """
+    Number duplicate names the way the API's auto-rename does, e.g. 'report (1).pdf'.
+
+    Uploads never checked names and NULL parents were distinct in
+    ix_folder_user_parent_name, so existing data may hold duplicates that would
+    keep the unique indexes from building. A new name can itself collide with an
+    existing copy, so passes repeat until no duplicates remain.
+    """
+    changed = {}
+    while True:
+        rows = bind.execute(_DUPLICATE_FILES).all()
+        if not rows:
+            break
+        for row in rows:
+            stem, extension = os.path.splitext(row.name)
+            bind.execute(sa.text("UPDATE files SET name = :name WHERE id = :id"), {
+                "id": row.id, "name": f"{stem} ({row.copy}){extension}"
+            })
+            changed.setdefault(row.user_id, []).append(('FILE', row.id))
+    while True:
+        rows = bind.execute(_DUPLICATE_ROOT_FOLDERS).all()
+        if not rows:
+            break
+        for row in rows:
+            name = f"{row.name} ({row.copy})"
+            bind.execute(sa.text("UPDATE folders SET name = :name WHERE id = :id"), {"id": row.id, "name": name})
+            folder_ids = bind.execute(_RENAME_SUBTREE_PATHS, {
+                "id": row.id, "path": f"/{name}", "old_length": len(row.path)
+            }).scalars()
+            changed.setdefault(row.user_id, []).extend(('FOLDER', folder_id) for folder_id in folder_ids)
+    _record_changes(bind, changed)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        _rename_duplicates(bind)
+    inspector = sa.inspect(bind)
+    for name, table, columns, predicate in INDEXES:
+        op.create_index(
+            name, table, columns, unique=True,
+            postgresql_where=sa.text(predicate), sqlite_where=sa.text(predicate)
+        )
+        # Before the partition swap the shadow tables must enforce the same names
+        if inspector.has_table(shadow_name(table)):
+            op.create_index(
+                f"{name}{INDEX_SUFFIX}", shadow_name(table), columns, unique=True,
+                postgresql_where=sa.text(predicate)
+            )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, table, _, _ in reversed(INDEXES):
+        if inspector.has_table(shadow_name(table)):
+            op.drop_index(f"{name}{INDEX_SUFFIX}", table_name=shadow_name(table))
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,35 @@
+"""folder contents indexes
+
+Revision ID: e5d19a3c6b42
+Revises: c7e2b4f81d35
+Create Date: 2026-01-23 09:41:55.102386
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5d19a3c6b42'
+down_revision: Union[str, None] = 'c7e2b4f81d35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Folder name ordering is already served by ix_folder_user_parent_name
+    op.create_index('ix_folders_parent_size', 'folders', ['user_id', 'parent_folder_id', 'total_bytes', 'id'])
+    op.create_index('ix_folders_parent_updated', 'folders', ['user_id', 'parent_folder_id', 'updated_at', 'id'])
+    op.create_index('ix_files_folder_name', 'files', ['user_id', 'folder_id', 'name', 'id'])
+    op.create_index('ix_files_folder_size', 'files', ['user_id', 'folder_id', 'size', 'id'])
+    op.create_index('ix_files_folder_updated', 'files', ['user_id', 'folder_id', 'updated_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_files_folder_updated', table_name='files')
+    op.drop_index('ix_files_folder_size', table_name='files')
+    op.drop_index('ix_files_folder_name', table_name='files')
+    op.drop_index('ix_folders_parent_updated', table_name='folders')
+    op.drop_index('ix_folders_parent_size', table_name='folders')
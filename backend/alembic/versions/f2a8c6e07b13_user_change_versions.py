@@ -0,0 +1,31 @@
+"""user change versions
+
+Revision ID: f2a8c6e07b13
+Revises: e5d19a3c6b42
+Create Date: 2026-01-27 16:12:30.448917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c6e07b13'
+down_revision: Union[str, None] = 'e5d19a3c6b42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_change_versions',
+        sa.Column('user_id', sa.Uuid(), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.execute("INSERT INTO user_change_versions (user_id, version) SELECT id, 0 FROM users")
+
+
+def downgrade() -> None:
+    op.drop_table('user_change_versions')
@@ -0,0 +1,70 @@
+"""Shared helpers for the benchmark scripts."""
+import asyncio
+import contextlib
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@compiles(UUID, "sqlite")
+def _compile_uuid_sqlite(type_, compiler, **kw):
+    """Store the models' postgresql UUID columns as CHAR(32) when benchmarking on SQLite"""
+    return "CHAR(32)"
+
+
+@contextlib.contextmanager
+def api_server(port: int, env: dict = None):
+    """Run the API under uvicorn in a subprocess for the duration of the block"""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=dict(os.environ, **(env or {}))
+    )
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30.0):
+    """Poll /health until the API answers"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/health")
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("API did not become ready")
+
+
+async def register_user(client: httpx.AsyncClient, password: str = "benchmark-password") -> tuple[str, dict]:
+    """Register a throwaway user and return (username, auth headers)"""
+    username = f"bench-{uuid.uuid4().hex[:10]}"
+    response = await client.post("/auth/register", json={
+        "email": f"{username}@example.com",
+        "username": username,
+        "password": password
+    })
+    response.raise_for_status()
+    return username, {"Authorization": f"Bearer {response.json()['access_token']}"}
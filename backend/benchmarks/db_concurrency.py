@@ -0,0 +1,91 @@
+"""
+Compare concurrent request throughput of the sync and async database paths.
+
+Starts the API once per mode (DATABASE_ASYNC=false / true) with uvicorn, registers a
+throwaway user, seeds a few folders, then fires concurrent GET /folders/all and
+GET /folders/tree requests and reports requests/second and latency percentiles.
+
+Usage (from the backend directory, with DATABASE_URL pointing at a test database):
+    python -m benchmarks.db_concurrency --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from benchmarks.common import api_server, percentile, register_user, wait_ready
+
+
+async def _seed(client: httpx.AsyncClient, folders: int) -> dict:
+    _, headers = await register_user(client)
+    for i in range(folders):
+        await client.post("/folders/", json={"name": f"folder-{i}"}, headers=headers)
+    return headers
+
+
+async def _run(base_url: str, paths: list[str], requests: int, concurrency: int, folders: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_ready(client)
+        headers = await _seed(client, folders)
+
+        latencies: list[float] = []
+        errors = 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(paths[i % len(paths)], headers=headers)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+    }
+
+
+def bench_mode(async_mode: bool, port: int, args) -> dict:
+    with api_server(port, {"DATABASE_ASYNC": "true" if async_mode else "false"}) as base_url:
+        return asyncio.run(_run(
+            base_url,
+            ["/folders/all", "/folders/tree"],
+            args.requests,
+            args.concurrency,
+            args.folders
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--folders", type=int, default=50)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    results = {
+        "sync": bench_mode(False, args.port, args),
+        "async": bench_mode(True, args.port + 1, args),
+    }
+    results["speedup"] = round(results["async"]["rps"] / results["sync"]["rps"], 2)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
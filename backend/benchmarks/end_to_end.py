@@ -0,0 +1,312 @@
+"""
+Measure end-to-end throughput and latency of uploads, listings and folder operations.
+
+Starts moto's S3 server as the R2 stand-in and the API under uvicorn, then
+registers --users synthetic users and seeds each with a folder tree of
+--depth levels of --width subfolders holding --files files apiece. Each
+scenario then runs with every user as one sequential client, all users at
+once:
+
+    upload            POST /files/upload of --upload-kb KiB (proxied through the API)
+    multipart_cycle   initiate, then per part: presign, PUT to S3, ack; then complete
+    list_files        GET /files/?folder_id=... on a seeded folder
+    folder_tree       GET /folders/tree
+    move_folder       PUT /folders/{id}/move of a seeded top-level subtree, to and fro
+    rename_folder     PUT /folders/{id} of the same subtree
+    delete_folder     DELETE /folders/{id}?force=true of a freshly seeded subtree
+
+The multipart steps are also reported on their own. Results are printed as
+JSON with the commit and parameters, and written to --output when given, so
+runs on two commits can be diffed.
+
+DATABASE_URL defaults to a scratch SQLite file whose schema is created here;
+point it at a Postgres test database migrated with `alembic upgrade head`
+to benchmark the production driver. Requires moto's server extra
+(pip install "moto[server]").
+
+Usage (from the backend directory):
+    python -m benchmarks.end_to_end --users 5 --iterations 20 --depth 3 --width 3 --files 2
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, api_server, percentile, register_user, wait_ready
+
+BUCKET = "bench"
+S3_CREDENTIALS = {"R2_ACCESS_KEY_ID": "bench", "R2_SECRET_ACCESS_KEY": "bench", "R2_BUCKET_NAME": BUCKET}
+
+
+class Samples:
+    """Latencies and errors per scenario"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.elapsed = {}
+
+    async def timed(self, scenario: str, request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await request
+        self.latencies[scenario].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[scenario] += 1
+        return response
+
+    def report(self) -> dict:
+        report = {}
+        for scenario, latencies in self.latencies.items():
+            row = {
+                "operations": len(latencies),
+                "errors": self.errors[scenario],
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+            }
+            if scenario in self.elapsed:
+                row["elapsed_s"] = round(self.elapsed[scenario], 3)
+                row["ops_per_s"] = round(len(latencies) / self.elapsed[scenario], 1)
+            report[scenario] = row
+        return report
+
+
+class User:
+    """A synthetic user and the folders seeded for it"""
+
+    def __init__(self, headers: dict):
+        self.headers = headers
+        self.folders: list[str] = []
+        self.top_level: list[str] = []
+        self.park: str = None
+
+
+def _checked(response: httpx.Response) -> dict:
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: {response.status_code} {response.text}")
+    return response.json() if response.content else {}
+
+
+async def _upload(client: httpx.AsyncClient, user: User, folder_id: str, size: int) -> httpx.Response:
+    data = {"folder_id": folder_id} if folder_id else {}
+    files = {"file": (f"file-{uuid.uuid4().hex[:8]}.bin", os.urandom(size), "application/octet-stream")}
+    return await client.post("/files/upload", data=data, files=files, headers=user.headers)
+
+
+async def _seed_tree(
+    client: httpx.AsyncClient, user: User, parent_id: str, depth: int, width: int, files: int, prefix: str
+) -> list[str]:
+    """Create depth levels of width subfolders under parent_id, each with files small files"""
+    created = []
+    level = [parent_id]
+    for d in range(depth):
+        next_level = []
+        for parent in level:
+            for w in range(width):
+                body = {"name": f"{prefix}-{d}-{w}", "parent_folder_id": parent}
+                folder_id = _checked(await client.post("/folders/", json=body, headers=user.headers))["id"]
+                for _ in range(files):
+                    _checked(await _upload(client, user, folder_id, 1024))
+                next_level.append(folder_id)
+        created.extend(next_level)
+        level = next_level
+    return created
+
+
+async def _seed_user(client: httpx.AsyncClient, args) -> User:
+    _, headers = await register_user(client)
+    user = User(headers)
+    user.park = _checked(await client.post("/folders/", json={"name": "park"}, headers=headers))["id"]
+    # Top-level subtrees, each depth - 1 levels below its root
+    for w in range(args.width):
+        root = _checked(await client.post("/folders/", json={"name": f"top-{w}"}, headers=headers))["id"]
+        user.top_level.append(root)
+        user.folders.append(root)
+        user.folders.extend(await _seed_tree(client, user, root, args.depth - 1, args.width, args.files, f"t{w}"))
+    return user
+
+
+async def _multipart_cycle(client: httpx.AsyncClient, s3: httpx.AsyncClient, user: User, samples: Samples, size: int):
+    started = time.perf_counter()
+    initiate = await samples.timed("multipart_initiate", client.post("/files/upload/initiate", json={
+        "filename": f"large-{uuid.uuid4().hex[:8]}.bin", "size": size, "folder_id": random.choice(user.folders)
+    }, headers=user.headers))
+    upload = _checked(initiate)
+    file_id, parts = upload["file_id"], []
+    for number in range(1, upload["total_parts"] + 1):
+        presign = _checked(await samples.timed("multipart_presign", client.get(
+            f"/files/{file_id}/presigned-url", params={"part_number": number}, headers=user.headers
+        )))
+        length = min(upload["part_size"], size - (number - 1) * upload["part_size"])
+        put = await s3.put(presign["url"], content=os.urandom(length))
+        put.raise_for_status()
+        part = {"part_number": number, "etag": put.headers["ETag"]}
+        await samples.timed("multipart_ack", client.post(
+            f"/files/{file_id}/part-uploaded", json=part, headers=user.headers
+        ))
+        parts.append(part)
+    await samples.timed("multipart_complete", client.post(
+        f"/files/{file_id}/complete", json={"parts": parts}, headers=user.headers
+    ))
+    samples.latencies["multipart_cycle"].append((time.perf_counter() - started) * 1000)
+
+
+async def _scenario(samples: Samples, name: str, users: list[User], iterations: int, step):
+    """Run step(user, i) iterations times per user, users concurrently"""
+    async def run(user: User):
+        for i in range(iterations):
+            await step(user, i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run(user) for user in users))
+    samples.elapsed[name] = time.perf_counter() - started
+
+
+async def _run(base_url: str, args) -> tuple[dict, dict]:
+    samples = Samples()
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client, httpx.AsyncClient(timeout=120) as s3:
+        await wait_ready(client)
+        started = time.perf_counter()
+        users = await asyncio.gather(*(_seed_user(client, args) for _ in range(args.users)))
+        seeding = {
+            "elapsed_s": round(time.perf_counter() - started, 3),
+            "folders_per_user": len(users[0].folders) + 1,
+            "files_per_user": (len(users[0].folders) - args.width) * args.files,
+        }
+
+        async def upload(user, i):
+            await samples.timed("upload", _upload(client, user, random.choice(user.folders), args.upload_kb * 1024))
+
+        async def multipart(user, i):
+            await _multipart_cycle(client, s3, user, samples, args.multipart_kb * 1024)
+
+        async def list_files(user, i):
+            await samples.timed("list_files", client.get(
+                "/files/", params={"folder_id": random.choice(user.folders)}, headers=user.headers
+            ))
+
+        async def folder_tree(user, i):
+            await samples.timed("folder_tree", client.get("/folders/tree", headers=user.headers))
+
+        async def move_folder(user, i):
+            # Alternate the first subtree between the park folder and the root
+            await samples.timed("move_folder", client.put(
+                f"/folders/{user.top_level[0]}/move",
+                json={"parent_folder_id": user.park if i % 2 == 0 else None}, headers=user.headers
+            ))
+
+        async def rename_folder(user, i):
+            await samples.timed("rename_folder", client.put(
+                f"/folders/{user.top_level[0]}", json={"name": f"top-0-{i}"}, headers=user.headers
+            ))
+
+        await _scenario(samples, "upload", users, args.iterations, upload)
+        await _scenario(samples, "multipart_cycle", users, args.iterations, multipart)
+        await _scenario(samples, "list_files", users, args.iterations, list_files)
+        await _scenario(samples, "folder_tree", users, args.iterations, folder_tree)
+        await _scenario(samples, "move_folder", users, args.iterations, move_folder)
+        await _scenario(samples, "rename_folder", users, args.iterations, rename_folder)
+
+        # Each delete needs its own subtree, seeded untimed beforehand
+        doomed = {}
+        for user in users:
+            doomed[id(user)] = []
+            for i in range(args.iterations):
+                root = _checked(await client.post("/folders/", json={"name": f"doomed-{i}"}, headers=user.headers))["id"]
+                await _seed_tree(client, user, root, args.depth - 1, args.width, args.files, f"d{i}")
+                doomed[id(user)].append(root)
+
+        async def delete_folder(user, i):
+            await samples.timed("delete_folder", client.delete(
+                f"/folders/{doomed[id(user)][i]}", params={"force": "true"}, headers=user.headers
+            ))
+
+        await _scenario(samples, "delete_folder", users, args.iterations, delete_folder)
+    return seeding, samples.report()
+
+
+def _create_sqlite_schema(database_url: str):
+    os.environ["DATABASE_URL"] = database_url
+    import benchmarks.common  # noqa: F401  (UUID columns on SQLite)
+    import models  # noqa: F401
+    from database import Base, engine
+
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=5, help="Synthetic users, also the concurrency")
+    parser.add_argument("--iterations", type=int, default=20, help="Operations per user per scenario")
+    parser.add_argument("--depth", type=int, default=3, help="Folder levels seeded per user")
+    parser.add_argument("--width", type=int, default=3, help="Subfolders per folder")
+    parser.add_argument("--files", type=int, default=2, help="Files per seeded subfolder")
+    parser.add_argument("--upload-kb", type=int, default=64)
+    parser.add_argument("--multipart-kb", type=int, default=6 * 1024, help="Over 5120 KiB gives several parts")
+    parser.add_argument("--port", type=int, default=8771)
+    parser.add_argument("--s3-port", type=int, default=8772)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for folder choices")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        raise SystemExit('The S3 stand-in needs moto: pip install "moto[server]"')
+    import boto3
+
+    database_url = os.environ.get("DATABASE_URL")
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'end_to_end.db')}"
+        _create_sqlite_schema(database_url)
+
+    # Keep moto's per-request access log out of the report
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    s3_server = ThreadedMotoServer(ip_address="127.0.0.1", port=args.s3_port, verbose=False)
+    s3_server.start()
+    endpoint = f"http://127.0.0.1:{args.s3_port}"
+    try:
+        boto3.client(
+            "s3", endpoint_url=endpoint, region_name="us-east-1",
+            aws_access_key_id="bench", aws_secret_access_key="bench"
+        ).create_bucket(Bucket=BUCKET)
+        env = dict(S3_CREDENTIALS, DATABASE_URL=database_url, R2_ENDPOINT_URL=endpoint, BCRYPT_ROUNDS="4")
+        with api_server(args.port, env) as base_url:
+            seeding, results = asyncio.run(_run(base_url, args))
+    finally:
+        s3_server.stop()
+
+    report = {
+        "commit": _commit(),
+        "database": database_url.split(":", 1)[0],
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("port", "s3_port", "output")},
+        "seeding": seeding,
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Measure login throughput and event-loop responsiveness under a login burst.
+
+Registers one user, then fires concurrent POST /auth/login requests while a
+probe polls GET / (no DB, no auth). With bcrypt offloaded to the password
+hashing pool, probe latency stays flat during the burst; 429 responses show
+queue-depth shedding once PASSWORD_HASH_MAX_PENDING is reached.
+
+Usage (from the backend directory, with DATABASE_URL pointing at a test database):
+    python -m benchmarks.login_throughput --logins 500 --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+from benchmarks.common import api_server, percentile, register_user, wait_ready
+
+PASSWORD = "benchmark-password"
+
+
+async def _run(base_url: str, logins: int, concurrency: int) -> dict:
+    limits = httpx.Limits(max_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await wait_ready(client)
+        username, _ = await register_user(client, PASSWORD)
+
+        login_latencies: list[float] = []
+        probe_latencies: list[float] = []
+        statuses: dict[int, int] = {}
+        semaphore = asyncio.Semaphore(concurrency)
+        done = asyncio.Event()
+
+        async def login():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/auth/login", data={"username": username, "password": PASSWORD})
+                login_latencies.append((time.perf_counter() - started) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        async def probe():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get("/")
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await probe_task
+
+    succeeded = statuses.get(200, 0)
+    return {
+        "logins": logins,
+        "concurrency": concurrency,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "successful_logins_per_s": round(succeeded / elapsed, 1),
+        "login_p50_ms": round(statistics.median(login_latencies), 2),
+        "login_p99_ms": round(percentile(login_latencies, 99), 2),
+        "probe_p50_ms": round(statistics.median(probe_latencies), 2) if probe_latencies else None,
+        "probe_p99_ms": round(percentile(probe_latencies, 99), 2) if probe_latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    with api_server(args.port) as base_url:
+        result = asyncio.run(_run(base_url, args.logins, args.concurrency))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
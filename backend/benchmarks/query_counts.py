@@ -0,0 +1,127 @@
+"""
+Check the SQL statements each endpoint issues against its query budget.
+
+Runs the app in-process on a scratch SQLite database with query tracking on,
+registers a user and walks through creating, listing, moving, renaming and
+deleting folders and files. Every request is checked against the
+@query_budget of its endpoint, counted with a cold auth cache so the
+principal lookup is included, and for statements repeated
+QUERY_REPEAT_THRESHOLD times or more (likely N+1 loops). The budgets pin down
+the request-scoped lookup cache (each folder or user is loaded at most once
+per request) and the single-write name checks, so a change that adds a round
+trip fails here. Prints the counts as JSON and exits non-zero on any
+violation; pass --update to print the measured counts without checking.
+
+Usage (from the backend directory):
+    python -m benchmarks.query_counts
+"""
+import argparse
+import json
+import os
+import tempfile
+import uuid
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'query_counts.db')}")
+os.environ["QUERY_TRACKING_ENABLED"] = "true"
+os.environ.setdefault("QUERY_TRACKING_CALL_SITES", "true")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import benchmarks.common  # noqa: E402,F401  (UUID columns on SQLite)
+from core.auth_cache import principal_cache  # noqa: E402
+from core.config import settings  # noqa: E402
+from core.query_tracking import record_requests  # noqa: E402
+from database import Base, SessionLocal, engine  # noqa: E402
+from main import create_app  # noqa: E402
+from models import File, FileStatus  # noqa: E402
+
+# Requests allowed to repeat a statement, with the reason
+KNOWN_REPEATS = {
+    # Force-deleting walks the subtree one folder at a time
+    "delete_folder": "recursive delete",
+}
+
+
+def _seed_file(user_id: uuid.UUID) -> uuid.UUID:
+    """Insert a completed file at the root directly; uploads need R2"""
+    with SessionLocal() as db:
+        file_record = File(
+            user_id=user_id, name="report.pdf", size=1024, storage_key=f"bench/{uuid.uuid4()}",
+            status=FileStatus.COMPLETED
+        )
+        db.add(file_record)
+        db.commit()
+        return file_record.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--update", action="store_true", help="Print measured counts without checking them")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    report = {}
+    try:
+        with TestClient(create_app()) as client, record_requests() as requests:
+            username = f"bench-{uuid.uuid4().hex[:10]}"
+            token = client.post("/auth/register", json={
+                "email": f"{username}@example.com", "username": username, "password": "benchmark-password"
+            }).json()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            user_id = uuid.UUID(client.get("/auth/me", headers=headers).json()["id"])
+            file_id = _seed_file(user_id)
+
+            def call(name: str, method: str, path: str, body: dict = None) -> dict:
+                # Worst case: the token's principal is looked up again
+                principal_cache.clear()
+                requests.clear()
+                response = client.request(method, path, json=body, headers=headers)
+                if response.status_code >= 400:
+                    raise SystemExit(f"{name}: {response.status_code} {response.text}")
+                (route, log), = requests
+                report[name] = {
+                    "route": route,
+                    "statements": log.count,
+                    "budget": _budget(client.app, route),
+                    "repeated": [count for _, count in log.repeated(settings.QUERY_REPEAT_THRESHOLD)]
+                }
+                return response.json() if response.content else {}
+
+            a = call("create_root_folder", "POST", "/folders/", {"name": "a"})["id"]
+            b = call("create_nested_folder", "POST", "/folders/", {"name": "b", "parent_folder_id": a})["id"]
+            c = call("create_deep_folder", "POST", "/folders/", {"name": "c", "parent_folder_id": b})["id"]
+            call("move_folder", "PUT", f"/folders/{c}/move", {"parent_folder_id": a})
+            call("rename_folder", "PUT", f"/folders/{c}", {"name": "c2"})
+            call("rename_file", "PUT", f"/files/{file_id}", {"name": "final.pdf"})
+            call("move_file", "PUT", f"/files/{file_id}/move", {"folder_id": b})
+            call("get_file", "GET", f"/files/{file_id}")
+            call("list_files", "GET", "/files/")
+            call("get_folder", "GET", f"/folders/{c}")
+            call("folder_tree", "GET", "/folders/tree")
+            call("folder_contents", "GET", f"/folders/{b}/contents")
+            call("get_me", "GET", "/auth/me")
+            call("delete_folder", "DELETE", f"/folders/{a}?force=true")
+    finally:
+        Base.metadata.drop_all(engine)
+
+    if args.update:
+        print(json.dumps({name: row["statements"] for name, row in report.items()}, indent=2))
+        return
+    print(json.dumps(report, indent=2))
+    over_budget = [name for name, row in report.items() if row["budget"] is not None and row["statements"] > row["budget"]]
+    repeating = [name for name, row in report.items() if row["repeated"] and name not in KNOWN_REPEATS]
+    if over_budget or repeating:
+        raise SystemExit(f"Over budget: {', '.join(over_budget) or 'none'}; repeated statements: {', '.join(repeating) or 'none'}")
+
+
+def _budget(app, route_name: str):
+    """The @query_budget of the endpoint serving 'METHOD /path'"""
+    method, path = route_name.split(" ", 1)
+    for route in app.routes:
+        if getattr(route, "path", None) == path and method in getattr(route, "methods", ()):
+            return getattr(route.endpoint, "query_budget", None)
+    return None
+
+
+if __name__ == "__main__":
+    main()
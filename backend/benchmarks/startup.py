@@ -0,0 +1,105 @@
+"""
+Measure API startup: import time breakdown and time to first request.
+
+Imports main in a fresh interpreter under `python -X importtime` and reports the
+total plus the slowest top-level packages (self time summed over their
+submodules). Then starts the API and measures the wall time from process spawn
+to the first successful GET /, with uvicorn and, when installed, with gunicorn
+preloading the app for several workers.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 5 --workers 4
+DATABASE_URL defaults to a throwaway SQLite file so no database server is needed.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR
+
+
+def import_breakdown(env: dict, top: int) -> dict:
+    """Total import time of main and the slowest top-level packages, in milliseconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    by_package = defaultdict(int)
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        by_package[name.strip().split(".")[0]] += int(self_us)
+        if name.strip() == "main":
+            total_us = int(cumulative_us)
+    slowest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "packages_ms": {name: round(us / 1000, 1) for name, us in slowest}
+    }
+
+
+def time_to_first_request(command: list[str], port: int, env: dict, timeout: float = 60.0) -> float:
+    """Seconds from spawning the server until GET / answers 200"""
+    started = time.perf_counter()
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get("/").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"Server did not answer within {timeout}s: {' '.join(command)}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8775)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(scratch, 'startup.db')}")
+
+    results = {"import": import_breakdown(env, args.top)}
+
+    servers = {
+        "uvicorn": [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+    }
+    if importlib.util.find_spec("gunicorn") is not None:
+        servers[f"gunicorn_preload_{args.workers}_workers"] = [
+            sys.executable, "-m", "gunicorn", "main:app", "-c", "gunicorn.conf.py",
+            "--bind", f"127.0.0.1:{args.port}", "--workers", str(args.workers), "--log-level", "warning"
+        ]
+    for name, command in servers.items():
+        samples = [time_to_first_request(command, args.port, env) for _ in range(args.runs)]
+        results[name] = {
+            "first_request_ms_median": round(statistics.median(samples) * 1000, 1),
+            "first_request_ms_max": round(max(samples) * 1000, 1)
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Hashable, Optional
+from uuid import UUID
+
+from core.config import settings
+
+
+@dataclass(frozen=True)
+class UserPrincipal:
+    """Lightweight authenticated identity, detached from any DB session"""
+    id: UUID
+    username: str
+    email: Optional[str]
+    is_active: bool
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user) -> "UserPrincipal":
+        """Build a principal from a User row"""
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_active=bool(user.is_active),
+            created_at=user.created_at
+        )
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["UserPrincipal"]:
+        """Build a principal from embedded token claims, or None if they are missing"""
+        if not payload.get("uid") or not payload.get("sub"):
+            return None
+        try:
+            user_id = UUID(payload["uid"])
+        except ValueError:
+            return None
+        return cls(
+            id=user_id,
+            username=payload["sub"],
+            email=payload.get("email"),
+            is_active=bool(payload.get("act", True))
+        )
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire at a per-entry deadline"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_where(self, predicate):
+        """Drop every entry whose value matches predicate"""
+        with self._lock:
+            for key in [k for k, (_, v) in self._entries.items() if predicate(v)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def is_revoked(payload: dict, tokens_revoked_at: Optional[datetime], token_revoked: bool) -> bool:
+    """
+    Check a token against the shared revocation state read from the database.
+
+    Args:
+        payload: Decoded token claims
+        tokens_revoked_at: The user's User.tokens_revoked_at
+        token_revoked: Whether the token's jti is in revoked_tokens
+    """
+    if token_revoked:
+        return True
+    if tokens_revoked_at is None:
+        return False
+    # SQLite hands back naive datetimes; they are stored in UTC
+    if tokens_revoked_at.tzinfo is None:
+        tokens_revoked_at = tokens_revoked_at.replace(tzinfo=timezone.utc)
+    issued_at = payload.get("iat")
+    return issued_at is None or issued_at <= tokens_revoked_at.timestamp()
+
+
+principal_cache = TTLCache(settings.AUTH_CACHE_MAX_ENTRIES)
+
+
+def forget_token(token: str):
+    """Drop a revoked token's cached principal; other workers notice once their entry expires"""
+    principal_cache.discard(token)
+
+
+def invalidate_user(user_id: UUID):
+    """Forget this worker's cached principals for a user; other workers notice once their entries expire"""
+    principal_cache.discard_where(lambda principal: principal.id == user_id)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -12,6 +13,101 @@ class Settings:
     # Security
     ACCESS_TOKEN_EXPIRE_SECONDS: int = ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
+    # Token-to-user cache used by get_current_user (per worker process). Revocations are read
+    # from the database on a miss, so the TTL bounds how long other workers accept a revoked token
+    AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+    AUTH_CACHE_MAX_ENTRIES: int = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+    # Trust uid/email/act claims embedded in the token instead of loading the user row
+    AUTH_TRUST_TOKEN_CLAIMS: bool = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+    # Web worker processes on this host; gunicorn.conf.py sets it when unset
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    # Password hashing: bcrypt cost plus the process pool that runs it off the event loop.
+    # Every web worker has its own pool, so the default splits the cores between them.
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv(
+        "PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // max(1, WEB_CONCURRENCY)))
+    ))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+    # Serve request-path queries through the asyncio engine instead of the blocking one
+    DATABASE_ASYNC: bool = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+
+    # Connection pool of each engine, per worker process
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT_SECONDS: float = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+    # Connections are replaced after this long, before server or load balancer idle timeouts cut them
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    # Ping on every checkout; off by default since recycle and TCP keepalives avoid the round trip
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+    DB_TCP_KEEPALIVE_IDLE_SECONDS: int = int(os.getenv("DB_TCP_KEEPALIVE_IDLE_SECONDS", "30"))
+    # Behind a transaction-pooling PgBouncer: no app-side pool and no reused prepared statements
+    DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "false").lower() in ("1", "true", "yes")
+
+    # Read replicas for read-only endpoints (comma-separated URLs; empty routes everything to the primary)
+    DATABASE_REPLICA_URLS: list[str] = [
+        url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+    REPLICA_HEALTH_CHECK_SECONDS: float = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", "10"))
+    # After a user's mutation their reads stay on the primary for this long
+    READ_YOUR_WRITES_SECONDS: float = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+    # Delete entries in the change feed are kept this long; older sync cursors get a reset
+    CHANGES_RETENTION_DAYS: int = int(os.getenv("CHANGES_RETENTION_DAYS", "30"))
+    # Deleted file rows are kept this long before jobs.compact_files removes (or archives) them
+    FILES_TOMBSTONE_RETENTION_DAYS: int = int(os.getenv("FILES_TOMBSTONE_RETENTION_DAYS", "30"))
+
+    # Real-time change events: "local" reaches this worker's clients only, "postgres" fans out via LISTEN/NOTIFY
+    EVENTS_TRANSPORT: str = os.getenv("EVENTS_TRANSPORT", "local").lower()
+    EVENTS_CHANNEL: str = os.getenv("EVENTS_CHANNEL", "gdrive_changes")
+    # Per-connection queue bound; clients that fall this far behind are disconnected
+    EVENTS_QUEUE_SIZE: int = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    EVENTS_HEARTBEAT_SECONDS: float = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+    # Pre-serialized response cache for the folder tree and flat folder list
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+    # "memory" (per worker LRU) or "redis" (shared; requires the redis package)
+    RESPONSE_CACHE_BACKEND: str = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+    RESPONSE_CACHE_MAX_BYTES: int = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RESPONSE_CACHE_REDIS_URL: str = os.getenv("RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0")
+    RESPONSE_CACHE_TTL_SECONDS: int = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+
+    # Prometheus metrics on GET /metrics; set PROMETHEUS_MULTIPROC_DIR when running several workers
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    # OpenTelemetry tracing (see core/tracing.py); requires the opentelemetry-sdk package
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+    # "otlp" (OTLP/HTTP, configured by the standard OTEL_EXPORTER_OTLP_* variables) or "file" (JSON lines)
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "file").lower()
+    TRACING_FILE_PATH: str = os.getenv("TRACING_FILE_PATH", "traces.jsonl")
+    # Share of new traces recorded; requests arriving with a traceparent follow the caller's decision
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", "0.1"))
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "g-drive-api")
+
+    # On-demand request profiling with pyinstrument (see core/profiling.py); requires the pyinstrument package
+    PROFILING_ENABLED: bool = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+    # Sent as X-Profile to profile a request, and as X-Admin-Token to read reports; empty disables both
+    PROFILING_ADMIN_TOKEN: str = os.getenv("PROFILING_ADMIN_TOKEN", "")
+    # Share of all requests profiled without the header
+    PROFILING_SAMPLE_RATE: float = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_INTERVAL_SECONDS: float = float(os.getenv("PROFILING_INTERVAL_SECONDS", "0.001"))
+    # Shared by all workers so any of them can serve a report
+    PROFILING_DIR: str = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "gdrive-profiles"))
+    PROFILING_MAX_REPORTS: int = int(os.getenv("PROFILING_MAX_REPORTS", "100"))
+
+    # Per-request SQL statement counting for development and CI (see core/query_tracking.py)
+    QUERY_TRACKING_ENABLED: bool = os.getenv("QUERY_TRACKING_ENABLED", "false").lower() in ("1", "true", "yes")
+    # A statement shape repeated this often in one request is reported as a possible N+1
+    QUERY_REPEAT_THRESHOLD: int = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+    # Report the service call sites of repeated statements (walks the stack for every statement)
+    QUERY_TRACKING_CALL_SITES: bool = os.getenv("QUERY_TRACKING_CALL_SITES", "false").lower() in ("1", "true", "yes")
+    # Raise QueryBudgetExceeded when a request goes over its endpoint's @query_budget (for test runs)
+    QUERY_BUDGET_ENFORCE: bool = os.getenv("QUERY_BUDGET_ENFORCE", "false").lower() in ("1", "true", "yes")
+
     # Cloudflare R2 Configuration
     R2_ACCOUNT_ID: str = os.getenv("R2_ACCOUNT_ID", "")
     R2_ACCESS_KEY_ID: str = os.getenv("R2_ACCESS_KEY_ID", "")
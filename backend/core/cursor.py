@@ -0,0 +1,37 @@
+import base64
+import json
+from typing import Optional
+
+from exceptions.exceptions import FileUploadException
+
+
+def encode_cursor(values: list) -> str:
+    """Encode keyset pagination values into an opaque URL-safe cursor."""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], length: int) -> Optional[list]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Opaque cursor string (None for the first page)
+        length: Expected number of keyset values
+
+    Returns:
+        List of keyset values, or None if no cursor was given
+
+    Raises:
+        FileUploadException: If the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise FileUploadException("Invalid cursor")
+    if not isinstance(values, list) or len(values) != length:
+        raise FileUploadException("Invalid cursor")
+    return values
@@ -0,0 +1,32 @@
+from typing import Optional
+
+from fastapi import Response
+
+# Clients may store listings but must revalidate with If-None-Match before reuse
+CACHE_CONTROL = "private, no-cache"
+
+
+def version_etag(version: int) -> str:
+    """Build a weak ETag from a user's change version"""
+    return f'W/"{version}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag using weak comparison"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    """Build an empty 304 response carrying the current ETag"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+
+def set_etag(response: Response, etag: str) -> None:
+    """Attach validator headers to a full response"""
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
@@ -0,0 +1,202 @@
+import asyncio
+import json
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from database import DATABASE_URL
+
+# Events with more entries than this are sent without them; clients read GET /changes
+MAX_EVENT_ENTRIES = 100
+# Postgres rejects NOTIFY payloads of 8000 bytes or more, failing the whole transaction;
+# larger events are sent truncated, leaving the entries to GET /changes
+MAX_NOTIFY_BYTES = 7500
+# Session.info key holding events staged by the current transaction
+PENDING_EVENTS_KEY = "pending_events"
+
+
+class Subscription:
+    """One connection's bounded event queue"""
+
+    def __init__(self, user_id: UUID, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    async def get(self) -> Optional[dict]:
+        """Wait for the next event; None means the subscription was dropped"""
+        return await self.queue.get()
+
+
+class EventBroker:
+    """
+    In-process pub/sub of change events, keyed by user.
+
+    Delivery to subscribers always happens on the event loop thread. A
+    subscriber whose queue is full is dropped rather than allowed to block
+    publishers or grow without bound; the client reconnects and catches up
+    through the change feed.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions: dict[UUID, set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.dropped_count = 0
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def subscribe(self, user_id: UUID) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscriptions.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscriptions[subscription.user_id]
+
+    def dispatch(self, user_id: UUID, payload: dict) -> None:
+        """Fan an event out to the user's subscribers (event loop thread only)"""
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            try:
+                subscription.queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def dispatch_threadsafe(self, user_id: UUID, payload: dict) -> None:
+        """Dispatch from any thread; a no-op outside the API process (e.g. jobs)"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self.dispatch, user_id, payload)
+
+    def _drop(self, subscription: Subscription) -> None:
+        # Make room for the sentinel so the consumer wakes up and closes
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+        subscription.dropped = True
+        self.dropped_count += 1
+        self.unsubscribe(subscription)
+
+
+class LocalTransport:
+    """Delivers events to subscribers in this worker process only"""
+
+    def __init__(self, broker: EventBroker):
+        self.broker = broker
+
+    def stage(self, session: Session, user_id: UUID, payload: dict) -> None:
+        """Queue an event to publish once the session's transaction commits"""
+        session.info.setdefault(PENDING_EVENTS_KEY, []).append((user_id, payload))
+
+    def on_commit(self, session: Session) -> None:
+        for user_id, payload in session.info.pop(PENDING_EVENTS_KEY, []):
+            self.broker.dispatch_threadsafe(user_id, payload)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class PostgresTransport(LocalTransport):
+    """
+    Delivers events to every worker through Postgres LISTEN/NOTIFY.
+
+    NOTIFY is issued inside the mutating transaction, so Postgres delivers it
+    only if that transaction commits. Each worker keeps one asyncpg connection
+    listening on the channel and dispatches to its local subscribers.
+    """
+
+    RECONNECT_SECONDS = 5
+
+    def __init__(self, broker: EventBroker, dsn: str, channel: str):
+        super().__init__(broker)
+        self.dsn = dsn
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    def stage(self, session: Session, user_id: UUID, payload: dict) -> None:
+        if session.get_bind().dialect.name != "postgresql":
+            super().stage(session, user_id, payload)
+            return
+        message = json.dumps({"user_id": str(user_id), "event": payload}, default=str)
+        if len(message.encode()) > MAX_NOTIFY_BYTES:
+            message = json.dumps({"user_id": str(user_id), "event": truncated_event(payload["seq"])})
+        session.execute(text("SELECT pg_notify(:channel, :message)"), {"channel": self.channel, "message": message})
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+
+    def _on_notify(self, connection, pid, channel, message: str) -> None:
+        data = json.loads(message)
+        self.broker.dispatch(UUID(data["user_id"]), data["event"])
+
+    async def _listen(self) -> None:
+        import asyncpg
+
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                await connection.add_listener(self.channel, self._on_notify)
+                while not connection.is_closed():
+                    await asyncio.sleep(self.RECONNECT_SECONDS)
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception as e:
+                print(f"Warning: Event listener connection failed: {str(e)}")
+            await asyncio.sleep(self.RECONNECT_SECONDS)
+
+
+def build_event(seq: int, entries: list) -> dict:
+    """Build the payload pushed to clients for one recorded change"""
+    changes = [
+        {"item_type": item_type.value, "item_id": str(item_id), "action": action.value}
+        for item_type, item_id, action in entries
+    ]
+    if len(changes) > MAX_EVENT_ENTRIES:
+        return truncated_event(seq)
+    return {"seq": seq, "changes": changes, "truncated": False}
+
+
+def truncated_event(seq: int) -> dict:
+    """An event without its entries; clients fetch them from GET /changes"""
+    return {"seq": seq, "changes": None, "truncated": True}
+
+
+def _create_transport(broker: EventBroker):
+    if settings.EVENTS_TRANSPORT == "postgres":
+        # asyncpg takes a plain libpq URL without the SQLAlchemy driver suffix
+        dsn = DATABASE_URL.replace("postgresql+psycopg2://", "postgresql://")
+        return PostgresTransport(broker, dsn, settings.EVENTS_CHANNEL)
+    return LocalTransport(broker)
+
+
+event_broker = EventBroker(settings.EVENTS_QUEUE_SIZE)
+event_transport = _create_transport(event_broker)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed_events(session: Session) -> None:
+    event_transport.on_commit(session)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back_events(session: Session, previous_transaction) -> None:
+    session.info.pop(PENDING_EVENTS_KEY, None)
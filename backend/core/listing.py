@@ -0,0 +1,50 @@
+import enum
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import ColumnElement
+
+from exceptions.exceptions import FileUploadException
+
+
+class ContentSort(str, enum.Enum):
+    NAME = "name"
+    SIZE = "size"
+    MODIFIED = "modified"
+
+
+class SortOrder(str, enum.Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+
+def parse_sort_value(sort: ContentSort, value: Any) -> Any:
+    """Convert a JSON-decoded cursor value back to the sort column's type"""
+    try:
+        if sort == ContentSort.SIZE:
+            return int(value)
+        if sort == ContentSort.MODIFIED:
+            return datetime.fromisoformat(value)
+        return str(value)
+    except (ValueError, TypeError):
+        raise FileUploadException("Invalid cursor")
+
+
+def keyset_after(sort_column, id_column, value: Any, last_id: Any, order: SortOrder) -> ColumnElement:
+    """
+    Build the keyset predicate for rows after (value, last_id) in (sort, id) order.
+
+    Args:
+        sort_column: Column the listing is sorted by
+        id_column: Unique tiebreaker column
+        value: Sort value of the last row on the previous page
+        last_id: ID of the last row on the previous page
+        order: Sort direction, applied to both columns
+
+    Returns:
+        SQL expression usable in a WHERE clause
+    """
+    if order == SortOrder.DESC:
+        return or_(sort_column < value, and_(sort_column == value, id_column < last_id))
+    return or_(sort_column > value, and_(sort_column == value, id_column > last_id))
@@ -0,0 +1,45 @@
+from typing import Callable, Hashable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_INFO_KEY = "lookup_cache"
+
+
+def cached_lookup(db: Session, key: Hashable, load: Callable):
+    """
+    Load an entity once per transaction of a request's session.
+
+    FileService and FolderService validate the same folders several times while
+    serving one request (the upload folder, its storage path, a move's
+    destination and each ancestor walked for a path). Lookups by id go through
+    here, keyed by (model, id, owner), so each one reaches the database at most
+    once; misses are remembered too. Entries live in session.info, which is
+    per request, and are dropped when the transaction commits or rolls back,
+    so they never outlive the objects they point at.
+
+    Args:
+        db: The request's session (an AsyncSession's sync_session shares its info)
+        key: Hashable identity of the lookup, e.g. (Folder, folder_id, user_id)
+        load: Called on a miss; returns the entity or None
+    """
+    cache = db.info.setdefault(_INFO_KEY, {})
+    if key not in cache:
+        cache[key] = load()
+    return cache[key]
+
+
+def remember(db: Session, key: Hashable, value) -> None:
+    """Seed the cache with an entity loaded some other way (a list query, a create)"""
+    db.info.setdefault(_INFO_KEY, {})[key] = value
+
+
+def forget(db: Session, key: Hashable) -> None:
+    """Drop a cached lookup, e.g. after deleting the entity"""
+    db.info.get(_INFO_KEY, {}).pop(key, None)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def _clear(session: Session, *args) -> None:
+    session.info.pop(_INFO_KEY, None)
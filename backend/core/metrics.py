@@ -0,0 +1,176 @@
+"""
+Prometheus metrics for the API, the database and R2.
+
+Request latency is recorded by RequestMetricsMiddleware, SQL statements by
+SQLAlchemy cursor events on every engine, and R2 calls by botocore events on
+the shared S3 client. Each observation is a few attribute lookups and one
+histogram update, cheap enough to leave on in production.
+
+With several workers, point PROMETHEUS_MULTIPROC_DIR at an empty directory
+before the workers start (gunicorn.conf.py does this). Every worker then
+writes its samples to memory-mapped files there and /metrics aggregates all
+of them, whichever worker answers the scrape.
+"""
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Latency buckets in seconds, from sub-millisecond queries to slow uploads
+_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to the response start, by route template and status",
+    ["method", "route", "status"], buckets=_BUCKETS
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time, by statement type",
+    ["operation"], buckets=_BUCKETS
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "SQL statements that raised, by statement type", ["operation"])
+R2_REQUEST_SECONDS = Histogram(
+    "r2_request_duration_seconds", "R2 API call time including retries, by operation",
+    ["operation"], buckets=_BUCKETS
+)
+R2_REQUEST_ERRORS = Counter("r2_request_errors_total", "Failed R2 API calls, by operation and error code", ["operation", "code"])
+UPLOADED_BYTES = Counter("storage_uploaded_bytes_total", "Bytes of completed uploads, by upload path", ["path"])
+DOWNLOAD_URL_BYTES = Counter(
+    "storage_download_url_bytes_total", "Size of the files behind issued download URLs (clients fetch them from R2)"
+)
+# Summed over every worker that ever ran, so an upload started and completed on different workers nets to zero
+MULTIPART_IN_FLIGHT = Gauge(
+    "storage_multipart_uploads_in_flight", "Multipart uploads created and not yet completed or aborted",
+    multiprocess_mode="sum"
+)
+
+_SQL_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE", "OTHER")
+# Statement timings are the hottest path, so their label children are bound once
+_DB_QUERY_SECONDS_BY_OPERATION = {operation: DB_QUERY_SECONDS.labels(operation) for operation in _SQL_OPERATIONS}
+
+
+def _sql_operation(statement: str) -> str:
+    operation = statement.lstrip()[:6].upper()
+    return operation if operation in _DB_QUERY_SECONDS_BY_OPERATION else "OTHER"
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing HTTP requests by route template, so path parameters do not explode the label set"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        responded = False
+
+        def observe(status: int):
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(
+                scope["method"], route.path if route is not None else "unmatched", str(status)
+            ).observe(time.perf_counter() - started)
+
+        async def send_with_metrics(message):
+            nonlocal responded
+            if message["type"] == "http.response.start":
+                responded = True
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception:
+            # Unhandled errors become a 500 in the server error middleware outside this one
+            if not responded:
+                observe(500)
+            raise
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is not None:
+        _DB_QUERY_SECONDS_BY_OPERATION[_sql_operation(statement)].observe(time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    if exception_context.statement is not None:
+        DB_QUERY_ERRORS.labels(_sql_operation(exception_context.statement)).inc()
+
+
+def install_db_metrics() -> None:
+    """Time every statement on every engine, including replicas and the async engine's sync core"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+
+
+def _before_r2_call(model, context, **kwargs):
+    context["metrics_operation"] = model.name
+    context["metrics_started"] = time.perf_counter()
+
+
+def _after_r2_call(http_response, parsed, model, context, **kwargs):
+    started = context.get("metrics_started")
+    if started is not None:
+        R2_REQUEST_SECONDS.labels(model.name).observe(time.perf_counter() - started)
+    if http_response.status_code >= 300:
+        R2_REQUEST_ERRORS.labels(model.name, parsed.get("Error", {}).get("Code", str(http_response.status_code))).inc()
+    elif model.name == "CreateMultipartUpload":
+        MULTIPART_IN_FLIGHT.inc()
+    elif model.name in ("CompleteMultipartUpload", "AbortMultipartUpload"):
+        MULTIPART_IN_FLIGHT.dec()
+
+
+def _after_r2_call_error(exception, context, **kwargs):
+    # Raised before any response was parsed, e.g. connection errors and timeouts
+    R2_REQUEST_ERRORS.labels(context.get("metrics_operation", "unknown"), type(exception).__name__).inc()
+
+
+def instrument_s3_client(client) -> None:
+    """Record latency, errors and multipart uploads for every call made through a boto3 S3 client"""
+    client.meta.events.register("before-call.s3", _before_r2_call)
+    client.meta.events.register("after-call.s3", _after_r2_call)
+    client.meta.events.register("after-call-error.s3", _after_r2_call_error)
+
+
+def record_upload(size: int, path: str) -> None:
+    """Count the bytes of a completed upload ("direct" or "multipart")"""
+    UPLOADED_BYTES.labels(path).inc(size or 0)
+
+
+def record_download_url(size: int) -> None:
+    """Count the size of a file whose download URL was issued"""
+    DOWNLOAD_URL_BYTES.inc(size or 0)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus scrape endpoint; aggregates all workers in multiprocess mode"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,109 @@
+import enum
+import os
+
+from sqlalchemy import BigInteger, case, cast, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from core.search import escape_like
+
+# Copy numbers longer than this are treated as part of the name
+MAX_COPY_DIGITS = 9
+# Concurrent writers can claim the same copy number; retry this many times before giving up
+RENAME_ATTEMPTS = 5
+
+
+class NameConflict(str, enum.Enum):
+    """What to do when a new item's name is already taken in its folder"""
+    ERROR = "error"
+    RENAME = "rename"
+
+
+def is_unique_violation(error: IntegrityError) -> bool:
+    """
+    Whether a failed statement hit a unique index.
+
+    psycopg2 and asyncpg errors carry the SQLSTATE (23505 is unique_violation);
+    SQLite only says so in the message.
+    """
+    code = getattr(error.orig, "pgcode", None)
+    if code is not None:
+        return code == "23505"
+    return "UNIQUE constraint failed" in str(error.orig)
+
+
+def flush_or_conflict(db: Session, conflict: Exception) -> None:
+    """
+    Flush pending writes, raising conflict if one of them took a name that is already used.
+
+    Name uniqueness is enforced by the partial unique indexes on files and folders,
+    so a rename or move is a single UPDATE instead of a lookup followed by a write,
+    and two concurrent requests cannot both claim the same name. The transaction is
+    rolled back before raising.
+    """
+    try:
+        db.flush()
+    except IntegrityError as e:
+        db.rollback()
+        if is_unique_violation(e):
+            raise conflict from None
+        raise
+
+
+def numbered_name(name: str, number: int, keep_extension: bool) -> str:
+    """'report.pdf' -> 'report (2).pdf'; without keep_extension the number goes at the end"""
+    stem, extension = os.path.splitext(name) if keep_extension else (name, "")
+    return f"{stem} ({number}){extension}"
+
+
+def next_free_name(db: Session, column, scope: list, name: str, keep_extension: bool) -> str:
+    """
+    Number a taken name after the highest existing copy, e.g. 'report (3).pdf'
+    when 'report.pdf' and 'report (2).pdf' exist.
+
+    The highest copy number is found in SQL among the sibling names shaped like
+    'stem (N)ext', so only one row comes back however many copies there are.
+
+    Args:
+        column: Name column of the table
+        scope: WHERE criteria selecting the siblings (owner, parent folder, live rows)
+        name: The taken name
+        keep_extension: Number before the file extension instead of at the end
+    """
+    stem, extension = os.path.splitext(name) if keep_extension else (name, "")
+    prefix, suffix = f"{stem} (", f"){extension}"
+    # CASE keeps substr from seeing names shorter than prefix + suffix
+    number = case((
+        column.like(f"{escape_like(prefix)}%{escape_like(suffix)}", escape="\\"),
+        func.substr(column, len(prefix) + 1, func.length(column) - len(prefix) - len(suffix))
+    ))
+    highest = db.execute(
+        select(func.max(cast(number, BigInteger))).where(
+            *scope,
+            number.regexp_match(f"^[0-9]{{1,{MAX_COPY_DIGITS}}}$")
+        )
+    ).scalar()
+    return numbered_name(name, (highest or 0) + 1, keep_extension)
+
+
+def add_with_free_name(db: Session, item, column, scope: list, keep_extension: bool) -> None:
+    """
+    Insert item, renaming it to the next free copy name while its name is taken.
+
+    Each attempt runs in a savepoint so a unique violation only undoes the insert.
+    The common case, a free name, costs the INSERT alone.
+
+    Raises:
+        IntegrityError: When every attempt collided or the insert failed for another reason
+    """
+    original = item.name
+    for attempt in range(RENAME_ATTEMPTS):
+        try:
+            with db.begin_nested():
+                db.add(item)
+            return
+        except IntegrityError as e:
+            if not is_unique_violation(e) or attempt == RENAME_ATTEMPTS - 1:
+                raise
+            # The savepoint rollback expunged the item; it is added again with the new name
+            item.name = next_free_name(db, column, scope, original, keep_extension)
@@ -0,0 +1,221 @@
+import re
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Tables hash-partitioned by user_id; folders first because files reference it
+PARTITIONED_TABLES = ("folders", "files")
+SHADOW_SUFFIX = "_partitioned"
+# Shadow indexes carry this suffix until the swap gives them the original names
+INDEX_SUFFIX = "_part"
+# The unpartitioned tables and their indexes are kept under this suffix after the swap
+LEGACY_SUFFIX = "_unpartitioned"
+
+# Per-partition foreign keys as (columns, referenced table, referenced columns).
+# A partitioned table's unique constraints must include user_id, so references to
+# folders carry the owner too; that also guarantees a file's folder has the same owner.
+FOREIGN_KEYS = {
+    "folders": [
+        (("user_id",), "users", ("id",)),
+        (("parent_folder_id", "user_id"), "folders", ("id", "user_id")),
+    ],
+    "files": [
+        (("user_id",), "users", ("id",)),
+        (("folder_id", "user_id"), "folders", ("id", "user_id")),
+    ],
+}
+
+_ZERO_ID = UUID(int=0)
+
+# TG_ARGV: the shadow table and the source's column list. Updates are mirrored in
+# place: deleting and reinserting a row would break the foreign keys of the rows
+# referencing it (a folder's files and subfolders) once add_foreign_keys has run.
+_SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION partition_sync() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        EXECUTE format('DELETE FROM %I WHERE id = $1 AND user_id = $2', TG_ARGV[0]) USING OLD.id, OLD.user_id;
+    ELSIF TG_OP = 'UPDATE' THEN
+        EXECUTE format(
+            'UPDATE %1$I SET (%2$s) = (SELECT %2$s FROM (SELECT ($1).*) AS new) WHERE id = $2 AND user_id = $3',
+            TG_ARGV[0], TG_ARGV[1]
+        ) USING NEW, OLD.id, OLD.user_id;
+    ELSE
+        EXECUTE format('INSERT INTO %I SELECT ($1).*', TG_ARGV[0]) USING NEW;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def shadow_name(table: str) -> str:
+    return f"{table}{SHADOW_SUFFIX}"
+
+
+def shadow_exists(connection: Connection, table: str) -> bool:
+    """Whether the table's partitioned shadow is still waiting to be swapped in"""
+    return connection.execute(
+        text("SELECT to_regclass(:shadow) IS NOT NULL"), {"shadow": shadow_name(table)}
+    ).scalar()
+
+
+def partition_names(connection: Connection, parent: str) -> list[str]:
+    """Names of the partitions attached to a partitioned table"""
+    return list(connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:parent AS regclass) ORDER BY c.relname"
+    ), {"parent": parent}).scalars())
+
+
+def _indexes(connection: Connection, table: str) -> list:
+    return connection.execute(text(
+        "SELECT c.relname AS name, pg_get_indexdef(c.oid) AS definition, i.indisunique AS is_unique, "
+        "i.indisprimary AS is_primary "
+        "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE i.indrelid = CAST(:table AS regclass) ORDER BY c.relname"
+    ), {"table": table}).all()
+
+
+def _shadow_index_sql(index, table: str) -> str:
+    """Rewrite an index definition for the shadow table, adding user_id to unique keys"""
+    method = index.definition.split(" USING ", 1)[1]
+    if index.is_unique and not re.search(r"\buser_id\b", method):
+        match = re.fullmatch(r"(\w+) \(([^()]*)\)(.*)", method)
+        if match is None:
+            raise ValueError(f"Cannot add user_id to unique index {index.name}: {index.definition}")
+        method = f"{match.group(1)} ({match.group(2)}, user_id){match.group(3)}"
+    unique = "UNIQUE " if index.is_unique else ""
+    return f"CREATE {unique}INDEX {index.name}{INDEX_SUFFIX} ON {shadow_name(table)} USING {method}"
+
+
+def create_shadow_table(connection: Connection, table: str, partitions: int) -> None:
+    """
+    Create an empty hash-partitioned copy of a table with the same columns and indexes.
+
+    The primary key becomes (id, user_id). Unique indexes get user_id appended, and
+    the plain index on id is dropped because the primary key already serves it.
+    """
+    shadow = shadow_name(table)
+    connection.execute(text(f"CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY HASH (user_id)"))
+    for remainder in range(partitions):
+        connection.execute(text(
+            f"CREATE TABLE {table}_p{remainder:02d} PARTITION OF {shadow} "
+            f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+        ))
+    connection.execute(text(f"ALTER TABLE {shadow} ADD CONSTRAINT {table}_pkey{INDEX_SUFFIX} PRIMARY KEY (id, user_id)"))
+    for index in _indexes(connection, table):
+        if index.is_primary or index.name == f"ix_{table}_id":
+            continue
+        connection.execute(text(_shadow_index_sql(index, table)))
+
+
+def install_sync_trigger(connection: Connection, table: str) -> None:
+    """
+    Mirror every write on the table into its shadow, inside the writer's transaction.
+
+    Rows updated before the backfill reaches them are not in the shadow yet; the
+    update then changes nothing there and the backfill copies the new version.
+    """
+    columns = connection.execute(text(
+        "SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) FROM pg_attribute "
+        "WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped"
+    ), {"table": table}).scalar()
+    connection.execute(text(_SYNC_FUNCTION))
+    connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_partition_sync ON {table}"))
+    connection.execute(text(
+        f"CREATE TRIGGER {table}_partition_sync AFTER INSERT OR UPDATE OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION partition_sync('{shadow_name(table)}', '{columns}')"
+    ))
+
+
+def drop_shadow_table(connection: Connection, table: str) -> None:
+    connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_partition_sync ON {table}"))
+    connection.execute(text(f"DROP TABLE IF EXISTS {shadow_name(table)} CASCADE"))
+
+
+def backfill_batch(connection: Connection, table: str, after_id: Optional[UUID], batch_size: int) -> tuple:
+    """
+    Copy the next batch of rows in id order into the shadow table.
+
+    Source rows are share-locked while copied, so a concurrent update either
+    finishes first (and the copy reads its result) or waits and then updates
+    the copied row through the sync trigger.
+
+    Returns:
+        (rows copied, last id of the batch or None when the table is exhausted)
+    """
+    after_id = after_id or _ZERO_ID
+    last_id = connection.execute(text(
+        # Postgres has no max(uuid); take the batch's last id by ordering instead
+        f"SELECT id FROM (SELECT id FROM {table} WHERE id > :after ORDER BY id LIMIT :limit) AS batch "
+        f"ORDER BY id DESC LIMIT 1"
+    ), {"after": after_id, "limit": batch_size}).scalar()
+    if last_id is None:
+        return 0, None
+    copied = connection.execute(text(
+        f"INSERT INTO {shadow_name(table)} SELECT * FROM {table} WHERE id > :after AND id <= :last "
+        f"FOR SHARE ON CONFLICT DO NOTHING"
+    ), {"after": after_id, "last": last_id}).rowcount
+    return copied, last_id
+
+
+def add_foreign_keys(connection: Connection, table: str) -> None:
+    """
+    Add the table's foreign keys on each partition of its shadow, online.
+
+    Each key is added NOT VALID (a brief lock, new rows checked from then on) and
+    validated separately, which scans the partition without blocking writes. The
+    connection must be in autocommit mode so every statement commits on its own.
+    """
+    for partition in partition_names(connection, shadow_name(table)):
+        for columns, referenced, referenced_columns in FOREIGN_KEYS[table]:
+            name = f"{partition}_{columns[0]}_fkey"
+            exists = connection.execute(text(
+                "SELECT 1 FROM pg_constraint WHERE conname = :name AND conrelid = CAST(:table AS regclass)"
+            ), {"name": name, "table": partition}).scalar()
+            if not exists:
+                target = shadow_name(referenced) if referenced in PARTITIONED_TABLES else referenced
+                connection.execute(text(
+                    f"ALTER TABLE {partition} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(columns)}) "
+                    f"REFERENCES {target} ({', '.join(referenced_columns)}) NOT VALID"
+                ))
+            connection.execute(text(f"ALTER TABLE {partition} VALIDATE CONSTRAINT {name}"))
+
+
+def row_counts(connection: Connection, table: str) -> tuple:
+    """(source, shadow) row counts read from one snapshot; equal once the backfill is complete"""
+    row = connection.execute(text(
+        f"SELECT (SELECT count(*) FROM {table}) AS source, (SELECT count(*) FROM {shadow_name(table)}) AS shadow"
+    )).one()
+    return row.source, row.shadow
+
+
+def _legacy_name(name: str) -> str:
+    # Postgres truncates identifiers to 63 bytes
+    return f"{name[:63 - len(LEGACY_SUFFIX)]}{LEGACY_SUFFIX}"
+
+
+def swap_tables(connection: Connection, lock_timeout_ms: int = 5000) -> None:
+    """
+    Put the partitioned tables in place of the originals in one short transaction.
+
+    The originals and their indexes are renamed with LEGACY_SUFFIX and stop being
+    written to; drop them once the partitioned tables are trusted. uploads.file_id
+    loses its foreign key, which cannot reference files.id alone any more.
+    """
+    connection.execute(text(f"SET LOCAL lock_timeout = {int(lock_timeout_ms)}"))
+    tables = [name for table in PARTITIONED_TABLES for name in (table, shadow_name(table))]
+    connection.execute(text(f"LOCK TABLE {', '.join(tables)} IN ACCESS EXCLUSIVE MODE"))
+    connection.execute(text("ALTER TABLE IF EXISTS uploads DROP CONSTRAINT IF EXISTS uploads_file_id_fkey"))
+    for table in PARTITIONED_TABLES:
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_partition_sync ON {table}"))
+        for index in _indexes(connection, table):
+            connection.execute(text(f"ALTER INDEX {index.name} RENAME TO {_legacy_name(index.name)}"))
+        connection.execute(text(f"ALTER TABLE {table} RENAME TO {_legacy_name(table)}"))
+        connection.execute(text(f"ALTER TABLE {shadow_name(table)} RENAME TO {table}"))
+        for index in _indexes(connection, table):
+            if index.name.endswith(INDEX_SUFFIX):
+                connection.execute(text(f"ALTER INDEX {index.name} RENAME TO {index.name[:-len(INDEX_SUFFIX)]}"))
@@ -0,0 +1,131 @@
+import threading
+import time
+import uuid
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from core.config import settings
+
+
+class PoolMetrics:
+    """Checkout latency, occupancy and timeouts of one engine's connection pool"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+        self.pool = None
+        self._lock = threading.Lock()
+
+    def checked_out(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.checkout_seconds_total += seconds
+            self.checkout_seconds_max = max(self.checkout_seconds_max, seconds)
+
+    def checked_in(self) -> None:
+        with self._lock:
+            self.in_use -= 1
+
+    def timed_out(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self) -> dict:
+        overflow = self.pool.overflow() if isinstance(self.pool, QueuePool) else None
+        return {
+            "pool": type(self.pool).__name__ if self.pool is not None else None,
+            "size": self.pool.size() if isinstance(self.pool, QueuePool) else None,
+            "in_use": self.in_use,
+            # QueuePool counts from -pool_size while the pool is still filling; only positive values are overflow
+            "overflow": max(overflow, 0) if overflow is not None else None,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "checkout_ms_avg": round(self.checkout_seconds_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "checkout_ms_max": round(self.checkout_seconds_max * 1000, 3)
+        }
+
+
+class _MeteredPool:
+    """Pool mixin timing each checkout (waiting for a slot plus connecting) and tracking occupancy"""
+
+    metrics: PoolMetrics
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics.pool = self
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.timed_out()
+            raise
+        self.metrics.checked_out(time.perf_counter() - started)
+        return connection
+
+    def _do_return_conn(self, record):
+        self.metrics.checked_in()
+        super()._do_return_conn(record)
+
+
+# Metrics of every engine in this process, by engine name
+pool_metrics: dict[str, PoolMetrics] = {}
+
+
+def _metered_pool_class(base, metrics: PoolMetrics):
+    # A class per engine: pools rebuilt by dispose() are created from self.__class__ and keep the metrics
+    return type(f"Metered{base.__name__}", (_MeteredPool, base), {"metrics": metrics})
+
+
+def engine_options(name: str, url: str, is_async: bool = False) -> dict:
+    """
+    Keyword arguments for create_engine/create_async_engine built from the DB_* settings.
+
+    Connections are not pinged on checkout. They are replaced after
+    DB_POOL_RECYCLE_SECONDS, ahead of server and load balancer idle timeouts,
+    and TCP keepalives let the OS notice dead peers between uses; a connection
+    that still fails is invalidated and the pool reconnects. With DB_PGBOUNCER
+    the app keeps no connections of its own (PgBouncer pools them) and asyncpg
+    is kept from caching or naming prepared statements across transactions.
+    """
+    metrics = pool_metrics.setdefault(name, PoolMetrics(name))
+    options = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    connect_args = {}
+
+    if settings.DB_PGBOUNCER:
+        options["poolclass"] = _metered_pool_class(NullPool, metrics)
+        if is_async:
+            connect_args["prepared_statement_cache_size"] = 0
+            connect_args["statement_cache_size"] = 0
+            connect_args["prepared_statement_name_func"] = lambda: f"__asyncpg_{uuid.uuid4()}__"
+    else:
+        options["poolclass"] = _metered_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, metrics)
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS
+        )
+
+    if not is_async and url.startswith("postgresql") and settings.DB_TCP_KEEPALIVE_IDLE_SECONDS > 0:
+        # libpq keepalive parameters; asyncpg has none, so async engines rely on recycle
+        connect_args.update(
+            keepalives=1,
+            keepalives_idle=settings.DB_TCP_KEEPALIVE_IDLE_SECONDS,
+            keepalives_interval=10,
+            keepalives_count=3
+        )
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def pool_stats() -> dict:
+    return {name: metrics.stats() for name, metrics in pool_metrics.items()}
@@ -0,0 +1,141 @@
+"""
+On-demand profiling of single requests with pyinstrument.
+
+ProfilingMiddleware profiles a request when it carries an X-Profile header
+equal to PROFILING_ADMIN_TOKEN, or when it falls in the PROFILING_SAMPLE_RATE
+share of requests. The sampling profiler follows the request's task across
+awaits, including the services it runs inline. The response gets an
+X-Profile-Id header. The HTML report is written to PROFILING_DIR after the
+response is sent, so any worker can serve it from GET /admin/profiles/{id}.
+Only the newest PROFILING_MAX_REPORTS reports are kept.
+
+Requires the pyinstrument package. Neither the middleware nor the admin
+routes are installed unless PROFILING_ENABLED is set, so other deployments
+pay nothing.
+"""
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import time
+import uuid
+from typing import Optional
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+def token_matches(supplied: Optional[str], expected: str) -> bool:
+    """Constant-time comparison; an unset expected token matches nothing"""
+    return bool(expected) and supplied is not None and hmac.compare_digest(supplied, expected)
+
+
+class ProfileStore:
+    """HTML reports plus a JSON summary per profiled request, in a directory shared by the workers"""
+
+    def __init__(self, directory: str, max_reports: int):
+        self.directory = directory
+        self.max_reports = max_reports
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+    def save(self, profile_id: str, profiler, summary: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(profile_id, "html"), "w") as out:
+            out.write(profiler.output_html())
+        # The summary is written last: listings only show complete reports
+        with open(self._path(profile_id, "json"), "w") as out:
+            json.dump(summary, out)
+        self._prune()
+
+    def _prune(self) -> None:
+        summaries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith(".json")),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in summaries[:-self.max_reports or None]:
+            profile_id = entry.name[:-len(".json")]
+            for extension in ("json", "html"):
+                try:
+                    os.remove(self._path(profile_id, extension))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> list[dict]:
+        """Summaries of the stored reports, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        summaries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    with open(entry.path) as summary:
+                        summaries.append(json.load(summary))
+                except (OSError, ValueError):
+                    continue
+        return sorted(summaries, key=lambda summary: summary["started_at"], reverse=True)
+
+    def html(self, profile_id: str) -> Optional[str]:
+        """The HTML report, or None for unknown (or malformed) ids"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, "html")) as report:
+                return report.read()
+        except FileNotFoundError:
+            return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running pyinstrument for requests that ask for it or are sampled"""
+
+    def __init__(self, app, store: ProfileStore, admin_token: str, sample_rate: float, interval: float):
+        from pyinstrument import Profiler
+
+        self.app = app
+        self.profiler_class = Profiler
+        self.store = store
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+    def _wanted(self, scope) -> bool:
+        for key, value in scope["headers"]:
+            if key == PROFILE_HEADER:
+                return token_matches(value.decode("latin-1"), self.admin_token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        summary = {"id": profile_id, "method": scope["method"], "path": scope["path"], "started_at": time.time()}
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile_id.encode())]
+                summary["status"] = message["status"]
+            await send(message)
+
+        profiler = self.profiler_class(interval=self.interval, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profiler.stop()
+            summary["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            summary["route"] = route.path if route is not None else None
+            # Rendering takes longer than most requests; the response has already been sent
+            try:
+                await asyncio.to_thread(self.store.save, profile_id, profiler, summary)
+            except OSError as e:
+                print(f"Warning: Failed to store profile {profile_id}: {str(e)}")
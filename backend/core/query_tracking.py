@@ -0,0 +1,171 @@
+"""
+Per-request SQL statement counting, N+1 detection and query budgets.
+
+QueryTrackingMiddleware gives every request a QueryLog and a SQLAlchemy
+before_cursor_execute listener on every engine appends each statement to the
+log of the request that issued it. The log lives in a context variable, which
+Starlette and AsyncService copy into the threads that run sync services, so
+statements from any engine or session are attributed correctly.
+
+After the response a request is flagged when one statement shape (the SQL
+text with IN lists collapsed) ran QUERY_REPEAT_THRESHOLD times or more, the
+usual signature of a per-row lookup inside a loop, or when it issued more
+statements than its endpoint's @query_budget. Flags are printed as warnings,
+with the service call sites of each repeated statement when
+QUERY_TRACKING_CALL_SITES is on; with QUERY_BUDGET_ENFORCE on an exceeded
+budget raises QueryBudgetExceeded, which fails the test that made the request.
+
+Nothing here is installed unless QUERY_TRACKING_ENABLED is set, so production
+requests pay nothing for it.
+"""
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SITE_PACKAGES = f"{os.sep}site-packages{os.sep}"
+# Application frames reported per call site, innermost first
+_CALL_SITE_DEPTH = 3
+
+# Bound parameter lists of any length, e.g. "IN (?, ?, ?)" or "IN (%(id_1_1)s, %(id_1_2)s)"
+_PARAMETER_LIST = re.compile(r"\((?:\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+_current_log: ContextVar[Optional["QueryLog"]] = ContextVar("query_log", default=None)
+# Lists receiving (request name, QueryLog) for every finished request, see record_requests
+_recorders: list[list] = []
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised after a request issued more statements than its endpoint's budget allows"""
+
+
+def query_budget(statements: int) -> Callable:
+    """
+    Declare the most SQL statements one request to an endpoint may issue.
+
+    Place it below the router decorator so the route registers the marked
+    function. Count the worst case, including the principal lookup made when
+    the token is not in the auth cache.
+    """
+    def mark(endpoint: Callable) -> Callable:
+        endpoint.query_budget = statements
+        return endpoint
+    return mark
+
+
+def statement_shape(statement: str) -> str:
+    """SQL text with whitespace normalized and bound parameter lists collapsed to one placeholder"""
+    return _PARAMETER_LIST.sub("(?)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _call_site() -> str:
+    """The innermost application frames below the statement, e.g. 'services/folder_service.py:171 get_folder_tree'"""
+    frames = []
+    frame = sys._getframe(2)
+    while frame is not None and len(frames) < _CALL_SITE_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_BACKEND_DIR) and _SITE_PACKAGES not in filename and filename != __file__:
+            frames.append(f"{os.path.relpath(filename, _BACKEND_DIR)}:{frame.f_lineno} {frame.f_code.co_name}")
+        frame = frame.f_back
+    return " <- ".join(frames) or "unknown"
+
+
+class QueryLog:
+    """Statements issued while serving one request"""
+
+    def __init__(self, capture_sites: bool = False):
+        self.count = 0
+        self.shapes: Counter = Counter()
+        # shape -> Counter of call sites, only when capture_sites is on (walking the stack is slow)
+        self.sites: dict[str, Counter] = {}
+        self.capture_sites = capture_sites
+
+    def record(self, statement: str) -> None:
+        shape = statement_shape(statement)
+        self.count += 1
+        self.shapes[shape] += 1
+        if self.capture_sites:
+            self.sites.setdefault(shape, Counter())[_call_site()] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statement shapes issued at least threshold times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    log = _current_log.get()
+    if log is not None:
+        log.record(statement)
+
+
+def install_query_tracking() -> None:
+    """Attribute every statement on every engine to the request being served"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def record_requests():
+    """
+    Collect (request name, QueryLog) for every request finished inside the block.
+
+    For tests and benchmarks driving the app through TestClient, whose requests
+    run in another thread and so cannot share the caller's context variables.
+    Request names look like 'PUT /folders/{folder_id}/move'.
+    """
+    requests = []
+    _recorders.append(requests)
+    try:
+        yield requests
+    finally:
+        _recorders.remove(requests)
+
+
+class QueryTrackingMiddleware:
+    """ASGI middleware counting each request's statements and flagging repeats and exceeded budgets"""
+
+    def __init__(self, app, repeat_threshold: int, capture_sites: bool = False, enforce: bool = False):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+        self.capture_sites = capture_sites
+        self.enforce = enforce
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        log = QueryLog(self.capture_sites)
+        token = _current_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_log.reset(token)
+        self._check(scope, log)
+
+    def _check(self, scope, log: QueryLog) -> None:
+        # The router stores the matched route in the scope
+        route = scope.get("route")
+        name = f"{scope['method']} {route.path if route is not None else scope['path']}"
+        for requests in _recorders:
+            requests.append((name, log))
+
+        budget = getattr(getattr(route, "endpoint", None), "query_budget", None)
+        over_budget = budget is not None and log.count > budget
+        repeated = log.repeated(self.repeat_threshold)
+        if over_budget:
+            print(f"Warning: {name} issued {log.count} SQL statements, over its budget of {budget}")
+        for shape, count in repeated:
+            print(f"Warning: {name} issued the same SQL statement {count} times (possible N+1): {shape[:200]}")
+            for site, site_count in log.sites.get(shape, {}).items():
+                print(f"    {site_count}x {site}")
+        if over_budget and self.enforce:
+            raise QueryBudgetExceeded(f"{name} issued {log.count} SQL statements, over its budget of {budget}")
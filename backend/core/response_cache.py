@@ -0,0 +1,134 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+from uuid import UUID
+
+from fastapi import Response
+
+from core.config import settings
+from core.etag import CACHE_CONTROL
+
+
+class MemoryBackend:
+    """Thread-safe in-process LRU bounded by entry count and total bytes"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = body
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+
+class RedisBackend:
+    """Shared cache across workers and hosts; requires the redis package"""
+
+    def __init__(self, url: str, ttl_seconds: int):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, body: bytes) -> None:
+        self.client.set(key, body, ex=self.ttl_seconds)
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(match="rc:*"):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """
+    Cache of pre-serialized JSON response bodies.
+
+    Keys embed the user's change version, which every FileService and
+    FolderService mutation bumps in its own transaction. A mutation therefore
+    makes all of the user's cached responses unreachable at once, on every
+    worker and with any backend; the stale bodies age out of the LRU (or TTL).
+    """
+
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        body = self.backend.get(key)
+        if body is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return body
+
+    def set(self, key: str, body: bytes) -> None:
+        if self.enabled:
+            self.backend.set(key, body)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size_bytes": getattr(self.backend, "size_bytes", None)
+        }
+
+
+def cache_key(endpoint: str, user_id: UUID, version: str, **params) -> str:
+    """Build a cache key from the endpoint, user, change version (ETag) and query parameters"""
+    query = "&".join(f"{name}={params[name]}" for name in sorted(params))
+    return f"rc:{user_id}:{version}:{endpoint}?{query}"
+
+
+def json_bytes_response(body: bytes, etag: str) -> Response:
+    """Return already-serialized JSON bytes with the listing validator headers"""
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    )
+
+
+def _create_backend():
+    if settings.RESPONSE_CACHE_ENABLED and settings.RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(settings.RESPONSE_CACHE_REDIS_URL, settings.RESPONSE_CACHE_TTL_SECONDS)
+    return MemoryBackend(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_MAX_BYTES)
+
+
+response_cache = ResponseCache(_create_backend(), enabled=settings.RESPONSE_CACHE_ENABLED)
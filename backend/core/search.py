@@ -0,0 +1,43 @@
+import enum
+
+from sqlalchemy.sql import ColumnElement
+
+
+class SearchMode(str, enum.Enum):
+    PREFIX = "prefix"
+    SUBSTRING = "substring"
+    FUZZY = "fuzzy"
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input is matched literally"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def build_name_filter(column, query: str, mode: SearchMode, dialect_name: str) -> ColumnElement:
+    """
+    Build a case-insensitive name predicate for the given search mode.
+
+    On PostgreSQL, ILIKE patterns and the trigram similarity operator (%) are both
+    served by the gin_trgm_ops indexes on files.name and folders.name. Other
+    dialects (e.g. SQLite for offline testing) fall back to plain LIKE, with fuzzy
+    mode degrading to a substring match.
+
+    Args:
+        column: Name column to match against
+        query: User search text
+        mode: Prefix, substring or fuzzy matching
+        dialect_name: Name of the bound SQLAlchemy dialect
+
+    Returns:
+        SQL expression usable in a WHERE clause
+    """
+    if mode == SearchMode.FUZZY and dialect_name == "postgresql":
+        return column.op("%")(query)
+
+    escaped = escape_like(query)
+    if mode == SearchMode.PREFIX:
+        pattern = f"{escaped}%"
+    else:
+        pattern = f"%{escaped}%"
+    return column.ilike(pattern, escape="\\")
@@ -1,11 +1,26 @@
 from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
 from typing import Optional
+import asyncio
+import uuid
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from core.config import settings
+from core.tracing import traced
+from exceptions.exceptions import ServerBusyException
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context; hashes with any other bcrypt cost are flagged for rehash
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_slots: Optional[asyncio.Semaphore] = None
+_hash_pending = 0
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -13,11 +28,64 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, Optional[str]]:
+    """Verify a password and return a replacement hash if the stored one uses an outdated cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
 
+async def _run_in_hash_pool(fn, *args):
+    """
+    Run a bcrypt function in the password hashing process pool.
+
+    At most PASSWORD_HASH_WORKERS calls run at once; further calls wait for a slot
+    until PASSWORD_HASH_MAX_PENDING calls are queued, after which new calls are
+    shed with a 429 instead of piling up behind a login burst.
+    """
+    global _hash_pool, _hash_slots, _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise ServerBusyException("Too many concurrent sign-in attempts, please retry shortly")
+
+    workers = max(1, settings.PASSWORD_HASH_WORKERS)
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(max_workers=workers)
+        _hash_slots = asyncio.Semaphore(workers)
+
+    _hash_pending += 1
+    try:
+        async with _hash_slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_hash_pool, fn, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def verify_and_update_password_async(
+    plain_password: str,
+    hashed_password: str
+) -> tuple[bool, Optional[str]]:
+    """Async verify_and_update_password that runs bcrypt off the event loop."""
+    return await _run_in_hash_pool(verify_and_update_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Async get_password_hash that runs bcrypt off the event loop."""
+    return await _run_in_hash_pool(get_password_hash, password)
+
+
+def shutdown_password_hashing():
+    """Stop the password hashing worker processes."""
+    global _hash_pool, _hash_slots
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+        _hash_slots = None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -27,11 +95,12 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(seconds=settings.ACCESS_TOKEN_EXPIRE_SECONDS)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow(), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 
+@traced("jwt.verify")
 def verify_token(token: str) -> Optional[dict]:
     """Verify and decode a JWT token."""
     try:
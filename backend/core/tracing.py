@@ -0,0 +1,256 @@
+"""
+OpenTelemetry tracing for requests, service methods, SQL, commits and R2 calls.
+
+TracingMiddleware opens a server span per request, continuing the caller's
+trace when a W3C traceparent header is sent, and returns the trace id in the
+X-Trace-Id response header. Inside it, spans are opened for every public
+FileService and FolderService method (@traced_service), token verification,
+each SQL statement, each session commit and each R2 API call, so a slow upload
+breaks down into JWT decoding, folder lookups, put_object and the commit.
+
+Spans are exported in batches over OTLP/HTTP (TRACING_EXPORTER=otlp, endpoint
+from the standard OTEL_EXPORTER_OTLP_* variables) or appended as JSON lines to
+TRACING_FILE_PATH (TRACING_EXPORTER=file), which works offline. Only
+TRACING_SAMPLE_RATIO of new traces are recorded; incoming traceparent
+decisions are honoured. Child spans are only created inside a recorded trace,
+so unsampled requests cost one context lookup per call.
+
+Requires opentelemetry-sdk, plus opentelemetry-exporter-otlp-proto-http for
+OTLP. Nothing is imported while TRACING_ENABLED is off, and the decorators then
+return their targets unchanged.
+"""
+import functools
+import inspect
+import os
+from typing import Callable
+
+from core.config import settings
+
+TRACE_ID_HEADER = b"x-trace-id"
+_TRACER_NAME = "g-drive"
+_SESSION_SPAN_KEY = "trace_commit_span"
+
+_provider = None
+
+
+def _recording_tracer():
+    """The tracer, or None outside a recorded trace (unsampled or no request)"""
+    from opentelemetry import trace
+
+    if not trace.get_current_span().is_recording():
+        return None
+    return trace.get_tracer(_TRACER_NAME)
+
+
+def traced(name: str) -> Callable:
+    """Run the decorated function in a span called name; a no-op when tracing is disabled"""
+    def decorate(function: Callable) -> Callable:
+        if not settings.TRACING_ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = _recording_tracer()
+            if tracer is None:
+                return function(*args, **kwargs)
+            with tracer.start_as_current_span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+    return decorate
+
+
+def traced_service(cls):
+    """Wrap every public method of a service class in a span named 'Class.method'"""
+    if not settings.TRACING_ENABLED:
+        return cls
+    for name, attr in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.isfunction(attr):
+            setattr(cls, name, traced(f"{cls.__name__}.{name}")(attr))
+    return cls
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the server span of each request and returning its trace id"""
+
+    def __init__(self, app):
+        from opentelemetry import propagate, trace
+
+        self.app = app
+        self.propagator = propagate.get_global_textmap()
+        self.tracer = trace.get_tracer(_TRACER_NAME)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        from opentelemetry.trace import SpanKind, Status, StatusCode, format_trace_id
+
+        carrier = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        with self.tracer.start_as_current_span(
+            scope["method"], context=self.propagator.extract(carrier), kind=SpanKind.SERVER,
+            attributes={"http.request.method": scope["method"], "url.path": scope["path"]}
+        ) as span:
+            trace_id = format_trace_id(span.get_span_context().trace_id).encode("latin-1")
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(TRACE_ID_HEADER, trace_id)]
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.set_status(Status(StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                # The router stores the matched route in the scope
+                route = scope.get("route")
+                if route is not None:
+                    span.update_name(f"{scope['method']} {route.path}")
+                    span.set_attribute("http.route", route.path)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    tracer = _recording_tracer()
+    if tracer is not None and context is not None:
+        from opentelemetry.trace import SpanKind
+
+        context._trace_span = tracer.start_span(
+            statement.lstrip().split(None, 1)[0].upper(), kind=SpanKind.CLIENT,
+            attributes={"db.system": conn.dialect.name, "db.statement": statement}
+        )
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        context._trace_span = None
+        span.end()
+
+
+def _handle_error(exception_context):
+    context = exception_context.execution_context
+    span = getattr(context, "_trace_span", None)
+    if span is not None:
+        from opentelemetry.trace import Status, StatusCode
+
+        context._trace_span = None
+        span.record_exception(exception_context.original_exception)
+        span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
+
+def _before_commit(session):
+    tracer = _recording_tracer()
+    if tracer is not None:
+        session.info[_SESSION_SPAN_KEY] = tracer.start_span("session.commit")
+
+
+def _after_commit(session):
+    span = session.info.pop(_SESSION_SPAN_KEY, None)
+    if span is not None:
+        span.end()
+
+
+def _after_rollback(session):
+    # A commit whose flush failed ends here instead of in after_commit
+    span = session.info.pop(_SESSION_SPAN_KEY, None)
+    if span is not None:
+        from opentelemetry.trace import Status, StatusCode
+
+        span.set_status(Status(StatusCode.ERROR, "rolled back"))
+        span.end()
+
+
+def install_db_tracing() -> None:
+    """Trace every statement on every engine and every session commit"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.orm import Session
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        event.listen(Session, "before_commit", _before_commit)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+
+
+def _before_r2_call(model, context, **kwargs):
+    tracer = _recording_tracer()
+    if tracer is not None:
+        from opentelemetry.trace import SpanKind
+
+        context["trace_span"] = tracer.start_span(f"S3.{model.name}", kind=SpanKind.CLIENT, attributes={
+            "rpc.system": "aws-api", "rpc.service": "S3", "rpc.method": model.name
+        })
+
+
+def _after_r2_call(http_response, parsed, model, context, **kwargs):
+    span = context.pop("trace_span", None)
+    if span is not None:
+        span.set_attribute("http.response.status_code", http_response.status_code)
+        if http_response.status_code >= 300:
+            from opentelemetry.trace import Status, StatusCode
+
+            span.set_status(Status(StatusCode.ERROR, parsed.get("Error", {}).get("Code", "")))
+        span.end()
+
+
+def _after_r2_call_error(exception, context, **kwargs):
+    span = context.pop("trace_span", None)
+    if span is not None:
+        from opentelemetry.trace import Status, StatusCode
+
+        span.record_exception(exception)
+        span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
+
+def trace_s3_client(client) -> None:
+    """Open a span for every call made through a boto3 S3 client, retries included"""
+    client.meta.events.register("before-call.s3", _before_r2_call)
+    client.meta.events.register("after-call.s3", _after_r2_call)
+    client.meta.events.register("after-call-error.s3", _after_r2_call_error)
+
+
+def _create_exporter():
+    if settings.TRACING_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        return OTLPSpanExporter()
+    if settings.TRACING_EXPORTER == "file":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+
+        # One JSON object per line; appends from several workers stay whole lines
+        out = open(settings.TRACING_FILE_PATH, "a", buffering=1)
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + os.linesep)
+    raise ValueError(f"Unknown TRACING_EXPORTER: {settings.TRACING_EXPORTER}")
+
+
+def start_tracing() -> None:
+    """Install the tracer provider and exporter of this worker process; call after any fork"""
+    global _provider
+    if _provider is not None:
+        return
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.TRACING_SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.TRACING_SAMPLE_RATIO))
+    )
+    _provider.add_span_processor(BatchSpanProcessor(_create_exporter()))
+    trace.set_tracer_provider(_provider)
+
+
+def stop_tracing() -> None:
+    """Export the spans still queued in this process"""
+    if _provider is not None:
+        _provider.force_flush()
@@ -1,25 +1,61 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from typing import Optional, Union
+import itertools
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
+from core.config import settings
+from core.pool import engine_options
+
 load_dotenv()
 
 # Get database URL from environment variable or use default
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/gdrive")
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_size=10,
-    max_overflow=20
-)
+
+def _async_url(url: str) -> str:
+    """Swap a sync driver URL for its asyncio driver equivalent"""
+    if url.startswith("postgresql://"):
+        return "postgresql+asyncpg://" + url[len("postgresql://"):]
+    if url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url[len("postgresql+psycopg2://"):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_url(DATABASE_URL))
+
+# Create SQLAlchemy engine (pool sizing, recycle and PgBouncer mode come from the DB_* settings)
+engine = create_engine(DATABASE_URL, **engine_options("primary", DATABASE_URL))
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine is only built when enabled so the asyncpg driver stays optional
+async_engine = None
+AsyncSessionLocal = None
+if settings.DATABASE_ASYNC:
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        **engine_options("primary_async", ASYNC_DATABASE_URL, is_async=True)
+    )
+    # Objects are serialized after commit, outside the greenlet, so they must not expire
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+# Session type yielded by get_service_db
+DBSession = Union[Session, AsyncSession]
+
 # Create Base class for models
 Base = declarative_base()
 
@@ -32,3 +68,114 @@ def get_db():
     finally:
         db.close()
 
+
+# Dependency to get an async DB session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Dependency used by routers: async session when DATABASE_ASYNC is enabled, sync otherwise
+get_service_db = get_async_db if settings.DATABASE_ASYNC else get_db
+
+
+# Replication lag in seconds as seen by a replica; non-Postgres test replicas report no lag
+_REPLICA_LAG_SQL = {
+    "postgresql": text(
+        "SELECT CASE WHEN pg_is_in_recovery() "
+        "THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+        "ELSE 0 END"
+    ),
+}
+
+
+class Replica:
+    """A read replica with its own engine, session factories and health state"""
+
+    def __init__(self, url: str, name: str = "replica"):
+        self.url = url
+        self.engine = create_engine(url, **engine_options(name, url))
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.AsyncSessionLocal = None
+        if settings.DATABASE_ASYNC:
+            self.AsyncSessionLocal = async_sessionmaker(
+                create_async_engine(_async_url(url), **engine_options(f"{name}_async", _async_url(url), is_async=True)),
+                class_=AsyncSession,
+                autoflush=False,
+                expire_on_commit=False
+            )
+        self.healthy = True
+        self.lag_seconds = 0.0
+
+    def check(self):
+        """Measure replication lag and mark the replica unhealthy if it is unreachable or too far behind"""
+        lag_sql = _REPLICA_LAG_SQL.get(self.engine.dialect.name)
+        try:
+            with self.engine.connect() as connection:
+                self.lag_seconds = float(connection.execute(lag_sql).scalar() or 0) if lag_sql is not None else 0.0
+            self.healthy = self.lag_seconds <= settings.REPLICA_MAX_LAG_SECONDS
+        except Exception:
+            self.healthy = False
+
+
+# Response header carrying the time of the client's last write; clients echo it on later
+# requests so any worker can keep their reads on the primary (see ReplicaSet.choose)
+LAST_WRITE_HEADER = "X-Last-Write"
+
+
+class ReplicaSet:
+    """
+    Round-robin selection over healthy read replicas.
+
+    Users who mutated data within READ_YOUR_WRITES_SECONDS are pinned to the primary
+    so they read their own writes. The write time travels with the client in the
+    X-Last-Write header, which holds across workers; clients that do not echo it
+    are still pinned by the worker that served their write.
+    """
+
+    def __init__(self, urls: list[str]):
+        self.replicas = [Replica(url, f"replica_{i}") for i, url in enumerate(urls)]
+        self._counter = itertools.count()
+        self._recent_writers: dict = {}
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def check_health(self):
+        for replica in self.replicas:
+            replica.check()
+
+    def mark_write(self, user_id):
+        """Pin a user's reads to the primary for the read-your-writes window"""
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writers[user_id] = now + settings.READ_YOUR_WRITES_SECONDS
+            if len(self._recent_writers) > 10000:
+                self._recent_writers = {
+                    uid: until for uid, until in self._recent_writers.items() if until > now
+                }
+
+    def choose(self, user_id=None, last_write: Optional[float] = None) -> Optional[Replica]:
+        """
+        Pick a healthy replica for a read, or None to use the primary.
+
+        Args:
+            user_id: The reading user
+            last_write: Epoch seconds of the client's last write, from X-Last-Write
+        """
+        if not self.replicas:
+            return None
+        if last_write is not None and 0 <= time.time() - last_write < settings.READ_YOUR_WRITES_SECONDS:
+            return None
+        if user_id is not None and self._recent_writers.get(user_id, 0) > time.monotonic():
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+
+replicas = ReplicaSet(settings.DATABASE_REPLICA_URLS)
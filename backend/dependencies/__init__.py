@@ -1,4 +1,5 @@
 from .auth import get_current_user, get_current_active_user
+from .db import get_read_db
+from .etag import get_listing_etag
 
-__all__ = ["get_current_user", "get_current_active_user"]
-
+__all__ = ["get_current_user", "get_current_active_user", "get_read_db", "get_listing_etag"]
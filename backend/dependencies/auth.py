@@ -1,40 +1,90 @@
-from fastapi import Depends
+from fastapi import Depends, Header, Request
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 from typing import Optional
+import time
 from database import get_db
 from models.user import User
+from models.revoked_token import RevokedToken
+from core.config import settings
 from core.security import verify_token
-from exceptions.exceptions import AuthenticationException, InactiveUserException
+from core.auth_cache import UserPrincipal, principal_cache, is_revoked
+from core.lookup_cache import remember
+from core.profiling import token_matches
+from exceptions.exceptions import AuthenticationException, ForbiddenException, InactiveUserException
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 
+def _load_principal(db: Session, payload: dict) -> UserPrincipal:
+    """Resolve a token's user, rejecting it if revoked, in one statement"""
+    token_revoked = exists().where(RevokedToken.jti == payload.get("jti"))
+    principal = UserPrincipal.from_claims(payload) if settings.AUTH_TRUST_TOKEN_CLAIMS else None
+
+    if principal is not None:
+        # The claims stand in for the user row; only the revocation state is read
+        row = db.query(User.tokens_revoked_at, token_revoked).filter(User.id == principal.id).first()
+        if row is None:
+            raise AuthenticationException()
+        tokens_revoked_at, revoked = row
+    else:
+        row = db.query(User, token_revoked).filter(User.username == payload["sub"]).first()
+        if row is None:
+            raise AuthenticationException()
+        user, revoked = row
+        # Routers share this session, so a later lookup of the user by id is free
+        remember(db, (User, user.id), user)
+        principal = UserPrincipal.from_user(user)
+        tokens_revoked_at = user.tokens_revoked_at
+
+    if is_revoked(payload, tokens_revoked_at, revoked):
+        raise AuthenticationException()
+    return principal
+
+
 def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user from JWT token."""
+) -> UserPrincipal:
+    """
+    Get the current authenticated user from JWT token.
+
+    Resolved principals are cached per token until the cache TTL or the token's
+    expiry, whichever comes first, so repeated requests skip the user lookup.
+    Revocations are stored in the database and checked on every cache miss, so
+    a token revoked through another worker stops working within the cache TTL.
+    """
     payload = verify_token(token)
     if payload is None:
         raise AuthenticationException()
-    
+
     username: Optional[str] = payload.get("sub")
     if username is None:
         raise AuthenticationException()
-    
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        raise AuthenticationException()
-    
-    return user
+
+    principal = principal_cache.get(token)
+    if principal is None:
+        principal = _load_principal(db, payload)
+        ttl = min(settings.AUTH_CACHE_TTL_SECONDS, payload.get("exp", 0) - time.time())
+        principal_cache.set(token, principal, ttl)
+
+    # Lets middleware attribute the request (e.g. read-your-writes tracking)
+    request.state.user_id = principal.id
+    return principal
 
 
 def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: UserPrincipal = Depends(get_current_user)
+) -> UserPrincipal:
     """Get the current active user."""
     if not current_user.is_active:
         raise InactiveUserException()
     return current_user
 
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Allow the request only with the operator token (PROFILING_ADMIN_TOKEN) in X-Admin-Token"""
+    if not token_matches(x_admin_token, settings.PROFILING_ADMIN_TOKEN):
+        raise ForbiddenException("Admin token required")
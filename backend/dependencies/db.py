@@ -0,0 +1,43 @@
+from typing import Optional
+
+from fastapi import Depends, Header
+
+from database import SessionLocal, AsyncSessionLocal, replicas
+from core.config import settings
+from core.auth_cache import UserPrincipal
+from dependencies.auth import get_current_active_user
+
+
+def _last_write(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+async def get_read_db(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    x_last_write: Optional[str] = Header(None)
+):
+    """
+    Session for read-only endpoints.
+
+    Uses a healthy read replica when replicas are configured, unless the user
+    wrote recently (read-your-writes: the X-Last-Write header echoed by the
+    client, or a write served by this worker), and the primary otherwise.
+    Yields an AsyncSession when DATABASE_ASYNC is enabled, like get_service_db.
+    """
+    replica = replicas.choose(current_user.id, _last_write(x_last_write))
+
+    if settings.DATABASE_ASYNC:
+        session_factory = replica.AsyncSessionLocal if replica else AsyncSessionLocal
+        async with session_factory() as db:
+            yield db
+        return
+
+    session_factory = replica.SessionLocal if replica else SessionLocal
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
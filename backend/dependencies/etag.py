@@ -0,0 +1,23 @@
+from fastapi import Depends
+
+from database import DBSession
+from core.auth_cache import UserPrincipal
+from core.etag import version_etag
+from services.change_service import ChangeService
+from services.async_service import AsyncService
+from dependencies.auth import get_current_active_user
+from dependencies.db import get_read_db
+
+
+async def get_listing_etag(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
+) -> str:
+    """
+    Weak ETag for the current user's listings.
+
+    Read from the same session as the listing itself and before it, so a stale
+    replica yields an older ETag rather than a newer ETag on older data.
+    """
+    change_service = AsyncService(ChangeService, db)
+    return version_etag(await change_service.get_version(current_user.id))
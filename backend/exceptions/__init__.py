@@ -6,6 +6,7 @@ from .exceptions import (
     InactiveUserException,
     UserNotFoundException,
     AuthenticationException,
+    ServerBusyException,
 )
 
 __all__ = [
@@ -16,5 +17,6 @@ __all__ = [
     "InactiveUserException",
     "UserNotFoundException",
     "AuthenticationException",
+    "ServerBusyException",
 ]
 
@@ -64,6 +64,25 @@ class AuthenticationException(BaseAPIException):
         )
 
 
+
+class ForbiddenException(BaseAPIException):
+    """Raised when the caller is authenticated but not allowed to use an endpoint"""
+    def __init__(self, detail: str = "Not allowed"):
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=detail
+        )
+
+class ServerBusyException(BaseAPIException):
+    """Raised when a bounded worker pool is saturated and the request is shed"""
+    def __init__(self, detail: str = "Server is busy, please retry shortly", retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
 # File Upload Exceptions
 class FileUploadException(BaseAPIException):
     """Raised when file upload fails"""
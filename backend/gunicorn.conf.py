@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for production: uvicorn workers forked from a preloaded parent.
+
+The parent imports main:app once (FastAPI, SQLAlchemy, pydantic models, routers)
+and every worker shares those pages copy-on-write instead of re-importing them,
+so workers boot in milliseconds and use less memory. Importing the app has no
+side effects, and anything connection-like is created per worker after the fork.
+
+Usage (from the backend directory, after `alembic upgrade head`):
+    gunicorn main:app -c gunicorn.conf.py
+"""
+import os
+import shutil
+import tempfile
+
+# Workers share Prometheus samples through files here. It must be set, and emptied of a
+# previous run's samples, before the preloaded app imports prometheus_client.
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "gdrive-metrics"))
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir)
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# Exported so the preloaded app sizes its per-worker pools (e.g. PASSWORD_HASH_WORKERS) to match
+workers = int(os.environ.setdefault("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# Let in-flight uploads and SSE streams finish on reload or shutdown
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+
+def child_exit(server, worker):
+    # Drops the exited worker's live gauges; its counters and histograms keep counting
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    # Drop any pooled connections the parent may have opened while importing;
+    # close=False leaves the parent's sockets alone instead of closing them under it
+    from database import engine, async_engine, replicas
+
+    engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+    for replica in replicas.replicas:
+        replica.engine.dispose(close=False)
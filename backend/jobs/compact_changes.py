@@ -0,0 +1,61 @@
+"""
+Compact the delta sync change log.
+
+Removes entries superseded by a newer entry for the same item, and delete
+entries older than CHANGES_RETENTION_DAYS. Users are processed in
+keyset-ordered batches, one transaction per user.
+
+Usage (from the backend directory):
+    python -m jobs.compact_changes                 # single pass
+    python -m jobs.compact_changes --interval 3600 # run every hour
+"""
+import argparse
+import time
+
+from database import SessionLocal
+from models.change import UserChangeVersion
+from core.config import settings
+from services.change_service import ChangeService
+
+
+def compact_all(retention_days: int, batch_size: int = 500) -> dict:
+    """Compact every user's change log, returning how many entries were removed"""
+    report = {"users": 0, "superseded": 0, "pruned": 0}
+    last_id = None
+    while True:
+        with SessionLocal() as db:
+            query = db.query(UserChangeVersion.user_id).order_by(UserChangeVersion.user_id)
+            if last_id is not None:
+                query = query.filter(UserChangeVersion.user_id > last_id)
+            user_ids = [row.user_id for row in query.limit(batch_size).all()]
+
+        if not user_ids:
+            return report
+
+        for user_id in user_ids:
+            with SessionLocal() as db:
+                result = ChangeService(db).compact_user(user_id, retention_days)
+            report["users"] += 1
+            report["superseded"] += result["superseded"]
+            report["pruned"] += result["pruned"]
+        last_id = user_ids[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--retention-days", type=int, default=settings.CHANGES_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--interval", type=int, default=0, help="Seconds between runs; 0 runs once")
+    args = parser.parse_args()
+
+    while True:
+        started = time.perf_counter()
+        report = compact_all(args.retention_days, args.batch_size)
+        print(f"Compacted changes: {report} in {time.perf_counter() - started:.1f}s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
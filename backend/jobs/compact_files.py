@@ -0,0 +1,159 @@
+"""
+Remove tombstoned rows from the files table.
+
+Deleting a file only marks its row DELETED, so the table and every index on it
+keep growing and each listing has to filter the dead rows out. This job
+hard-deletes rows that have been DELETED for longer than
+FILES_TOMBSTONE_RETENTION_DAYS, together with their multipart upload records;
+with --archive the rows are copied to files_archive first.
+
+Rows are taken in id order through the partial ix_files_tombstones index, one
+short transaction per batch. Between batches the job sleeps and waits for any
+read replica lagging more than --max-lag seconds to catch up.
+
+Freed table and index space is reused once (auto)vacuum has processed the
+table; --vacuum runs VACUUM (ANALYZE) at the end of the pass.
+
+Usage (from the backend directory):
+    python -m jobs.compact_files                  # single pass
+    python -m jobs.compact_files --archive        # keep a copy in files_archive
+    python -m jobs.compact_files --interval 86400 # run every day
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import String, cast, delete, insert, select, text
+
+from database import SessionLocal, engine, replicas
+from models.file import File, FileStatus, FileArchive
+from models.uploads import Upload
+from models.upload_parts import UploadPart
+from core.config import settings
+
+# Average heap and index bytes per files row, from planner statistics
+_BYTES_PER_ROW_SQL = text(
+    "SELECT pg_relation_size(c.oid)::float8 / NULLIF(GREATEST(c.reltuples, 0), 0) AS table_bytes, "
+    "(SELECT SUM(pg_relation_size(i.indexrelid)) FROM pg_index i WHERE i.indrelid = c.oid)::float8 "
+    "/ NULLIF(GREATEST(c.reltuples, 0), 0) AS index_bytes "
+    "FROM pg_class c WHERE c.oid = 'files'::regclass"
+)
+
+ARCHIVE_COLUMNS = ["id", "user_id", "name", "size", "mime", "folder_id", "storage_key", "status", "created_at", "updated_at"]
+
+
+def _bytes_per_row() -> Optional[tuple]:
+    """(table, index) bytes per row on Postgres; None on databases without size functions"""
+    if engine.dialect.name != "postgresql":
+        return None
+    with engine.connect() as connection:
+        row = connection.execute(_BYTES_PER_ROW_SQL).one()
+    return row.table_bytes or 0.0, row.index_bytes or 0.0
+
+
+def _wait_for_replicas(max_lag: float):
+    """Block while any reachable read replica is further behind than max_lag seconds"""
+    while replicas:
+        replicas.check_health()
+        if all(replica.lag_seconds <= max_lag for replica in replicas.replicas):
+            return
+        time.sleep(1)
+
+
+def compact_batch(db, cutoff: datetime, after_id, batch_size: int, archive: bool) -> tuple:
+    """
+    Remove one batch of tombstones with ids above after_id and commit.
+
+    Returns:
+        (files removed, uploads removed, last id scanned or None when done)
+    """
+    query = db.query(File.id).filter(File.status == FileStatus.DELETED, File.updated_at < cutoff)
+    if after_id is not None:
+        query = query.filter(File.id > after_id)
+    ids = [row.id for row in query.order_by(File.id).limit(batch_size).all()]
+    if not ids:
+        return 0, 0, None
+
+    # Re-checked in every statement in case a row changed since it was selected
+    tombstones = (File.id.in_(ids), File.status == FileStatus.DELETED)
+    upload_ids = select(Upload.id).join(File, Upload.file_id == File.id).where(*tombstones)
+    db.execute(delete(UploadPart).where(UploadPart.upload_id.in_(upload_ids)).execution_options(synchronize_session=False))
+    uploads = db.execute(
+        delete(Upload).where(Upload.id.in_(upload_ids)).execution_options(synchronize_session=False)
+    ).rowcount
+
+    if archive:
+        columns = [cast(File.status, String) if name == "status" else getattr(File, name) for name in ARCHIVE_COLUMNS]
+        db.execute(insert(FileArchive).from_select(ARCHIVE_COLUMNS, select(*columns).where(*tombstones)))
+
+    files = db.execute(delete(File).where(*tombstones).execution_options(synchronize_session=False)).rowcount
+    db.commit()
+    return files, uploads, ids[-1]
+
+
+def compact_files(
+    retention_days: int,
+    batch_size: int = 500,
+    pause: float = 0.1,
+    max_lag: float = settings.REPLICA_MAX_LAG_SECONDS,
+    archive: bool = False,
+    vacuum: bool = False
+) -> dict:
+    """Compact every tombstone older than the retention window, returning what was reclaimed"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    per_row = _bytes_per_row()
+    report = {"batches": 0, "files": 0, "uploads": 0, "table_bytes": None, "index_bytes": None}
+
+    last_id = None
+    while True:
+        with SessionLocal() as db:
+            files, uploads, last_id = compact_batch(db, cutoff, last_id, batch_size, archive)
+        if last_id is None:
+            break
+        report["batches"] += 1
+        report["files"] += files
+        report["uploads"] += uploads
+        time.sleep(pause)
+        _wait_for_replicas(max_lag)
+
+    if per_row is not None:
+        # Estimated from average row sizes; the space is reusable after vacuum
+        report["table_bytes"] = int(per_row[0] * report["files"])
+        report["index_bytes"] = int(per_row[1] * report["files"])
+        if vacuum and report["files"]:
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                connection.execute(text("VACUUM (ANALYZE) files"))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--retention-days", type=int, default=settings.FILES_TOMBSTONE_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds to sleep between batches")
+    parser.add_argument("--max-lag", type=float, default=settings.REPLICA_MAX_LAG_SECONDS,
+                        help="Wait between batches while a read replica lags more than this")
+    parser.add_argument("--archive", action="store_true", help="Copy rows to files_archive before deleting")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM (ANALYZE) files after the pass")
+    parser.add_argument("--interval", type=int, default=0, help="Seconds between runs; 0 runs once")
+    args = parser.parse_args()
+
+    while True:
+        started = time.perf_counter()
+        report = compact_files(
+            args.retention_days,
+            batch_size=args.batch_size,
+            pause=args.pause,
+            max_lag=args.max_lag,
+            archive=args.archive,
+            vacuum=args.vacuum
+        )
+        print(f"Compacted files: {report} in {time.perf_counter() - started:.1f}s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Backfill the hash-partitioned files and folders tables and swap them in.
+
+Migration 5e8b3d1f7a94 creates empty partitioned shadows (folders_partitioned,
+files_partitioned). This job installs the triggers that mirror every write
+into them, so writes only pay for the copy once a migration is under way,
+copies the existing rows in keyset-ordered batches, one short transaction per
+batch, then adds the foreign keys partition by partition without blocking
+writes. With --swap it checks the row counts and renames the partitioned
+tables into place under a brief exclusive lock. The job can be interrupted and
+rerun at any point before the swap; already copied rows are skipped.
+
+Usage (from the backend directory, after `alembic upgrade head`):
+    python -m jobs.partition_tables           # backfill and add foreign keys
+    python -m jobs.partition_tables --swap    # ...then swap the tables in
+"""
+import argparse
+import time
+
+from database import engine
+from core.partitioning import (
+    PARTITIONED_TABLES,
+    LEGACY_SUFFIX,
+    shadow_name,
+    shadow_exists,
+    install_sync_trigger,
+    backfill_batch,
+    add_foreign_keys,
+    row_counts,
+    swap_tables
+)
+
+
+def backfill(table: str, batch_size: int = 1000, pause: float = 0.05) -> int:
+    """Copy every row of a table into its partitioned shadow, returning how many were copied"""
+    copied = 0
+    last_id = None
+    while True:
+        with engine.begin() as connection:
+            count, last_id = backfill_batch(connection, table, last_id, batch_size)
+        if last_id is None:
+            return copied
+        copied += count
+        time.sleep(pause)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between batches")
+    parser.add_argument("--swap", action="store_true", help="Swap the partitioned tables in once backfilled")
+    parser.add_argument("--lock-timeout-ms", type=int, default=5000,
+                        help="Give up the swap rather than queue writers behind it for longer than this")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("Partitioning requires PostgreSQL")
+
+    # Before the backfill, so no write made while it runs is missed
+    with engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            # A trigger on an already swapped table would point at no shadow and fail every write
+            if not shadow_exists(connection, table):
+                raise SystemExit(f"No {shadow_name(table)} table: run the migrations, or the tables are already swapped")
+            install_sync_trigger(connection, table)
+
+    for table in PARTITIONED_TABLES:
+        started = time.perf_counter()
+        copied = backfill(table, args.batch_size, args.pause)
+        print(f"Backfilled {table}: {copied} rows in {time.perf_counter() - started:.1f}s")
+
+    autocommit = engine.execution_options(isolation_level="AUTOCOMMIT")
+    with autocommit.connect() as connection:
+        for table in PARTITIONED_TABLES:
+            started = time.perf_counter()
+            add_foreign_keys(connection, table)
+            print(f"Validated {table} foreign keys in {time.perf_counter() - started:.1f}s")
+
+    if not args.swap:
+        return
+
+    with engine.connect() as connection:
+        for table in PARTITIONED_TABLES:
+            source, shadow = row_counts(connection, table)
+            if source != shadow:
+                raise SystemExit(f"Not swapping: {table} has {source} rows but its shadow has {shadow}")
+
+    with engine.begin() as connection:
+        swap_tables(connection, args.lock_timeout_ms)
+    print(f"Swapped in partitioned {', '.join(PARTITIONED_TABLES)}; the originals remain as *{LEGACY_SUFFIX}")
+
+
+if __name__ == "__main__":
+    main()
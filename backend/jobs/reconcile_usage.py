@@ -0,0 +1,59 @@
+"""
+Recompute per-folder and per-user usage counters from the files table.
+
+Counters are maintained incrementally by UsageService; this job repairs any
+drift (e.g. from a crash between storage and DB work, or manual SQL edits).
+Users are processed in keyset-ordered batches, one transaction per user.
+
+Usage (from the backend directory):
+    python -m jobs.reconcile_usage                 # single pass
+    python -m jobs.reconcile_usage --interval 3600 # run every hour
+"""
+import argparse
+import time
+
+from database import SessionLocal
+from models.user import User
+from services.usage_service import UsageService
+
+
+def reconcile_all(batch_size: int = 500) -> dict:
+    """Reconcile every user's counters, returning how many rows were corrected"""
+    report = {"users": 0, "users_fixed": 0, "folders_fixed": 0}
+    last_id = None
+    while True:
+        with SessionLocal() as db:
+            query = db.query(User.id).order_by(User.id)
+            if last_id is not None:
+                query = query.filter(User.id > last_id)
+            user_ids = [row.id for row in query.limit(batch_size).all()]
+
+        if not user_ids:
+            return report
+
+        for user_id in user_ids:
+            with SessionLocal() as db:
+                result = UsageService(db).reconcile_user(user_id)
+            report["users"] += 1
+            report["users_fixed"] += int(result["user_fixed"])
+            report["folders_fixed"] += result["folders_fixed"]
+        last_id = user_ids[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--interval", type=int, default=0, help="Seconds between runs; 0 runs once")
+    args = parser.parse_args()
+
+    while True:
+        started = time.perf_counter()
+        report = reconcile_all(args.batch_size)
+        print(f"Reconciled usage: {report} in {time.perf_counter() - started:.1f}s")
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,54 @@
-from fastapi import FastAPI, Depends
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from database import engine, get_db, Base
+from database import engine, get_db, replicas, LAST_WRITE_HEADER
 from routers.auth import router as auth_router
 from routers.file import router as file_router
 from routers.folder import router as folder_router
-from models import User, File, Folder, Upload, UploadPart
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(
-    title="G-Drive API",
-    description="FastAPI backend for G-Drive application",
-    version="1.0.0"
-)
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database connection on startup"""
+from routers.changes import router as changes_router
+from routers.events import router as events_router
+from routers.admin import router as admin_router, profile_store
+import models  # noqa: F401  (registers every mapper before the first query)
+from core.config import settings
+from core.security import shutdown_password_hashing
+from core.events import event_broker, event_transport
+from core.response_cache import response_cache
+from core.pool import pool_stats
+from core.metrics import RequestMetricsMiddleware, install_db_metrics, metrics_endpoint
+from core.query_tracking import QueryTrackingMiddleware, install_query_tracking
+from core.tracing import TracingMiddleware, install_db_tracing, start_tracing, stop_tracing
+from core.profiling import ProfilingMiddleware
+
+# The schema is managed by Alembic only: run `alembic upgrade head` before starting the API.
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+async def track_user_writes(request: Request, call_next):
+    """Pin users to the primary database briefly after a successful mutation"""
+    response = await call_next(request)
+    if replicas and request.method not in SAFE_METHODS and response.status_code < 400:
+        user_id = getattr(request.state, "user_id", None)
+        if user_id is not None:
+            replicas.mark_write(user_id)
+            response.headers[LAST_WRITE_HEADER] = f"{time.time():.3f}"
+    return response
+
+
+async def _monitor_replicas():
+    """Refresh replica health and lag in the background"""
+    while True:
+        await asyncio.to_thread(replicas.check_health)
+        await asyncio.sleep(settings.REPLICA_HEALTH_CHECK_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Per-worker startup and shutdown; runs after the fork when workers are preloaded"""
     # Test database connection
     try:
         with engine.connect() as connection:
@@ -38,19 +57,28 @@ async def startup_event():
     except Exception as e:
         print(f"❌ Database connection failed: {e}")
 
+    if settings.TRACING_ENABLED:
+        # Per worker: the exporter's background thread would not survive a fork
+        start_tracing()
+    replica_monitor = asyncio.create_task(_monitor_replicas()) if replicas else None
+    event_broker.attach_loop(asyncio.get_running_loop())
+    await event_transport.start()
 
-@app.get("/")
-async def root():
-    return {"message": "Welcome to G-Drive API"}
+    yield
+
+    # Stop background tasks and worker pools
+    if replica_monitor is not None:
+        replica_monitor.cancel()
+    await event_transport.stop()
+    shutdown_password_hashing()
+    if settings.TRACING_ENABLED:
+        stop_tracing()
 
 
-# Include routers
-app.include_router(auth_router)
-app.include_router(file_router)
-app.include_router(folder_router)
+async def root():
+    return {"message": "Welcome to G-Drive API"}
 
 
-@app.get("/health")
 async def health_check(db: Session = Depends(get_db)):
     """Health check endpoint that also verifies database connection"""
     try:
@@ -58,7 +86,9 @@ async def health_check(db: Session = Depends(get_db)):
         db.execute(text("SELECT 1"))
         return {
             "status": "healthy",
-            "database": "connected"
+            "database": "connected",
+            "response_cache": response_cache.stats(),
+            "db_pools": pool_stats()
         }
     except Exception as e:
         return {
@@ -67,3 +97,77 @@ async def health_check(db: Session = Depends(get_db)):
             "error": str(e)
         }
 
+
+def create_app() -> FastAPI:
+    """
+    Build the API application.
+
+    Building the app has no side effects: no DDL, connections or clients are
+    created until the first request or the lifespan startup, so the module can
+    be imported once in a preloading parent (see gunicorn.conf.py) and shared
+    by every forked worker.
+    """
+    app = FastAPI(
+        title="G-Drive API",
+        description="FastAPI backend for G-Drive application",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        # Read by the frontend and echoed back, see track_user_writes
+        expose_headers=[LAST_WRITE_HEADER],
+    )
+    app.middleware("http")(track_user_writes)
+
+    if settings.QUERY_TRACKING_ENABLED:
+        install_query_tracking()
+        # Outside the function middleware, whose tasks copy the request's context when they start
+        app.add_middleware(
+            QueryTrackingMiddleware,
+            repeat_threshold=settings.QUERY_REPEAT_THRESHOLD,
+            capture_sites=settings.QUERY_TRACKING_CALL_SITES,
+            enforce=settings.QUERY_BUDGET_ENFORCE
+        )
+
+    app.get("/")(root)
+    app.get("/health")(health_check)
+
+    if settings.PROFILING_ENABLED:
+        # Inside the tracing and metrics middleware, so reports show the request's own work
+        app.add_middleware(
+            ProfilingMiddleware,
+            store=profile_store,
+            admin_token=settings.PROFILING_ADMIN_TOKEN,
+            sample_rate=settings.PROFILING_SAMPLE_RATE,
+            interval=settings.PROFILING_INTERVAL_SECONDS
+        )
+        app.include_router(admin_router)
+
+    if settings.TRACING_ENABLED:
+        install_db_tracing()
+        # Outside the middleware above so their work falls inside the request span
+        app.add_middleware(TracingMiddleware)
+
+    if settings.METRICS_ENABLED:
+        install_db_metrics()
+        # Added last so it is outermost and times the other middleware too
+        app.add_middleware(RequestMetricsMiddleware)
+        app.get("/metrics", include_in_schema=False)(metrics_endpoint)
+
+    # Include routers
+    app.include_router(auth_router)
+    app.include_router(file_router)
+    app.include_router(folder_router)
+    app.include_router(changes_router)
+    app.include_router(events_router)
+    return app
+
+
+app = create_app()
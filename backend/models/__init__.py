@@ -1,8 +1,11 @@
 from .user import User
-from .file import File, FileStatus
+from .file import File, FileStatus, FileArchive
 from .folder import Folder
 from .uploads import Upload
 from .upload_parts import UploadPart
+from .usage import UserUsage
+from .change import UserChangeVersion, Change, ChangeItemType, ChangeAction
+from .revoked_token import RevokedToken
 
-__all__ = ["User", "File", "FileStatus", "Folder", "Upload", "UploadPart"]
+__all__ = ["User", "File", "FileStatus", "FileArchive", "Folder", "Upload", "UploadPart", "UserUsage", "UserChangeVersion", "Change", "ChangeItemType", "ChangeAction", "RevokedToken"]
 
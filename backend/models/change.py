@@ -0,0 +1,46 @@
+from sqlalchemy import Column, BigInteger, Integer, DateTime, ForeignKey, Enum, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+import enum
+from database import Base
+
+
+class ChangeItemType(str, enum.Enum):
+    FILE = "file"
+    FOLDER = "folder"
+
+
+class ChangeAction(str, enum.Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+
+class UserChangeVersion(Base):
+    """Per-user counter bumped by every file/folder mutation, used for ETags and change sequencing"""
+    __tablename__ = "user_change_versions"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Highest change id whose delete entries were pruned; older cursors must resync
+    pruned_change_id = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+class Change(Base):
+    """Append-only log of file/folder mutations, read by the delta sync feed"""
+    __tablename__ = "changes"
+
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    seq = Column(BigInteger, nullable=False)  # User change version that produced this entry
+    item_type = Column(Enum(ChangeItemType), nullable=False)
+    item_id = Column(UUID(as_uuid=True), nullable=False)
+    action = Column(Enum(ChangeAction), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Feed reads walk a user's entries in id order
+        Index('ix_changes_user_id', 'user_id', 'id'),
+        # Compaction finds superseded entries per item
+        Index('ix_changes_user_item', 'user_id', 'item_type', 'item_id', 'id'),
+    )
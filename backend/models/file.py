@@ -1,10 +1,9 @@
-from sqlalchemy import Column, String, BigInteger, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, String, BigInteger, DateTime, ForeignKey, Enum, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
 import uuid
-import json
 from database import Base
 
 class FileStatus(str, enum.Enum):
@@ -26,34 +25,48 @@ class File(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Fetch server-generated timestamps on flush so they are readable without a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
     user = relationship("User", backref="file")
-    uploads = relationship("Upload", backref="file")
-
-    @property
-    def uploaded_parts(self) -> list[dict]:
-        """Get uploaded parts as a list of dicts"""
-        if self.uploaded_parts_json:
-            return json.loads(self.uploaded_parts_json)
-        return []
-
-    @uploaded_parts.setter
-    def uploaded_parts(self, parts: list[dict]):
-        """Set uploaded parts from a list of dicts"""
-        self.uploaded_parts_json = json.dumps(parts)
-
-    def add_uploaded_part(self, part_number: int, etag: str):
-        """Add a completed part to the uploaded parts list"""
-        parts = self.uploaded_parts
-
-        for part in parts:
-            if part["part_number"] == part_number:
-                part["etag"] = etag
-                self.uploaded_parts = parts
-                return
-        parts.append({"part_number": part_number, "etag": etag})
-        self.uploaded_parts = parts
-
-    def get_uploaded_part_numbers(self) -> list[int]:
-        """Get list of part numbers that have been uploaded"""
-        return [part["part_number"] for part in self.uploaded_parts]
+    uploads = relationship("Upload", back_populates="file")
+
+    # Keyset ordering for name search; the pg_trgm GIN index on name is created by migration
+    __table_args__ = (
+        Index('ix_files_user_name', 'user_id', 'name', 'id'),
+        # Keyset ordering for folder contents sorted by name, size or modified time
+        Index('ix_files_folder_name', 'user_id', 'folder_id', 'name', 'id'),
+        Index('ix_files_folder_size', 'user_id', 'folder_id', 'size', 'id'),
+        Index('ix_files_folder_updated', 'user_id', 'folder_id', 'updated_at', 'id'),
+        # Keyset scan of tombstones for the compaction job; stays as small as the backlog
+        Index('ix_files_tombstones', 'id', 'updated_at', postgresql_where=text("status = 'DELETED'")),
+        # Unique names among live files per folder, and at the root where folder_id is NULL
+        Index(
+            'ix_files_live_name', 'user_id', 'folder_id', 'name', unique=True,
+            postgresql_where=text("status <> 'DELETED'"),
+            sqlite_where=text("status <> 'DELETED'")
+        ),
+        Index(
+            'ix_files_root_live_name', 'user_id', 'name', unique=True,
+            postgresql_where=text("folder_id IS NULL AND status <> 'DELETED'"),
+            sqlite_where=text("folder_id IS NULL AND status <> 'DELETED'")
+        ),
+    )
+
+
+class FileArchive(Base):
+    """Tombstoned file rows moved out of files by the compaction job (python -m jobs.compact_files --archive)"""
+    __tablename__ = "files_archive"
 
+    # No foreign keys: the owning user or folder may be gone by the time a row is read
+    id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mime = Column(String, nullable=True)
+    folder_id = Column(UUID(as_uuid=True), nullable=True)
+    storage_key = Column(String, nullable=False)
+    status = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Index
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, Integer, BigInteger, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -13,9 +13,16 @@ class Folder(Base):
     name = Column(String, nullable=False)
     parent_folder_id = Column(UUID(as_uuid=True), ForeignKey("folders.id"), nullable=True, index=True)
     path = Column(String, nullable=False, index=True)
+    # Usage counters over completed files, maintained by UsageService
+    files_count = Column(Integer, nullable=False, default=0, server_default="0")  # Directly in this folder
+    total_files = Column(Integer, nullable=False, default=0, server_default="0")  # Including subfolders
+    total_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")  # Including subfolders
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Fetch server-generated timestamps on flush so they are readable without a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
     user = relationship("User", backref="folders")
     parent = relationship("Folder", remote_side=[id], backref="children")
     files = relationship("File", backref="folder")
@@ -23,5 +30,15 @@ class Folder(Base):
     # Composite index for unique folder names per user per parent
     __table_args__ = (
         Index('ix_folder_user_parent_name', 'user_id', 'parent_folder_id', 'name', unique=True),
+        # NULL parents are distinct in the index above, so root-level names need their own
+        Index(
+            'ix_folders_root_name', 'user_id', 'name', unique=True,
+            postgresql_where=text("parent_folder_id IS NULL"),
+            sqlite_where=text("parent_folder_id IS NULL")
+        ),
+        Index('ix_folders_user_name', 'user_id', 'name', 'id'),
+        # Keyset ordering for folder contents sorted by size or modified time
+        Index('ix_folders_parent_size', 'user_id', 'parent_folder_id', 'total_bytes', 'id'),
+        Index('ix_folders_parent_updated', 'user_id', 'parent_folder_id', 'updated_at', 'id'),
     )
 
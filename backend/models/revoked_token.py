@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime
+from database import Base
+
+
+class RevokedToken(Base):
+    """Access tokens revoked before they expire (logout), shared by every worker"""
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String, primary_key=True)
+    # Rows are pruned once the token they block has expired anyway
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -24,5 +24,8 @@ class Upload(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
-    file = relationship("File", backref="upload")
+    # Fetch server-generated timestamps on flush so they are readable without a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
+    file = relationship("File", back_populates="uploads")
     parts = relationship("UploadPart", back_populates="upload", cascade="all, delete-orphan")
\ No newline at end of file
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, BigInteger, Integer, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from database import Base
+
+
+class UserUsage(Base):
+    """Per-user totals over completed files, maintained by UsageService"""
+    __tablename__ = "user_usage"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    file_count = Column(Integer, nullable=False, default=0, server_default="0")
+    total_bytes = Column(BigInteger, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -13,6 +13,11 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    # Tokens issued at or before this time are rejected (set on deactivation)
+    tokens_revoked_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    # Fetch server-generated timestamps on flush so they are readable without a refresh
+    __mapper_args__ = {"eager_defaults": True}
+
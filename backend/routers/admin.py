@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import HTMLResponse
+
+from core.config import settings
+from core.profiling import ProfileStore
+from dependencies.auth import require_admin_token
+
+# Only included when PROFILING_ENABLED is set (see main.create_app)
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin_token)])
+
+profile_store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_REPORTS)
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """
+    List stored request profiles, newest first.
+    
+    Each entry has the id, method, path, route, status, duration_ms and started_at
+    of a profiled request. Requires the X-Admin-Token header.
+    """
+    return profile_store.list()
+
+
+@router.get("/profiles/{profile_id}", response_class=HTMLResponse)
+async def get_profile(profile_id: str):
+    """
+    Get the pyinstrument HTML report of a profiled request.
+    
+    - **profile_id**: The X-Profile-Id header of the profiled response
+    """
+    html = profile_store.html(profile_id)
+    if html is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return HTMLResponse(html)
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
 from typing import Dict
 
-from database import get_db
-from models.user import User
-from schemas.auth import UserCreate, UserResponse, Token
+from database import DBSession, get_service_db
+from core.auth_cache import UserPrincipal
+from core.security import get_password_hash_async, verify_and_update_password_async
+from core.query_tracking import query_budget
+from schemas.auth import UserCreate, UserResponse, Token, UsageResponse
 from services.auth_service import AuthService
-from dependencies.auth import get_current_active_user
+from services.usage_service import UsageService
+from services.async_service import AsyncService
+from dependencies.auth import get_current_active_user, oauth2_scheme
+from dependencies.db import get_read_db
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
@@ -15,7 +19,7 @@ router = APIRouter(prefix="/auth", tags=["authentication"])
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def register(
     user_data: UserCreate,
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Register a new user and automatically log them in.
@@ -26,15 +30,16 @@ async def register(
     
     Returns a JWT access token for immediate use.
     """
-    auth_service = AuthService(db)
-    user = auth_service.register_user(user_data)
-    return auth_service.create_access_token_for_user(user)
+    auth_service = AsyncService(AuthService, db)
+    hashed_password = await get_password_hash_async(user_data.password)
+    user = await auth_service.register_user(user_data, hashed_password=hashed_password)
+    return await auth_service.create_access_token_for_user(user)
 
 
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Login and get access token.
@@ -44,28 +49,52 @@ async def login(
     
     Returns a JWT access token.
     """
-    auth_service = AuthService(db)
-    user = auth_service.authenticate_user(form_data.username, form_data.password)
-    return auth_service.create_access_token_for_user(user)
+    auth_service = AsyncService(AuthService, db)
+    user = await auth_service.get_user_by_login(form_data.username)
+    verified, new_hash = False, None
+    if user:
+        # bcrypt runs in the password hashing pool; a saturated pool answers 429
+        verified, new_hash = await verify_and_update_password_async(form_data.password, user.hashed_password)
+    user = await auth_service.complete_login(user, verified, new_hash)
+    return await auth_service.create_access_token_for_user(user)
 
 
 @router.post("/logout")
 async def logout(
-    current_user: User = Depends(get_current_active_user)
+    token: str = Depends(oauth2_scheme),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ) -> Dict[str, str]:
     """
     Logout the current user.
     
-    Note: Since JWT tokens are stateless, the client should discard the token.
-    This endpoint is provided for consistency and can be used for logging purposes.
+    The token is revoked for every worker until it expires.
+    The client should still discard the token.
     """
+    auth_service = AsyncService(AuthService, db)
+    await auth_service.revoke_access_token(token)
     return {"message": "Successfully logged out"}
 
 
 @router.get("/me", response_model=UserResponse)
+@query_budget(1)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """Get current authenticated user's information."""
-    return current_user
+    if current_user.created_at is not None:
+        return current_user
+    # Principals built from token claims carry no profile timestamps
+    auth_service = AsyncService(AuthService, db)
+    return await auth_service.get_user_by_id(current_user.id)
 
+
+@router.get("/me/usage", response_model=UsageResponse)
+async def get_current_user_usage(
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
+):
+    """Get the current user's total file count and bytes stored."""
+    usage_service = AsyncService(UsageService, db)
+    return await usage_service.get_user_usage(current_user.id)
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, status, HTTPException, Query
+from typing import Optional
+
+from database import DBSession
+from core.auth_cache import UserPrincipal
+from schemas.change import ChangeFeedResponse
+from services.change_service import ChangeService
+from services.async_service import AsyncService
+from dependencies.auth import get_current_active_user
+from dependencies.db import get_read_db
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+
+@router.get("/", response_model=ChangeFeedResponse)
+async def get_changes(
+    cursor: Optional[str] = Query(None, description="Cursor from the previous call (omit to start from the beginning)"),
+    limit: int = Query(500, ge=1, le=5000),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
+):
+    """
+    Get file and folder changes since a cursor, for delta sync clients.
+    
+    - **cursor**: Opaque cursor returned by the previous call
+    - **limit**: Maximum number of changes to return
+    
+    Each item appears at most once with its latest change. Keep calling with the
+    returned cursor while has_more is true. If reset is true, relist the whole
+    tree and continue from the returned cursor.
+    """
+    change_service = AsyncService(ChangeService, db)
+    try:
+        return await change_service.get_changes(
+            user_id=current_user.id,
+            cursor=cursor,
+            limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e.detail) if hasattr(e, 'detail') else 'Failed to get changes'
+        )
@@ -0,0 +1,50 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+
+from core.auth_cache import UserPrincipal
+from core.config import settings
+from core.events import event_broker
+from dependencies.auth import get_current_active_user
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+@router.get("/")
+async def stream_events(
+    current_user: UserPrincipal = Depends(get_current_active_user)
+):
+    """
+    Stream the current user's file and folder changes as Server-Sent Events.
+    
+    Each `changes` event carries the change version (also sent as the SSE id)
+    and the changed items. Truncated events omit the items; read them from
+    GET /changes. Comment lines are sent as keep-alives. If the client falls
+    too far behind, a `dropped` event is sent and the stream closes; reconnect
+    and catch up through GET /changes.
+    """
+    subscription = event_broker.subscribe(current_user.id)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscription.get(), settings.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if payload is None:
+                    yield "event: dropped\ndata: {}\n\n"
+                    return
+                yield f"id: {payload['seq']}\nevent: changes\ndata: {json.dumps(payload)}\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
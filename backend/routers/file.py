@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, status, HTTPException, Query
+from fastapi import APIRouter, Depends, UploadFile, File, Form, status, HTTPException, Query, Header
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from pydantic_core import to_json
 from typing import Optional
 from uuid import UUID
 
-from database import get_db
-from models.user import User
+from database import DBSession, get_service_db
+from core.auth_cache import UserPrincipal
 from schemas.file import (
     FileUploadResponse, 
     FileListResponse, 
@@ -16,26 +16,42 @@ from schemas.file import (
     PresignedUrlResponse,
     MultipartCompleteRequest,
     PartUploadedRequest,
-    UploadStatusResponse
+    UploadStatusResponse,
+    FileSearchResponse,
+    FileBatchRequest,
+    FileBatchResponse
 )
+from core.search import SearchMode
+from core.naming import NameConflict
+from core.etag import etag_matches, not_modified
+from core.response_cache import json_bytes_response
+from core.query_tracking import query_budget
 from services.file_service import FileService
+from services.async_service import AsyncService
 from dependencies.auth import get_current_active_user
+from dependencies.db import get_read_db
+from dependencies.etag import get_listing_etag
 
 router = APIRouter(prefix="/files", tags=["files"])
 
+# Columns selected by the fast listing path, in response field order
+FILE_LIST_FIELDS = list(FileListResponse.model_fields)
+
 
 @router.post("/upload", response_model=FileUploadResponse, status_code=status.HTTP_201_CREATED)
 async def upload_file(
     file: UploadFile = File(...),
     folder_id: Optional[UUID] = Form(None),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    on_conflict: NameConflict = Query(NameConflict.RENAME, description="rename to 'name (1).ext' if the name is taken, or error"),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Upload a file to Cloudflare R2.
     
     - **file**: The file to upload
     - **folder_id**: Optional folder ID to organize files
+    - **on_conflict**: `rename` (default) or `error` when the name is already taken
     
     Returns file metadata including storage key and status.
     """
@@ -49,15 +65,16 @@ async def upload_file(
     
     mime_type = file.content_type
     
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     
     try:
-        file_record = file_service.upload_file(
+        file_record = await file_service.upload_file(
             user_id=current_user.id,
             file_content=file_content,
             filename=file.filename,
             mime_type=mime_type,
-            folder_id=folder_id
+            folder_id=folder_id,
+            on_conflict=on_conflict
         )
         return file_record
     except Exception as e:
@@ -68,12 +85,15 @@ async def upload_file(
 
 
 @router.get("/", response_model=list[FileListResponse])
+@query_budget(3)
 async def list_files(
     folder_id: Optional[UUID] = None,
     skip: int = 0,
     limit: int = 100,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    etag: str = Depends(get_listing_etag),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
 ):
     """
     List all files for the current user.
@@ -81,16 +101,22 @@ async def list_files(
     - **folder_id**: Optional filter by folder ID (None for root files)
     - **skip**: Number of records to skip (for pagination)
     - **limit**: Maximum number of records to return
+    
+    Answers 304 when If-None-Match carries the current ETag.
     """
-    file_service = FileService(db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    file_service = AsyncService(FileService, db)
     try:
-        files = file_service.get_user_files(
+        # Column tuples serialized directly; same bytes as response_model validation
+        rows = await file_service.get_user_file_rows(
             user_id=current_user.id,
+            fields=FILE_LIST_FIELDS,
             folder_id=folder_id,
             skip=skip,
             limit=limit
         )
-        return files
+        return json_bytes_response(to_json(rows), etag)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -98,15 +124,51 @@ async def list_files(
         )
 
 
+@router.get("/search", response_model=FileSearchResponse)
+async def search_files(
+    q: str = Query(..., min_length=1, max_length=255, description="Search text"),
+    mode: SearchMode = Query(SearchMode.SUBSTRING, description="prefix, substring or fuzzy"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
+):
+    """
+    Search files by name across all of the current user's folders.
+
+    - **q**: Search text
+    - **mode**: prefix, substring or fuzzy (trigram similarity) matching
+    - **cursor**: Opaque cursor returned as next_cursor by the previous page
+    - **limit**: Maximum number of results to return
+
+    Each result includes the path of its containing folder ("/" for root).
+    """
+    file_service = AsyncService(FileService, db)
+    try:
+        return await file_service.search_files(
+            user_id=current_user.id,
+            query=q,
+            mode=mode,
+            cursor=cursor,
+            limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e.detail) if hasattr(e, 'detail') else 'Failed to search files'
+        )
+
+
 @router.get("/{file_id}", response_model=FileUploadResponse)
+@query_budget(2)
 async def get_file(
     file_id: UUID,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
 ):
     """Get file metadata by ID."""
-    file_service = FileService(db)
-    file_record = file_service.get_file_by_id(file_id, current_user.id)
+    file_service = AsyncService(FileService, db)
+    file_record = await file_service.get_file_by_id(file_id, current_user.id)
     
     if not file_record:
         raise HTTPException(
@@ -121,8 +183,8 @@ async def get_file(
 async def get_download_url(
     file_id: UUID,
     expires_in: int = 3600,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Get a presigned URL for downloading a file.
@@ -130,8 +192,8 @@ async def get_download_url(
     - **file_id**: ID of the file to download
     - **expires_in**: URL expiration time in seconds (default: 3600 = 1 hour)
     """
-    file_service = FileService(db)
-    url = file_service.get_file_download_url(file_id, current_user.id, expires_in)
+    file_service = AsyncService(FileService, db)
+    url = await file_service.get_file_download_url(file_id, current_user.id, expires_in)
     
     if not url:
         raise HTTPException(
@@ -142,12 +204,51 @@ async def get_download_url(
     return {"download_url": url, "expires_in": expires_in}
 
 
+@router.post("/batch", response_model=FileBatchResponse)
+async def batch_file_operations(
+    request: FileBatchRequest,
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
+):
+    """
+    Move, rename and delete many files in one call.
+    
+    - **operations**: List of {action, file_id, folder_id?, name?} where action is
+      "move" (to folder_id, None for root), "rename" (to name) or "delete"
+    
+    Valid operations are applied together in one transaction; each result reports
+    whether its operation succeeded and why not if it failed.
+    """
+    file_service = AsyncService(FileService, db)
+    try:
+        operations = [
+            {
+                "action": op.action.value,
+                "file_id": op.file_id,
+                "folder_id": op.folder_id,
+                "name": op.name
+            }
+            for op in request.operations
+        ]
+        results = await file_service.batch_operations(
+            user_id=current_user.id,
+            operations=operations
+        )
+        return {"results": results}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e.detail) if hasattr(e, 'detail') else str(e)
+        )
+
+
 @router.put("/{file_id}", response_model=FileUploadResponse)
+@query_budget(6)
 async def update_file(
     file_id: UUID,
     file_data: FileUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Update a file's name and/or folder.
@@ -155,9 +256,9 @@ async def update_file(
     - **name**: Optional new file name
     - **folder_id**: Optional new folder ID
     """
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     try:
-        file_record = file_service.update_file(
+        file_record = await file_service.update_file(
             file_id=file_id,
             user_id=current_user.id,
             name=file_data.name,
@@ -172,20 +273,21 @@ async def update_file(
 
 
 @router.put("/{file_id}/move", response_model=FileUploadResponse)
+@query_budget(10)
 async def move_file(
     file_id: UUID,
     move_data: FileMove,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Move a file to a different folder.
     
     - **folder_id**: Destination folder ID (None for root)
     """
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     try:
-        file_record = file_service.move_file(
+        file_record = await file_service.move_file(
             file_id=file_id,
             user_id=current_user.id,
             folder_id=move_data.folder_id
@@ -201,12 +303,12 @@ async def move_file(
 @router.delete("/{file_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_file(
     file_id: UUID,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """Delete a file from R2 and mark as deleted in database."""
-    file_service = FileService(db)
-    success = file_service.delete_file(file_id, current_user.id)
+    file_service = AsyncService(FileService, db)
+    success = await file_service.delete_file(file_id, current_user.id)
     
     if not success:
         raise HTTPException(
@@ -220,8 +322,8 @@ async def delete_file(
 @router.post("/upload/initiate", response_model=MultipartInitiateResponse, status_code=status.HTTP_201_CREATED)
 async def initiate_multipart_upload(
     request: MultipartInitiateRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Initiate a resumable multipart upload.
@@ -233,9 +335,9 @@ async def initiate_multipart_upload(
     
     Returns upload details including file_id, upload_id, part_size, and total_parts.
     """
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     try:
-        result = file_service.initiate_multipart_upload(
+        result = await file_service.initiate_multipart_upload(
             user_id=current_user.id,
             filename=request.filename,
             size=request.size,
@@ -254,8 +356,8 @@ async def initiate_multipart_upload(
 async def get_presigned_url_for_part(
     file_id: UUID,
     part_number: int = Query(..., ge=1, description="Part number (1-indexed)"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Get a presigned URL for uploading a specific part.
@@ -265,9 +367,9 @@ async def get_presigned_url_for_part(
     
     Returns a presigned URL valid for 1 hour.
     """
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     try:
-        result = file_service.generate_presigned_url_for_part(
+        result = await file_service.generate_presigned_url_for_part(
             file_id=file_id,
             user_id=current_user.id,
             part_number=part_number
@@ -284,8 +386,8 @@ async def get_presigned_url_for_part(
 async def mark_part_as_uploaded(
     file_id: UUID,
     request: PartUploadedRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Mark a part as successfully uploaded.
@@ -295,9 +397,9 @@ async def mark_part_as_uploaded(
     
     Returns the current upload progress.
     """
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     try:
-        result = file_service.mark_part_uploaded(
+        result = await file_service.mark_part_uploaded(
             file_id=file_id,
             user_id=current_user.id,
             part_number=request.part_number,
@@ -315,8 +417,8 @@ async def mark_part_as_uploaded(
 async def complete_multipart_upload(
     file_id: UUID,
     request: MultipartCompleteRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Complete a multipart upload.
@@ -325,10 +427,10 @@ async def complete_multipart_upload(
     
     Returns the completed file metadata.
     """
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     try:
         parts = [{"part_number": p.part_number, "etag": p.etag} for p in request.parts]
-        file_record = file_service.complete_multipart_upload(
+        file_record = await file_service.complete_multipart_upload(
             file_id=file_id,
             user_id=current_user.id,
             parts=parts
@@ -344,17 +446,17 @@ async def complete_multipart_upload(
 @router.post("/{file_id}/abort", status_code=status.HTTP_204_NO_CONTENT)
 async def abort_multipart_upload(
     file_id: UUID,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Abort a multipart upload and cleanup.
     
     This will cancel the upload in R2 and mark the file as failed.
     """
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     try:
-        file_service.abort_multipart_upload(
+        await file_service.abort_multipart_upload(
             file_id=file_id,
             user_id=current_user.id
         )
@@ -369,8 +471,8 @@ async def abort_multipart_upload(
 @router.get("/{file_id}/upload-status", response_model=UploadStatusResponse)
 async def get_upload_status(
     file_id: UUID,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Get the current status of a multipart upload.
@@ -378,9 +480,9 @@ async def get_upload_status(
     Returns information about which parts have been uploaded,
     useful for resuming interrupted uploads.
     """
-    file_service = FileService(db)
+    file_service = AsyncService(FileService, db)
     try:
-        result = file_service.get_upload_status(
+        result = await file_service.get_upload_status(
             file_id=file_id,
             user_id=current_user.id
         )
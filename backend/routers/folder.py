@@ -1,42 +1,60 @@
-from fastapi import APIRouter, Depends, status, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Header, Response
+from pydantic_core import to_json
 from typing import Optional
 from uuid import UUID
 
-from database import get_db
-from models.user import User
+from database import DBSession, get_service_db
+from core.auth_cache import UserPrincipal
 from schemas.folder import (
     FolderCreate,
     FolderUpdate,
     FolderMove,
     FolderResponse,
     FolderWithChildrenResponse,
-    FolderTreeResponse
+    FolderTreeResponse,
+    FolderSearchResponse,
+    FolderContentsResponse
 )
+from core.search import SearchMode
+from core.listing import ContentSort, SortOrder
+from core.naming import NameConflict
+from core.etag import etag_matches, not_modified, set_etag
+from core.response_cache import response_cache, cache_key, json_bytes_response
+from core.query_tracking import query_budget
 from services.folder_service import FolderService
+from services.async_service import AsyncService
 from dependencies.auth import get_current_active_user
+from dependencies.db import get_read_db
+from dependencies.etag import get_listing_etag
 
 router = APIRouter(prefix="/folders", tags=["folders"])
 
+# Columns selected by the fast listing path, in response field order
+FOLDER_FIELDS = list(FolderResponse.model_fields)
+
 
 @router.post("/", response_model=FolderResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(7)
 async def create_folder(
     folder_data: FolderCreate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    on_conflict: NameConflict = Query(NameConflict.ERROR, description="error, or rename to 'name (1)' if the name is taken"),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Create a new folder.
     
     - **name**: Name of the folder
     - **parent_folder_id**: Optional parent folder ID for nested folders
+    - **on_conflict**: `error` (default) or `rename` when the name is already taken
     """
-    folder_service = FolderService(db)
+    folder_service = AsyncService(FolderService, db)
     try:
-        folder = folder_service.create_folder(
+        folder = await folder_service.create_folder(
             user_id=current_user.id,
             name=folder_data.name,
-            parent_folder_id=folder_data.parent_folder_id
+            parent_folder_id=folder_data.parent_folder_id,
+            on_conflict=on_conflict
         )
         return folder
     except Exception as e:
@@ -48,11 +66,14 @@ async def create_folder(
 
 @router.get("/", response_model=list[FolderResponse])
 async def list_folders(
+    response: Response,
     parent_folder_id: Optional[UUID] = Query(None, description="Filter by parent folder ID (None for root folders)"),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    etag: str = Depends(get_listing_etag),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
 ):
     """
     List folders for the current user.
@@ -61,9 +82,12 @@ async def list_folders(
     - **skip**: Number of records to skip (for pagination)
     - **limit**: Maximum number of records to return
     """
-    folder_service = FolderService(db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    folder_service = AsyncService(FolderService, db)
     try:
-        folders = folder_service.get_user_folders(
+        folders = await folder_service.get_user_folders(
             user_id=current_user.id,
             parent_folder_id=parent_folder_id,
             skip=skip,
@@ -78,10 +102,13 @@ async def list_folders(
 
 
 @router.get("/tree", response_model=list[FolderTreeResponse])
+@query_budget(3)
 async def get_folder_tree(
     parent_folder_id: Optional[UUID] = Query(None, description="Start from specific parent folder (None for root)"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    etag: str = Depends(get_listing_etag),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
 ):
     """
     Get folder tree structure recursively.
@@ -90,13 +117,21 @@ async def get_folder_tree(
     
     Returns hierarchical folder structure with nested children.
     """
-    folder_service = FolderService(db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    key = cache_key("folders.tree", current_user.id, etag, parent_folder_id=parent_folder_id)
+    body = response_cache.get(key)
+    if body is not None:
+        return json_bytes_response(body, etag)
+    folder_service = AsyncService(FolderService, db)
     try:
-        tree = folder_service.get_folder_tree(
+        tree = await folder_service.get_folder_tree_rows(
             user_id=current_user.id,
             parent_folder_id=parent_folder_id
         )
-        return tree
+        body = to_json(tree)
+        response_cache.set(key, body)
+        return json_bytes_response(body, etag)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -106,16 +141,26 @@ async def get_folder_tree(
 
 @router.get("/all", response_model=list[FolderResponse])
 async def get_all_folders(
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(None),
+    etag: str = Depends(get_listing_etag),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
 ):
     """
     Get all folders for the current user (flat list).
     """
-    folder_service = FolderService(db)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    key = cache_key("folders.all", current_user.id, etag)
+    body = response_cache.get(key)
+    if body is not None:
+        return json_bytes_response(body, etag)
+    folder_service = AsyncService(FolderService, db)
     try:
-        folders = folder_service.get_all_folders(current_user.id)
-        return folders
+        folders = await folder_service.get_all_folder_rows(current_user.id, FOLDER_FIELDS)
+        body = to_json(folders)
+        response_cache.set(key, body)
+        return json_bytes_response(body, etag)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -123,21 +168,137 @@ async def get_all_folders(
         )
 
 
+@router.get("/search", response_model=FolderSearchResponse)
+async def search_folders(
+    q: str = Query(..., min_length=1, max_length=255, description="Search text"),
+    mode: SearchMode = Query(SearchMode.SUBSTRING, description="prefix, substring or fuzzy"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
+):
+    """
+    Search folders by name across the current user's whole tree.
+
+    - **q**: Search text
+    - **mode**: prefix, substring or fuzzy (trigram similarity) matching
+    - **cursor**: Opaque cursor returned as next_cursor by the previous page
+    - **limit**: Maximum number of results to return
+    """
+    folder_service = AsyncService(FolderService, db)
+    try:
+        return await folder_service.search_folders(
+            user_id=current_user.id,
+            query=q,
+            mode=mode,
+            cursor=cursor,
+            limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e.detail) if hasattr(e, 'detail') else 'Failed to search folders'
+        )
+
+
+@router.get("/root/contents", response_model=FolderContentsResponse)
+async def get_root_contents(
+    response: Response,
+    sort: ContentSort = Query(ContentSort.NAME, description="name, size or modified"),
+    order: SortOrder = Query(SortOrder.ASC, description="asc or desc"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    if_none_match: Optional[str] = Header(None),
+    etag: str = Depends(get_listing_etag),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
+):
+    """
+    List root-level folders and files in one request.
+
+    Takes the same parameters as GET /folders/{folder_id}/contents.
+    """
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    folder_service = AsyncService(FolderService, db)
+    try:
+        return await folder_service.get_folder_contents(
+            user_id=current_user.id,
+            folder_id=None,
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e.detail) if hasattr(e, 'detail') else 'Failed to list folder contents'
+        )
+
+
+@router.get("/{folder_id}/contents", response_model=FolderContentsResponse)
+@query_budget(4)
+async def get_folder_contents(
+    folder_id: UUID,
+    response: Response,
+    sort: ContentSort = Query(ContentSort.NAME, description="name, size or modified"),
+    order: SortOrder = Query(SortOrder.ASC, description="asc or desc"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page"),
+    limit: int = Query(100, ge=1, le=1000),
+    if_none_match: Optional[str] = Header(None),
+    etag: str = Depends(get_listing_etag),
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
+):
+    """
+    List a folder's subfolders and files in one request.
+
+    Folders are listed before files. The response also carries the folder's
+    breadcrumbs, so a folder page needs no other calls.
+
+    - **sort**: name, size (total bytes for folders) or modified
+    - **order**: asc or desc
+    - **cursor**: Opaque cursor returned as next_cursor by the previous page
+    - **limit**: Maximum number of items to return
+    """
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    folder_service = AsyncService(FolderService, db)
+    try:
+        return await folder_service.get_folder_contents(
+            user_id=current_user.id,
+            folder_id=folder_id,
+            sort=sort,
+            order=order,
+            cursor=cursor,
+            limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e.detail) if hasattr(e, 'detail') else 'Failed to list folder contents'
+        )
+
+
 @router.put("/{folder_id}/move", response_model=FolderResponse)
+@query_budget(9)
 async def move_folder(
     folder_id: UUID,
     move_data: FolderMove,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Move a folder to a different parent folder.
     
     - **parent_folder_id**: New parent folder ID (None for root)
     """
-    folder_service = FolderService(db)
+    folder_service = AsyncService(FolderService, db)
     try:
-        folder = folder_service.move_folder(
+        folder = await folder_service.move_folder(
             folder_id=folder_id,
             user_id=current_user.id,
             parent_folder_id=move_data.parent_folder_id
@@ -151,14 +312,15 @@ async def move_folder(
 
 
 @router.get("/{folder_id}", response_model=FolderResponse)
+@query_budget(2)
 async def get_folder(
     folder_id: UUID,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
 ):
     """Get folder metadata by ID."""
-    folder_service = FolderService(db)
-    folder = folder_service.get_folder_by_id(folder_id, current_user.id)
+    folder_service = AsyncService(FolderService, db)
+    folder = await folder_service.get_folder_by_id(folder_id, current_user.id)
     
     if not folder:
         raise HTTPException(
@@ -172,16 +334,16 @@ async def get_folder(
 @router.get("/path/{path:path}", response_model=FolderResponse)
 async def get_folder_by_path(
     path: str,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_read_db)
 ):
     """
     Get folder by its full path.
     
     - **path**: Full folder path (e.g., "/documents/projects")
     """
-    folder_service = FolderService(db)
-    folder = folder_service.get_folder_by_path(current_user.id, path)
+    folder_service = AsyncService(FolderService, db)
+    folder = await folder_service.get_folder_by_path(current_user.id, path)
     
     if not folder:
         raise HTTPException(
@@ -193,11 +355,12 @@ async def get_folder_by_path(
 
 
 @router.put("/{folder_id}", response_model=FolderResponse)
+@query_budget(9)
 async def update_folder(
     folder_id: UUID,
     folder_data: FolderUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Update a folder's name and/or parent.
@@ -205,9 +368,9 @@ async def update_folder(
     - **name**: Optional new folder name
     - **parent_folder_id**: Optional new parent folder ID
     """
-    folder_service = FolderService(db)
+    folder_service = AsyncService(FolderService, db)
     try:
-        folder = folder_service.update_folder(
+        folder = await folder_service.update_folder(
             folder_id=folder_id,
             user_id=current_user.id,
             name=folder_data.name,
@@ -225,8 +388,8 @@ async def update_folder(
 async def delete_folder(
     folder_id: UUID,
     force: bool = Query(False, description="Force delete even if folder contains files/subfolders"),
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_active_user),
+    db: DBSession = Depends(get_service_db)
 ):
     """
     Delete a folder.
@@ -234,9 +397,9 @@ async def delete_folder(
     - **folder_id**: ID of the folder to delete
     - **force**: If true, delete folder even if it contains files/subfolders
     """
-    folder_service = FolderService(db)
+    folder_service = AsyncService(FolderService, db)
     try:
-        success = folder_service.delete_folder(folder_id, current_user.id, force=force)
+        success = await folder_service.delete_folder(folder_id, current_user.id, force=force)
         
         if not success:
             raise HTTPException(
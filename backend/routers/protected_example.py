@@ -4,7 +4,7 @@ This file demonstrates how to use the authentication dependency.
 You can delete this file or use it as a reference.
 """
 from fastapi import APIRouter, Depends
-from models.user import User
+from core.auth_cache import UserPrincipal
 from dependencies.auth import get_current_active_user
 from schemas.auth import UserResponse
 
@@ -12,7 +12,7 @@ router = APIRouter(prefix="/protected", tags=["protected"])
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_my_info(current_user: User = Depends(get_current_active_user)):
+async def get_my_info(current_user: UserPrincipal = Depends(get_current_active_user)):
     """
     Example protected route that requires authentication.
     Only authenticated users can access this endpoint.
@@ -21,7 +21,7 @@ async def get_my_info(current_user: User = Depends(get_current_active_user)):
 
 
 @router.get("/example")
-async def protected_example(current_user: User = Depends(get_current_active_user)):
+async def protected_example(current_user: UserPrincipal = Depends(get_current_active_user)):
     """
     Another example of a protected route.
     The current_user dependency ensures the user is authenticated and active.
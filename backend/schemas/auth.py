@@ -43,6 +43,12 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 
+class UsageResponse(BaseModel):
+    """Storage usage totals over the user's completed files"""
+    file_count: int
+    total_bytes: int
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
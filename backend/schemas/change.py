@@ -0,0 +1,24 @@
+from pydantic import BaseModel
+from typing import Optional, List
+from uuid import UUID
+from models.change import ChangeItemType, ChangeAction
+from schemas.file import FileListResponse
+from schemas.folder import FolderResponse
+
+
+class ChangeResponse(BaseModel):
+    """Latest change to one file or folder; upserts carry the item's current state"""
+    seq: int
+    item_type: ChangeItemType
+    item_id: UUID
+    action: ChangeAction
+    file: Optional[FileListResponse] = None
+    folder: Optional[FolderResponse] = None
+
+
+class ChangeFeedResponse(BaseModel):
+    """A page of the delta sync feed"""
+    changes: List[ChangeResponse]
+    cursor: str  # Pass back to continue after the last returned change
+    has_more: bool  # More changes are available right away
+    reset: bool = False  # Cursor too old: relist everything, then continue from cursor
@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 from uuid import UUID
 from models.file import FileStatus
+import enum
 
 
 class FileUploadResponse(BaseModel):
@@ -137,3 +138,58 @@ class UploadStatusResponse(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class FileSearchResult(FileListResponse):
+    """File search hit annotated with the path of its containing folder"""
+    path: str
+
+
+class FileSearchResponse(BaseModel):
+    """A page of file search results"""
+    items: list[FileSearchResult]
+    next_cursor: Optional[str] = None
+
+
+class FileBatchAction(str, enum.Enum):
+    MOVE = "move"
+    RENAME = "rename"
+    DELETE = "delete"
+
+
+class FileBatchOperation(BaseModel):
+    """A single operation within a batch request"""
+    action: FileBatchAction
+    file_id: UUID
+    folder_id: Optional[UUID] = None  # Destination for move (None for root)
+    name: Optional[str] = Field(None, min_length=1, max_length=255)  # New name for rename
+
+
+class FileBatchRequest(BaseModel):
+    """Request to apply many file operations in one transaction"""
+    operations: list[FileBatchOperation] = Field(..., min_length=1, max_length=1000)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "operations": [
+                    {"action": "move", "file_id": "550e8400-e29b-41d4-a716-446655440000", "folder_id": None},
+                    {"action": "rename", "file_id": "6fa459ea-ee8a-3ca4-894e-db77e160355e", "name": "report.pdf"},
+                    {"action": "delete", "file_id": "16fd2706-8baf-433b-82eb-8c7fada847da"}
+                ]
+            }
+        }
+
+
+class FileBatchItemResult(BaseModel):
+    """Outcome of one batch operation"""
+    file_id: UUID
+    action: FileBatchAction
+    success: bool
+    error: Optional[str] = None
+    file: Optional[FileUploadResponse] = None
+
+
+class FileBatchResponse(BaseModel):
+    """Per-operation results of a batch request, in request order"""
+    results: list[FileBatchItemResult]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 from uuid import UUID
 
@@ -47,6 +47,9 @@ class FolderResponse(BaseModel):
     name: str
     parent_folder_id: Optional[UUID]
     path: str
+    files_count: int = 0  # Completed files directly in this folder
+    total_files: int = 0  # Completed files including subfolders
+    total_bytes: int = 0  # Size of completed files including subfolders
     created_at: datetime
     updated_at: datetime
 
@@ -57,7 +60,6 @@ class FolderResponse(BaseModel):
 class FolderWithChildrenResponse(FolderResponse):
     """Folder response with nested children and file count"""
     children_count: int = 0
-    files_count: int = 0
     children: List["FolderResponse"] = []
 
     class Config:
@@ -72,7 +74,40 @@ class FolderTreeResponse(BaseModel):
     parent_folder_id: Optional[UUID]
     children: List["FolderTreeResponse"] = []
     files_count: int = 0
+    total_files: int = 0
+    total_bytes: int = 0
 
     class Config:
         from_attributes = True
 
+
+
+class FolderSearchResponse(BaseModel):
+    """A page of folder search results"""
+    items: List[FolderResponse]
+    next_cursor: Optional[str] = None
+
+
+class FolderBreadcrumb(BaseModel):
+    id: UUID
+    name: str
+
+
+class FolderContentItem(BaseModel):
+    """A subfolder or file in a folder listing"""
+    type: Literal["folder", "file"]
+    id: UUID
+    name: str
+    size: int  # total_bytes for folders
+    mime: Optional[str] = None
+    files_count: Optional[int] = None  # Folders only
+    total_files: Optional[int] = None  # Folders only
+    created_at: datetime
+    updated_at: datetime
+
+
+class FolderContentsResponse(BaseModel):
+    """A page of a folder's contents with its ancestry, root first"""
+    breadcrumbs: List[FolderBreadcrumb]
+    items: List[FolderContentItem]
+    next_cursor: Optional[str] = None
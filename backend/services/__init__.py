@@ -1,4 +1,4 @@
 from .auth_service import AuthService
+from .async_service import AsyncService
 
-__all__ = ["AuthService"]
-
+__all__ = ["AuthService", "AsyncService"]
@@ -0,0 +1,68 @@
+import asyncio
+import functools
+from typing import Union
+
+from sqlalchemy.exc import MissingGreenlet
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+
+def run_blocking(fn, *args, **kwargs):
+    """
+    Call blocking I/O other than the database (R2 requests) from service code.
+
+    Under AsyncService with an AsyncSession the service runs in run_sync's
+    greenlet on the event loop, so the call is made in a worker thread and
+    awaited there, and the loop keeps serving other requests meanwhile. Anywhere
+    else (sync sessions, jobs) fn is simply called: with DATABASE_ASYNC off the
+    services, database I/O included, block the event loop as before.
+    """
+    call = asyncio.to_thread(fn, *args, **kwargs)
+    try:
+        return await_only(call)
+    except MissingGreenlet:
+        # await_only closed the unstarted coroutine
+        return fn(*args, **kwargs)
+
+
+class AsyncService:
+    """
+    Awaitable facade over a sync service class.
+
+    With a plain Session the wrapped methods run inline, exactly like calling the
+    service directly. With an AsyncSession the service is bound to the session's
+    sync_session and each call runs through AsyncSession.run_sync, so database I/O
+    awaits the asyncio driver instead of blocking the event loop; services hand
+    their other blocking calls to run_blocking for the same effect.
+
+    Usage:
+        folder_service = AsyncService(FolderService, db)
+        folder = await folder_service.get_folder_by_id(folder_id, user_id)
+    """
+
+    def __init__(self, service_class, db: Union[Session, AsyncSession]):
+        if isinstance(db, AsyncSession):
+            self._async_db = db
+            self._service = service_class(db.sync_session)
+        else:
+            self._async_db = None
+            self._service = service_class(db)
+
+    @property
+    def service(self):
+        """The wrapped sync service instance"""
+        return self._service
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._service, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            if self._async_db is None:
+                return attr(*args, **kwargs)
+            return await self._async_db.run_sync(lambda _session: attr(*args, **kwargs))
+
+        return call
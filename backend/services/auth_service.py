@@ -1,12 +1,15 @@
 from sqlalchemy.orm import Session
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 from uuid import UUID
 
 from models.user import User
+from models.revoked_token import RevokedToken
 from schemas.auth import UserCreate, Token
-from core.security import verify_password, get_password_hash, create_access_token
+from core.security import verify_and_update_password, get_password_hash, create_access_token, verify_token
 from core.config import settings
+from core.auth_cache import forget_token, invalidate_user
+from core.lookup_cache import cached_lookup
 from exceptions.exceptions import (
     EmailAlreadyRegisteredException,
     UsernameAlreadyTakenException,
@@ -22,12 +25,13 @@ class AuthService:
     def __init__(self, db: Session):
         self.db = db
     
-    def register_user(self, user_data: UserCreate) -> User:
+    def register_user(self, user_data: UserCreate, hashed_password: Optional[str] = None) -> User:
         """
         Register a new user.
         
         Args:
             user_data: User creation data (email, username, password)
+            hashed_password: Precomputed password hash (hashed inline if omitted)
             
         Returns:
             Created User object
@@ -45,7 +49,8 @@ class AuthService:
             raise UsernameAlreadyTakenException()
         
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        if hashed_password is None:
+            hashed_password = get_password_hash(user_data.password)
         new_user = User(
             email=user_data.email,
             username=user_data.username,
@@ -73,17 +78,56 @@ class AuthService:
             InvalidCredentialsException: If credentials are invalid
             InactiveUserException: If user account is inactive
         """
+        user = self.get_user_by_login(username)
+        if not user:
+            raise InvalidCredentialsException()
+        
+        verified, new_hash = verify_and_update_password(password, user.hashed_password)
+        return self.complete_login(user, verified, new_hash)
+    
+    def get_user_by_login(self, username: str) -> Optional[User]:
+        """
+        Find the user a login attempt refers to.
+        
+        Args:
+            username: Username or email
+            
+        Returns:
+            User object if found, None otherwise
+        """
         # Try to find user by username first, then by email
         user = self._get_user_by_username(username)
         if not user:
             user = self._get_user_by_email(username)
+        return user
+    
+    def complete_login(self, user: Optional[User], verified: bool, new_hash: Optional[str] = None) -> User:
+        """
+        Finish a login once the password has been checked.
         
-        if not user or not verify_password(password, user.hashed_password):
+        Args:
+            user: User returned by get_user_by_login
+            verified: Whether the password matched
+            new_hash: Replacement hash when the stored one uses an outdated bcrypt cost
+            
+        Returns:
+            Authenticated User object
+            
+        Raises:
+            InvalidCredentialsException: If credentials are invalid
+            InactiveUserException: If user account is inactive
+        """
+        if not user or not verified:
             raise InvalidCredentialsException()
         
         if not user.is_active:
             raise InactiveUserException()
         
+        # Transparently upgrade the stored hash to the current cost factor
+        if new_hash:
+            user.hashed_password = new_hash
+            self.db.commit()
+        
         return user
     
     def create_access_token_for_user(self, user: User) -> Token:
@@ -98,12 +142,60 @@ class AuthService:
         """
         access_token_expires = timedelta(seconds=settings.ACCESS_TOKEN_EXPIRE_SECONDS)
         access_token = create_access_token(
-            data={"sub": user.username},
+            data={
+                "sub": user.username,
+                "uid": str(user.id),
+                "email": user.email,
+                "act": bool(user.is_active)
+            },
             expires_delta=access_token_expires
         )
         
         return Token(access_token=access_token, token_type="bearer")
     
+    def revoke_access_token(self, token: str) -> None:
+        """
+        Revoke a single access token until it expires.
+        
+        The revocation is stored in revoked_tokens, so every worker rejects the
+        token once its cached principal expires. Rows of tokens that have
+        expired anyway are pruned on the way.
+        
+        Args:
+            token: Encoded JWT access token
+        """
+        payload = verify_token(token)
+        if not payload or not payload.get("jti"):
+            return
+        now = datetime.now(timezone.utc)
+        self.db.query(RevokedToken).filter(RevokedToken.expires_at < now).delete(synchronize_session=False)
+        self.db.merge(RevokedToken(
+            jti=payload["jti"],
+            expires_at=datetime.fromtimestamp(payload.get("exp", 0), timezone.utc)
+        ))
+        self.db.commit()
+        forget_token(token)
+    
+    def deactivate_user(self, user_id: UUID) -> User:
+        """
+        Deactivate a user and revoke every token issued to them so far.
+        
+        Args:
+            user_id: ID of the user to deactivate
+            
+        Returns:
+            Updated User object
+            
+        Raises:
+            UserNotFoundException: If user is not found
+        """
+        user = self.get_user_by_id(user_id)
+        user.is_active = False
+        user.tokens_revoked_at = datetime.now(timezone.utc)
+        self.db.commit()
+        invalidate_user(user.id)
+        return user
+    
     def get_user_by_username(self, username: str) -> Optional[User]:
         """
         Get a user by username.
@@ -141,7 +233,10 @@ class AuthService:
         Raises:
             UserNotFoundException: If user is not found
         """
-        user = self.db.query(User).filter(User.id == user_id).first()
+        user = cached_lookup(
+            self.db, (User, user_id),
+            lambda: self.db.query(User).filter(User.id == user_id).first()
+        )
         if not user:
             raise UserNotFoundException()
         return user
@@ -0,0 +1,218 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import select, update, delete, func, and_
+from typing import Iterable, Optional
+from uuid import UUID
+
+from models.change import UserChangeVersion, Change, ChangeItemType, ChangeAction
+from models.file import File
+from models.folder import Folder
+from core.cursor import encode_cursor, decode_cursor
+from core.events import event_transport, build_event
+
+
+class ChangeService:
+    """
+    Tracks a monotonically increasing change version per user and an append-only
+    log of the files and folders each change touched.
+
+    FileService and FolderService record changes inside the same transaction as
+    every mutation, so a reader that sees the new data also sees the new version
+    and log entries. Listing endpoints use the version as a weak ETag; sync
+    clients read the log through get_changes, and connected clients get a push
+    event once the transaction commits.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record(self, user_id: UUID, entries: Iterable[tuple]) -> int:
+        """
+        Bump the user's change version and append log entries; the caller commits.
+
+        Bumping first takes the user's version row lock, so entries of concurrent
+        transactions for the same user are appended (and get ids) in commit order.
+
+        Args:
+            user_id: Owner of the changed items
+            entries: (ChangeItemType, item_id, ChangeAction) tuples
+
+        Returns:
+            The new change version
+        """
+        entries = list(entries)
+        version = self.bump(user_id)
+        self.db.add_all([
+            Change(user_id=user_id, seq=version, item_type=item_type, item_id=item_id, action=action)
+            for item_type, item_id, action in entries
+        ])
+        # Pushed to /events subscribers only if this transaction commits
+        event_transport.stage(self.db, user_id, build_event(version, entries))
+        return version
+
+    def file_changed(self, user_id: UUID, file_id: UUID) -> int:
+        """Record a created, updated or moved file"""
+        return self.record(user_id, [(ChangeItemType.FILE, file_id, ChangeAction.UPSERT)])
+
+    def file_deleted(self, user_id: UUID, file_id: UUID) -> int:
+        """Record a deleted file"""
+        return self.record(user_id, [(ChangeItemType.FILE, file_id, ChangeAction.DELETE)])
+
+    def folders_changed(self, user_id: UUID, folder_ids: Iterable[UUID]) -> int:
+        """Record created, renamed or moved folders (including descendants whose path changed)"""
+        return self.record(user_id, [(ChangeItemType.FOLDER, fid, ChangeAction.UPSERT) for fid in folder_ids])
+
+    def bump(self, user_id: UUID) -> int:
+        """Increment the user's change version and return it; the caller commits"""
+        version = self.db.execute(
+            update(UserChangeVersion)
+            .where(UserChangeVersion.user_id == user_id)
+            .values(version=UserChangeVersion.version + 1)
+            .returning(UserChangeVersion.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if version is None:
+            # Users created after the migration get their row on first mutation
+            self.db.add(UserChangeVersion(user_id=user_id, version=1))
+            self.db.flush()
+            version = 1
+        return version
+
+    def get_version(self, user_id: UUID) -> int:
+        """Get the user's current change version (0 before any mutation)"""
+        version = self.db.query(UserChangeVersion.version).filter(
+            UserChangeVersion.user_id == user_id
+        ).scalar()
+        return version or 0
+
+    def get_changes(self, user_id: UUID, cursor: Optional[str] = None, limit: int = 500) -> dict:
+        """
+        Get a user's changes after a cursor, oldest first.
+
+        Only the latest entry per item after the cursor is returned, so an item
+        changed many times appears once with its current state. Upserts carry the
+        current file or folder row. If the cursor predates pruned delete entries
+        the client must relist everything: reset is set and the returned cursor
+        points at the current end of the log.
+
+        Args:
+            user_id: ID of the user
+            cursor: Opaque cursor from a previous call (None to start from the beginning)
+            limit: Maximum number of changes to return
+
+        Returns:
+            Dict with changes, cursor, has_more and reset
+        """
+        after = decode_cursor(cursor, 1)
+        after_id = int(after[0]) if after else 0
+
+        pruned_id = self.db.query(UserChangeVersion.pruned_change_id).filter(
+            UserChangeVersion.user_id == user_id
+        ).scalar() or 0
+        if after_id < pruned_id:
+            head = self.db.query(func.max(Change.id)).filter(Change.user_id == user_id).scalar() or 0
+            return {"changes": [], "cursor": encode_cursor([head]), "has_more": False, "reset": True}
+
+        # Latest entry per item among the entries after the cursor
+        ranked = select(
+            Change,
+            func.row_number().over(
+                partition_by=(Change.item_type, Change.item_id),
+                order_by=Change.id.desc()
+            ).label("rank")
+        ).where(Change.user_id == user_id, Change.id > after_id).subquery()
+        latest = aliased(Change, ranked)
+        entries = self.db.execute(
+            select(latest).where(ranked.c.rank == 1).order_by(ranked.c.id).limit(limit + 1)
+        ).scalars().all()
+
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        upserts = {ChangeItemType.FILE: set(), ChangeItemType.FOLDER: set()}
+        for entry in entries:
+            if entry.action == ChangeAction.UPSERT:
+                upserts[entry.item_type].add(entry.item_id)
+        files = {}
+        if upserts[ChangeItemType.FILE]:
+            files = {f.id: f for f in self.db.query(File).filter(
+                File.user_id == user_id,
+                File.id.in_(upserts[ChangeItemType.FILE])
+            ).all()}
+        folders = {}
+        if upserts[ChangeItemType.FOLDER]:
+            folders = {f.id: f for f in self.db.query(Folder).filter(
+                Folder.user_id == user_id,
+                Folder.id.in_(upserts[ChangeItemType.FOLDER])
+            ).all()}
+
+        changes = []
+        for entry in entries:
+            is_upsert = entry.action == ChangeAction.UPSERT
+            changes.append({
+                "seq": entry.seq,
+                "item_type": entry.item_type,
+                "item_id": entry.item_id,
+                "action": entry.action,
+                "file": files.get(entry.item_id) if is_upsert and entry.item_type == ChangeItemType.FILE else None,
+                "folder": folders.get(entry.item_id) if is_upsert and entry.item_type == ChangeItemType.FOLDER else None
+            })
+
+        next_id = entries[-1].id if entries else after_id
+        return {"changes": changes, "cursor": encode_cursor([next_id]), "has_more": has_more, "reset": False}
+
+    def compact_user(self, user_id: UUID, retention_days: int) -> dict:
+        """
+        Physically remove log entries that the feed would never return.
+
+        Entries superseded by a newer entry for the same item are always removed.
+        Delete entries older than the retention window are removed too, and the
+        user's pruned_change_id is advanced so older cursors get a reset.
+
+        Args:
+            user_id: ID of the user
+            retention_days: Age after which delete entries are pruned
+
+        Returns:
+            Dict with superseded and pruned entry counts
+        """
+        newer = aliased(Change)
+        superseded = self.db.execute(
+            delete(Change)
+            .where(
+                Change.user_id == user_id,
+                select(newer.id).where(
+                    newer.user_id == Change.user_id,
+                    newer.item_type == Change.item_type,
+                    newer.item_id == Change.item_id,
+                    newer.id > Change.id
+                ).exists()
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+        expired = and_(
+            Change.user_id == user_id,
+            Change.action == ChangeAction.DELETE,
+            Change.created_at < cutoff
+        )
+        last_pruned = self.db.query(func.max(Change.id)).filter(expired).scalar()
+        pruned = 0
+        if last_pruned is not None:
+            pruned = self.db.execute(
+                delete(Change).where(expired, Change.id <= last_pruned)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            self.db.execute(
+                update(UserChangeVersion)
+                .where(
+                    UserChangeVersion.user_id == user_id,
+                    UserChangeVersion.pruned_change_id < last_pruned
+                )
+                .values(pruned_change_id=last_pruned)
+                .execution_options(synchronize_session=False)
+            )
+
+        self.db.commit()
+        return {"superseded": superseded, "pruned": pruned}
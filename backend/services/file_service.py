@@ -1,37 +1,98 @@
-import boto3
-from botocore.exceptions import ClientError
-from botocore.config import Config
 from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, select, lambda_stmt
+from collections import defaultdict
 from typing import Optional
 from uuid import UUID
 import uuid
 from datetime import datetime
 import os
 import math
+import threading
 
 from models.file import File, FileStatus
+from models.change import ChangeItemType, ChangeAction
+from models.folder import Folder
+from models.uploads import Upload, UploadStatus
+from models.upload_parts import UploadPart
 from core.config import settings
+from core.cursor import encode_cursor, decode_cursor
+from core.search import SearchMode, build_name_filter
+from core.naming import NameConflict, flush_or_conflict, add_with_free_name
+from core.metrics import instrument_s3_client, record_upload, record_download_url
+from core.tracing import trace_s3_client, traced_service
 from exceptions.exceptions import FileUploadException
 from services.folder_service import FolderService
+from services.usage_service import UsageService
+from services.change_service import ChangeService
+from services.async_service import run_blocking
 
 PART_SIZE = 5 * 1024 * 1024
 PRESIGNED_URL_EXPIRY = 3600
 
+
+# Hot lookups are lambda statements: SQLAlchemy caches the built statement and its
+# compiled SQL per call site, so each call only binds new parameter values.
+def _file_by_id_stmt(file_id: UUID, user_id: UUID):
+    return lambda_stmt(lambda: select(File).where(File.id == file_id, File.user_id == user_id))
+
+
+_r2_client = None
+_r2_client_lock = threading.Lock()
+
+
+def get_r2_client():
+    """
+    Get the process-wide boto3 S3 client configured for Cloudflare R2.
+
+    boto3 is imported and the client built on first use, so importing this
+    module stays cheap and no client (or its connection pool) is created in a
+    preloading parent process and inherited by forked workers. Clients are
+    thread-safe and reused across requests.
+    """
+    global _r2_client
+    if _r2_client is None:
+        with _r2_client_lock:
+            if _r2_client is None:
+                import boto3
+
+                client = boto3.client(
+                    's3',
+                    endpoint_url=settings.R2_ENDPOINT_URL,
+                    aws_access_key_id=settings.R2_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
+                    region_name='auto'  # R2 uses 'auto' as the region
+                )
+                if settings.METRICS_ENABLED:
+                    instrument_s3_client(client)
+                if settings.TRACING_ENABLED:
+                    trace_s3_client(client)
+                _r2_client = client
+    return _r2_client
+
+
+def _r2_error():
+    """
+    botocore's ClientError, for except clauses.
+
+    An except clause evaluates its class only when an exception reaches it, so
+    botocore is still imported on first use rather than with this module.
+    """
+    from botocore.exceptions import ClientError
+
+    return ClientError
+
+
+@traced_service
 class FileService:
     def __init__(self, db: Session):
         self.db = db
-        self.s3_client = self._create_r2_client()
         self.folder_service = FolderService(db)
+        self.usage = UsageService(db)
+        self.changes = ChangeService(db)
 
-    def _create_r2_client(self):
-        """Create and return a boto3 S3 client configured for Cloudflare R2"""
-        return boto3.client(
-            's3',
-            endpoint_url=settings.R2_ENDPOINT_URL,
-            aws_access_key_id=settings.R2_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-            region_name='auto'  # R2 uses 'auto' as the region
-        )
+    @property
+    def s3_client(self):
+        return get_r2_client()
 
     def _generate_storage_key(self, user_id: UUID, filename: str, folder_id: Optional[UUID] = None) -> str:
         """Generate a unique storage key for the file in R2"""
@@ -60,7 +121,8 @@ class FileService:
         file_content: bytes,
         filename: str,
         mime_type: Optional[str] = None,
-        folder_id: Optional[UUID] = None
+        folder_id: Optional[UUID] = None,
+        on_conflict: NameConflict = NameConflict.RENAME
     ) -> File:
         """
         Upload a file to Cloudflare R2 and save metadata to database.
@@ -71,6 +133,7 @@ class FileService:
             filename: Original filename
             mime_type: MIME type of the file
             folder_id: Optional folder ID
+            on_conflict: Store as "name (1).ext" if the name is taken, or fail
             
         Returns:
             File object with metadata
@@ -85,18 +148,26 @@ class FileService:
             # Generate unique storage key
             storage_key = self._generate_storage_key(user_id, filename, folder_id)
             
-            # Create file record in database with UPLOADING status
+            # Create file record in database with INITIATED status
             file_record = File(
                 user_id=user_id,
                 name=filename,
                 size=len(file_content),
                 mime=mime_type,
                 storage_key=storage_key,
-                status=FileStatus.UPLOADING,
+                status=FileStatus.INITIATED,
                 folder_id=folder_id
             )
-            self.db.add(file_record)
-            self.db.flush()  # Flush to get the ID
+            # The unique name indexes reject a taken name, so there is no lookup beforehand
+            if on_conflict == NameConflict.RENAME:
+                add_with_free_name(
+                    self.db, file_record, File.name,
+                    [File.user_id == user_id, File.folder_id == folder_id, File.status != FileStatus.DELETED],
+                    keep_extension=True
+                )
+            else:
+                self.db.add(file_record)
+                flush_or_conflict(self.db, FileUploadException(f"File '{filename}' already exists in this location"))
             
             # Upload to R2
             try:
@@ -110,30 +181,31 @@ class FileService:
                 if mime_type:
                     upload_params['ContentType'] = mime_type
                 
-                self.s3_client.put_object(**upload_params)
+                run_blocking(self.s3_client.put_object, **upload_params)
                 
                 # Update status to COMPLETED
                 file_record.status = FileStatus.COMPLETED
+                self.usage.file_added(user_id, folder_id, file_record.size)
+                self.changes.file_changed(user_id, file_record.id)
                 self.db.commit()
+                record_upload(file_record.size, "direct")
                 
                 return file_record
                 
-            except ClientError as e:
-                # If upload fails, update status to FAILED
-                file_record.status = FileStatus.FAILED
-                self.db.commit()
+            except _r2_error() as e:
+                # Nothing was stored, so drop the record and free its name
+                self.db.rollback()
                 raise FileUploadException(f"Failed to upload file to R2: {str(e)}")
                 
+        except FileUploadException:
+            raise
         except Exception as e:
             self.db.rollback()
             raise FileUploadException(f"Error uploading file: {str(e)}")
 
     def get_file_by_id(self, file_id: UUID, user_id: UUID) -> Optional[File]:
         """Get a file by ID, ensuring it belongs to the user"""
-        return self.db.query(File).filter(
-            File.id == file_id,
-            File.user_id == user_id
-        ).first()
+        return self.db.execute(_file_by_id_stmt(file_id, user_id)).scalars().first()
 
     def get_user_files(
         self,
@@ -143,10 +215,33 @@ class FileService:
         limit: int = 100
     ) -> list[File]:
         """Get all files for a user, optionally filtered by folder"""
-        query = self.db.query(File).filter(
+        query = self._filter_user_files(self.db.query(File), user_id, folder_id)
+        return query.order_by(File.created_at.desc()).offset(skip).limit(limit).all()
+
+    def get_user_file_rows(
+        self,
+        user_id: UUID,
+        fields: list[str],
+        folder_id: Optional[UUID] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> list[dict]:
+        """
+        Same listing as get_user_files, as plain dicts of the requested columns.
+
+        Selects only those columns and skips ORM hydration, so large pages can be
+        serialized straight to JSON. Dict keys follow the order of fields.
+        """
+        columns = [getattr(File, field) for field in fields]
+        query = self._filter_user_files(self.db.query(*columns), user_id, folder_id)
+        rows = query.order_by(File.created_at.desc()).offset(skip).limit(limit).all()
+        return [dict(zip(fields, row)) for row in rows]
+
+    def _filter_user_files(self, query, user_id: UUID, folder_id: Optional[UUID]):
+        """Restrict a files query to a user's live files in one folder (None for root)"""
+        query = query.filter(
             File.user_id == user_id,
-            File.status != FileStatus.DELETED,
-            File.status != FileStatus.FAILED
+            File.status != FileStatus.DELETED
         )
         
         if folder_id is not None:
@@ -158,8 +253,60 @@ class FileService:
             query = query.filter(File.folder_id == folder_id)
         else:
             query = query.filter(File.folder_id == None)
-        
-        return query.order_by(File.created_at.desc()).offset(skip).limit(limit).all()
+        return query
+
+    def search_files(
+        self,
+        user_id: UUID,
+        query: str,
+        mode: SearchMode = SearchMode.SUBSTRING,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> dict:
+        """
+        Search a user's completed files by name across all folders.
+
+        Args:
+            user_id: ID of the user
+            query: Search text
+            mode: Prefix, substring or fuzzy matching
+            cursor: Opaque cursor from a previous page
+            limit: Maximum number of results to return
+
+        Returns:
+            Dict with items (file fields plus containing folder path) and next_cursor
+        """
+        dialect_name = self.db.get_bind().dialect.name
+        stmt = self.db.query(File, Folder.path).outerjoin(
+            Folder, File.folder_id == Folder.id
+        ).filter(
+            File.user_id == user_id,
+            File.status == FileStatus.COMPLETED,
+            build_name_filter(File.name, query, mode, dialect_name)
+        )
+
+        after = decode_cursor(cursor, 2)
+        if after:
+            after_name, after_id = after[0], UUID(after[1])
+            stmt = stmt.filter(or_(
+                File.name > after_name,
+                and_(File.name == after_name, File.id > after_id)
+            ))
+
+        rows = stmt.order_by(File.name.asc(), File.id.asc()).limit(limit + 1).all()
+
+        items = []
+        for file_record, folder_path in rows[:limit]:
+            item = self._serialize_file(file_record)
+            item["path"] = folder_path or "/"
+            items.append(item)
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1][0]
+            next_cursor = encode_cursor([last.name, str(last.id)])
+
+        return {"items": items, "next_cursor": next_cursor}
 
     def delete_file(self, file_id: UUID, user_id: UUID) -> bool:
         """Delete a file from R2 and mark as deleted in database"""
@@ -171,16 +318,20 @@ class FileService:
         try:
             # Delete from R2
             try:
-                self.s3_client.delete_object(
+                run_blocking(
+                    self.s3_client.delete_object,
                     Bucket=settings.R2_BUCKET_NAME,
                     Key=file_record.storage_key
                 )
-            except ClientError as e:
+            except _r2_error() as e:
                 # Log error but continue with database update
                 print(f"Warning: Failed to delete file from R2: {str(e)}")
             
             # Mark as deleted in database
+            if file_record.status == FileStatus.COMPLETED:
+                self.usage.file_removed(user_id, file_record.folder_id, file_record.size)
             file_record.status = FileStatus.DELETED
+            self.changes.file_deleted(user_id, file_record.id)
             self.db.commit()
             return True
             
@@ -218,26 +369,17 @@ class FileService:
                 if not folder:
                     raise FileUploadException("Folder not found or access denied")
         
-        # Check for name conflicts if name is changing
-        if name:
-            existing = self.db.query(File).filter(
-                File.user_id == user_id,
-                File.name == name,
-                File.folder_id == (folder_id if folder_id is not None else file_record.folder_id),
-                File.id != file_id,
-                File.status != FileStatus.DELETED,
-                File.status != FileStatus.FAILED
-            ).first()
-            
-            if existing:
-                raise FileUploadException(f"File '{name}' already exists in this location")
-        
-        # Update file
+        # Update file; a taken name is rejected by the unique name indexes
+        old_folder_id = file_record.folder_id
         if name:
             file_record.name = name
         if folder_id is not None:
             file_record.folder_id = folder_id
+        flush_or_conflict(self.db, FileUploadException(f"File '{file_record.name}' already exists in this location"))
+        if folder_id is not None and file_record.status == FileStatus.COMPLETED:
+            self.usage.file_moved(user_id, file_record.size, old_folder_id, folder_id)
         
+        self.changes.file_changed(user_id, file_record.id)
         self.db.commit()
         return file_record
 
@@ -268,29 +410,181 @@ class FileService:
             if not folder:
                 raise FileUploadException("Folder not found or access denied")
         
-        # Check for name conflicts in the destination folder
-        existing = self.db.query(File).filter(
-            File.user_id == user_id,
-            File.name == file_record.name,
-            File.folder_id == folder_id,
-            File.id != file_id,
-            File.status != FileStatus.DELETED,
-            File.status != FileStatus.FAILED
-        ).first()
-        
-        if existing:
-            folder_name = "root"
-            if folder_id:
-                folder = self.folder_service.get_folder_by_id(folder_id, user_id)
-                folder_name = folder.name if folder else "selected folder"
-            raise FileUploadException(f"File '{file_record.name}' already exists in {folder_name}")
-        
-        # Update folder_id (can be None)
+        # Update folder_id (can be None); a taken name is rejected by the unique name indexes
+        old_folder_id = file_record.folder_id
         file_record.folder_id = folder_id
+        flush_or_conflict(self.db, FileUploadException(
+            f"File '{file_record.name}' already exists in {folder.name if folder_id else 'root'}"
+        ))
+        if file_record.status == FileStatus.COMPLETED:
+            self.usage.file_moved(user_id, file_record.size, old_folder_id, folder_id)
         
+        self.changes.file_changed(user_id, file_record.id)
         self.db.commit()
         return file_record
 
+    def batch_operations(self, user_id: UUID, operations: list[dict]) -> list[dict]:
+        """
+        Apply many move/rename/delete operations in a single transaction.
+
+        Ownership, destination folders and name conflicts are validated with a
+        constant number of set-based queries; operations are then applied in order
+        against an in-memory view of the affected names, so conflicts within the
+        batch are caught too. Invalid operations are reported and skipped while the
+        rest are committed together. Storage objects of deleted files are removed
+        afterwards with batched delete_objects calls.
+
+        Args:
+            user_id: ID of the user (for authorization)
+            operations: List of {action, file_id, folder_id?, name?} dicts where
+                action is "move", "rename" or "delete"
+
+        Returns:
+            List of {file_id, action, success, error, file} dicts, one per operation
+        """
+        file_ids = {op["file_id"] for op in operations}
+        files = {
+            f.id: f for f in self.db.query(File).filter(
+                File.user_id == user_id,
+                File.id.in_(file_ids),
+                File.status != FileStatus.DELETED
+            ).all()
+        }
+
+        folder_ids = {op.get("folder_id") for op in operations if op["action"] == "move" and op.get("folder_id")}
+        owned_folders = set()
+        if folder_ids:
+            owned_folders = {
+                row.id for row in self.db.query(Folder.id).filter(
+                    Folder.user_id == user_id,
+                    Folder.id.in_(folder_ids)
+                ).all()
+            }
+
+        # Occupancy of every (folder, name) slot an operation could land in
+        target_names = {op["name"] for op in operations if op["action"] == "rename" and op.get("name")}
+        target_names.update(f.name for f in files.values())
+        occupied = {}
+        if target_names:
+            for row in self.db.query(File.id, File.folder_id, File.name).filter(
+                File.user_id == user_id,
+                File.name.in_(target_names),
+                File.status != FileStatus.DELETED
+            ).all():
+                occupied[(row.folder_id, row.name)] = row.id
+
+        results = []
+        deleted_ids = set()
+        deleted_keys = []
+        usage_deltas = defaultdict(lambda: (0, 0))
+        for op in operations:
+            result = {"file_id": op["file_id"], "action": op["action"], "success": False, "error": None, "file": None}
+            results.append(result)
+
+            file_record = files.get(op["file_id"])
+            if not file_record or file_record.id in deleted_ids:
+                result["error"] = "File not found or access denied"
+                continue
+
+            if op["action"] == "delete":
+                if occupied.get((file_record.folder_id, file_record.name)) == file_record.id:
+                    del occupied[(file_record.folder_id, file_record.name)]
+                if file_record.status == FileStatus.COMPLETED:
+                    self._add_delta(usage_deltas, file_record.folder_id, -1, -file_record.size)
+                file_record.status = FileStatus.DELETED
+                deleted_ids.add(file_record.id)
+                deleted_keys.append(file_record.storage_key)
+                result["success"] = True
+                continue
+
+            if op["action"] == "move":
+                new_folder_id, new_name = op.get("folder_id"), file_record.name
+                if new_folder_id and new_folder_id not in owned_folders:
+                    result["error"] = "Folder not found or access denied"
+                    continue
+            elif op["action"] == "rename":
+                new_folder_id, new_name = file_record.folder_id, op.get("name")
+                if not new_name:
+                    result["error"] = "Name is required for rename"
+                    continue
+            else:
+                result["error"] = f"Unknown action '{op['action']}'"
+                continue
+
+            holder = occupied.get((new_folder_id, new_name))
+            if holder is not None and holder != file_record.id:
+                result["error"] = f"File '{new_name}' already exists in this location"
+                continue
+
+            if occupied.get((file_record.folder_id, file_record.name)) == file_record.id:
+                del occupied[(file_record.folder_id, file_record.name)]
+            occupied[(new_folder_id, new_name)] = file_record.id
+            if file_record.status == FileStatus.COMPLETED and new_folder_id != file_record.folder_id:
+                self._add_delta(usage_deltas, file_record.folder_id, -1, -file_record.size)
+                self._add_delta(usage_deltas, new_folder_id, 1, file_record.size)
+            file_record.folder_id = new_folder_id
+            file_record.name = new_name
+            result["success"] = True
+
+        try:
+            self.usage.apply_file_deltas(user_id, usage_deltas)
+            changed = [
+                (ChangeItemType.FILE, result["file_id"],
+                 ChangeAction.DELETE if result["action"] == "delete" else ChangeAction.UPSERT)
+                for result in results if result["success"]
+            ]
+            if changed:
+                self.changes.record(user_id, changed)
+            # Flush first so updated rows can be serialized without a refresh per file after commit
+            self.db.flush()
+            for result in results:
+                if result["success"] and result["action"] != "delete":
+                    result["file"] = self._serialize_file(files[result["file_id"]])
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise FileUploadException(f"Error applying batch: {str(e)}")
+
+        self._delete_storage_objects(deleted_keys)
+        return results
+
+    @staticmethod
+    def _add_delta(deltas: dict, folder_id: Optional[UUID], files: int, size: int):
+        """Accumulate a usage delta for a folder"""
+        current = deltas[folder_id]
+        deltas[folder_id] = (current[0] + files, current[1] + size)
+
+    def _delete_storage_objects(self, storage_keys: list[str]):
+        """Delete objects from R2 in batches of up to 1000 keys per request"""
+        for start in range(0, len(storage_keys), 1000):
+            chunk = storage_keys[start:start + 1000]
+            try:
+                response = run_blocking(
+                    self.s3_client.delete_objects,
+                    Bucket=settings.R2_BUCKET_NAME,
+                    Delete={'Objects': [{'Key': key} for key in chunk], 'Quiet': True}
+                )
+                for error in response.get('Errors', []):
+                    print(f"Warning: Failed to delete file from R2: {error.get('Key')}: {error.get('Message')}")
+            except _r2_error() as e:
+                # Log error but keep the database changes, same as delete_file
+                print(f"Warning: Failed to delete files from R2: {str(e)}")
+
+    def _serialize_file(self, file_record: File) -> dict:
+        """Snapshot a file row's response fields"""
+        return {
+            "id": file_record.id,
+            "user_id": file_record.user_id,
+            "name": file_record.name,
+            "size": file_record.size,
+            "mime": file_record.mime,
+            "storage_key": file_record.storage_key,
+            "status": file_record.status,
+            "folder_id": file_record.folder_id,
+            "created_at": file_record.created_at,
+            "updated_at": file_record.updated_at
+        }
+
     def get_file_download_url(self, file_id: UUID, user_id: UUID, expires_in: int = 3600) -> Optional[str]:
         """
         Generate a presigned URL for downloading a file from R2.
@@ -317,8 +611,9 @@ class FileService:
                 },
                 ExpiresIn=expires_in
             )
+            record_download_url(file_record.size)
             return url
-        except ClientError as e:
+        except _r2_error() as e:
             raise FileUploadException(f"Failed to generate download URL: {str(e)}")
 
     def initiate_multipart_upload(
@@ -327,7 +622,8 @@ class FileService:
         filename: str,
         size: int,
         mime_type: Optional[str] = None,
-        folder_id: Optional[UUID] = None
+        folder_id: Optional[UUID] = None,
+        on_conflict: NameConflict = NameConflict.RENAME
     ) -> dict:
         """
         Initiate a multipart upload to R2.
@@ -338,6 +634,7 @@ class FileService:
             size: Total file size in bytes
             mime_type: MIME type of the file
             folder_id: Optional folder ID
+            on_conflict: Store as "name (1).ext" if the name is taken, or fail
             
         Returns:
             Dict with file_id, upload_id, part_size, total_parts
@@ -354,6 +651,26 @@ class FileService:
             # Calculate total parts
             total_parts = math.ceil(size / PART_SIZE)
             
+            # Reserve the name with an INITIATED file record before anything is stored
+            file_record = File(
+                user_id=user_id,
+                name=filename,
+                size=size,
+                mime=mime_type,
+                storage_key=storage_key,
+                status=FileStatus.INITIATED,
+                folder_id=folder_id
+            )
+            if on_conflict == NameConflict.RENAME:
+                add_with_free_name(
+                    self.db, file_record, File.name,
+                    [File.user_id == user_id, File.folder_id == folder_id, File.status != FileStatus.DELETED],
+                    keep_extension=True
+                )
+            else:
+                self.db.add(file_record)
+                flush_or_conflict(self.db, FileUploadException(f"File '{filename}' already exists in this location"))
+            
             # Initiate multipart upload in R2
             try:
                 multipart_params = {
@@ -363,26 +680,21 @@ class FileService:
                 if mime_type:
                     multipart_params['ContentType'] = mime_type
                 
-                response = self.s3_client.create_multipart_upload(**multipart_params)
+                response = run_blocking(self.s3_client.create_multipart_upload, **multipart_params)
                 upload_id = response['UploadId']
                 
-            except ClientError as e:
+            except _r2_error() as e:
+                self.db.rollback()
                 raise FileUploadException(f"Failed to initiate multipart upload: {str(e)}")
             
-            # Create file record in database with UPLOADING status
-            file_record = File(
-                user_id=user_id,
-                name=filename,
-                size=size,
-                mime=mime_type,
-                storage_key=storage_key,
-                status=FileStatus.UPLOADING,
-                folder_id=folder_id,
+            self.db.add(Upload(
+                file_id=file_record.id,
                 upload_id=upload_id,
-                total_parts=total_parts,
-                uploaded_parts_json="[]"
-            )
-            self.db.add(file_record)
+                file_fingerprint=f"{user_id}:{folder_id}:{file_record.name}:{size}",
+                chunk_size=PART_SIZE,
+                total_parts=total_parts
+            ))
+            self.changes.file_changed(user_id, file_record.id)
             self.db.commit()
             
             return {
@@ -398,6 +710,21 @@ class FileService:
             self.db.rollback()
             raise FileUploadException(f"Error initiating multipart upload: {str(e)}")
 
+    def _get_active_upload(
+        self, file_id: UUID, user_id: UUID, inactive_detail: str = "Upload is not in progress"
+    ) -> tuple[File, Upload]:
+        """The file and its in-progress multipart upload, or FileUploadException"""
+        row = self.db.execute(
+            select(File, Upload)
+            .join(Upload, Upload.file_id == File.id)
+            .where(File.id == file_id, File.user_id == user_id, Upload.status == UploadStatus.INPROGRESS)
+        ).first()
+        if row is None:
+            if self.get_file_by_id(file_id, user_id) is None:
+                raise FileUploadException("File not found or access denied")
+            raise FileUploadException(inactive_detail)
+        return row.File, row.Upload
+
     def generate_presigned_url_for_part(
         self,
         file_id: UUID,
@@ -415,19 +742,10 @@ class FileService:
         Returns:
             Dict with url, part_number, expires_in
         """
-        file_record = self.get_file_by_id(file_id, user_id)
+        file_record, upload = self._get_active_upload(file_id, user_id)
         
-        if not file_record:
-            raise FileUploadException("File not found or access denied")
-        
-        if file_record.status != FileStatus.UPLOADING:
-            raise FileUploadException("Upload is not in progress")
-        
-        if not file_record.upload_id:
-            raise FileUploadException("No active multipart upload for this file")
-        
-        if part_number < 1 or part_number > file_record.total_parts:
-            raise FileUploadException(f"Invalid part number. Must be between 1 and {file_record.total_parts}")
+        if part_number < 1 or part_number > upload.total_parts:
+            raise FileUploadException(f"Invalid part number. Must be between 1 and {upload.total_parts}")
         
         try:
             url = self.s3_client.generate_presigned_url(
@@ -435,7 +753,7 @@ class FileService:
                 Params={
                     'Bucket': settings.R2_BUCKET_NAME,
                     'Key': file_record.storage_key,
-                    'UploadId': file_record.upload_id,
+                    'UploadId': upload.upload_id,
                     'PartNumber': part_number
                 },
                 ExpiresIn=PRESIGNED_URL_EXPIRY
@@ -447,7 +765,7 @@ class FileService:
                 "expires_in": PRESIGNED_URL_EXPIRY
             }
             
-        except ClientError as e:
+        except _r2_error() as e:
             raise FileUploadException(f"Failed to generate presigned URL: {str(e)}")
 
     def mark_part_uploaded(
@@ -469,21 +787,20 @@ class FileService:
         Returns:
             Dict with uploaded_parts count
         """
-        file_record = self.get_file_by_id(file_id, user_id)
-        
-        if not file_record:
-            raise FileUploadException("File not found or access denied")
+        _, upload = self._get_active_upload(file_id, user_id)
         
-        if file_record.status != FileStatus.UPLOADING:
-            raise FileUploadException("Upload is not in progress")
+        if part_number < 1 or part_number > upload.total_parts:
+            raise FileUploadException(f"Invalid part number. Must be between 1 and {upload.total_parts}")
         
-        # Add the part to uploaded parts
-        file_record.add_uploaded_part(part_number, etag)
+        # A re-uploaded part replaces the earlier ETag
+        self.db.merge(UploadPart(upload_id=upload.id, part_number=part_number, etag=etag))
+        self.db.flush()
+        uploaded_parts = self.db.query(UploadPart).filter(UploadPart.upload_id == upload.id).count()
         self.db.commit()
         
         return {
-            "uploaded_parts": len(file_record.uploaded_parts),
-            "total_parts": file_record.total_parts
+            "uploaded_parts": uploaded_parts,
+            "total_parts": upload.total_parts
         }
 
     def complete_multipart_upload(
@@ -503,16 +820,7 @@ class FileService:
         Returns:
             Updated File object
         """
-        file_record = self.get_file_by_id(file_id, user_id)
-        
-        if not file_record:
-            raise FileUploadException("File not found or access denied")
-        
-        if file_record.status != FileStatus.UPLOADING:
-            raise FileUploadException("Upload is not in progress")
-        
-        if not file_record.upload_id:
-            raise FileUploadException("No active multipart upload for this file")
+        file_record, upload = self._get_active_upload(file_id, user_id)
         
         try:
             # Format parts for S3 API
@@ -525,23 +833,27 @@ class FileService:
             ]
             
             # Complete the multipart upload in R2
-            self.s3_client.complete_multipart_upload(
+            run_blocking(
+                self.s3_client.complete_multipart_upload,
                 Bucket=settings.R2_BUCKET_NAME,
                 Key=file_record.storage_key,
-                UploadId=file_record.upload_id,
+                UploadId=upload.upload_id,
                 MultipartUpload={'Parts': s3_parts}
             )
             
             # Update file status
             file_record.status = FileStatus.COMPLETED
-            file_record.upload_id = None  # Clear upload ID
+            upload.status = UploadStatus.COMPLETED
+            self.usage.file_added(user_id, file_record.folder_id, file_record.size)
+            self.changes.file_changed(user_id, file_record.id)
             self.db.commit()
+            record_upload(file_record.size, "multipart")
             
             return file_record
             
-        except ClientError as e:
-            file_record.status = FileStatus.FAILED
-            self.db.commit()
+        except _r2_error() as e:
+            # The upload stays in progress so the client can fix the part list and retry
+            self.db.rollback()
             raise FileUploadException(f"Failed to complete multipart upload: {str(e)}")
 
     def abort_multipart_upload(self, file_id: UUID, user_id: UUID) -> bool:
@@ -555,30 +867,25 @@ class FileService:
         Returns:
             True if successfully aborted
         """
-        file_record = self.get_file_by_id(file_id, user_id)
-        
-        if not file_record:
-            raise FileUploadException("File not found or access denied")
-        
-        if file_record.status != FileStatus.UPLOADING:
-            raise FileUploadException("No upload in progress to abort")
+        file_record, upload = self._get_active_upload(file_id, user_id, "No upload in progress to abort")
         
         try:
-            # Abort multipart upload in R2 if upload_id exists
-            if file_record.upload_id:
-                try:
-                    self.s3_client.abort_multipart_upload(
-                        Bucket=settings.R2_BUCKET_NAME,
-                        Key=file_record.storage_key,
-                        UploadId=file_record.upload_id
-                    )
-                except ClientError as e:
-                    # Log but continue - upload might have already been aborted
-                    print(f"Warning: Failed to abort multipart upload in R2: {str(e)}")
+            # Abort multipart upload in R2
+            try:
+                run_blocking(
+                    self.s3_client.abort_multipart_upload,
+                    Bucket=settings.R2_BUCKET_NAME,
+                    Key=file_record.storage_key,
+                    UploadId=upload.upload_id
+                )
+            except _r2_error() as e:
+                # Log but continue - upload might have already been aborted
+                print(f"Warning: Failed to abort multipart upload in R2: {str(e)}")
             
-            # Mark file as deleted/failed
-            file_record.status = FileStatus.FAILED
-            file_record.upload_id = None
+            # Tombstone the file, which also frees its name
+            file_record.status = FileStatus.DELETED
+            upload.status = UploadStatus.ABORTED
+            self.changes.file_deleted(user_id, file_record.id)
             self.db.commit()
             
             return True
@@ -603,13 +910,23 @@ class FileService:
         if not file_record:
             raise FileUploadException("File not found or access denied")
         
+        # The latest multipart upload of the file, if it had one
+        upload = self.db.query(Upload).filter(Upload.file_id == file_id).order_by(Upload.created_at.desc()).first()
+        part_numbers = []
+        if upload is not None:
+            part_numbers = [
+                number for (number,) in self.db.query(UploadPart.part_number)
+                .filter(UploadPart.upload_id == upload.id)
+                .order_by(UploadPart.part_number)
+            ]
+        
         return {
             "file_id": file_record.id,
-            "upload_id": file_record.upload_id,
+            "upload_id": upload.upload_id if upload is not None and upload.status == UploadStatus.INPROGRESS else None,
             "filename": file_record.name,
             "total_size": file_record.size,
-            "total_parts": file_record.total_parts or 0,
-            "uploaded_parts": file_record.get_uploaded_part_numbers(),
+            "total_parts": upload.total_parts if upload is not None else 0,
+            "uploaded_parts": part_numbers,
             "status": file_record.status
         }
 
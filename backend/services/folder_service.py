@@ -1,39 +1,66 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select, lambda_stmt, literal, null, cast, union_all, Integer, String
 from typing import Optional, List
 from datetime import datetime
 from uuid import UUID
 
 from models.folder import Folder
+from models.change import ChangeItemType, ChangeAction
+from services.usage_service import UsageService
+from services.change_service import ChangeService
+from core.cursor import encode_cursor, decode_cursor
+from core.listing import ContentSort, SortOrder, parse_sort_value, keyset_after
+from core.search import SearchMode, build_name_filter
+from core.naming import NameConflict, flush_or_conflict, add_with_free_name
+from core.lookup_cache import cached_lookup, remember, forget
+from core.tracing import traced_service
 from exceptions.exceptions import FileUploadException
 
 
+# Hot lookups are lambda statements: SQLAlchemy caches the built statement and its
+# compiled SQL per call site, so each call only binds new parameter values.
+def _folder_by_id_stmt(folder_id: UUID, user_id: UUID):
+    return lambda_stmt(lambda: select(Folder).where(Folder.id == folder_id, Folder.user_id == user_id))
+
+
+@traced_service
 class FolderService:
     def __init__(self, db: Session):
         self.db = db
+        self.usage = UsageService(db)
+        self.changes = ChangeService(db)
 
     def _build_path(self, folder: Folder) -> str:
-        """Build the full path for a folder by traversing up the parent chain"""
+        """Build the full path for a folder from its parent's stored path"""
         if folder.parent_folder_id is None:
             return f"/{folder.name}"
         
-        parent = self.db.query(Folder).filter(Folder.id == folder.parent_folder_id).first()
+        # Paths are rewritten parent first (see _update_path), so the parent's is current
+        parent = self.get_folder_by_id(folder.parent_folder_id, folder.user_id)
         if parent:
-            parent_path = self._build_path(parent)
-            return f"{parent_path}/{folder.name}"
+            return f"{parent.path}/{folder.name}"
         return f"/{folder.name}"
 
-    def _update_path(self, folder: Folder):
-        """Update the path for a folder and all its children"""
+    def _update_path(self, folder: Folder) -> List[UUID]:
+        """Update the path for a folder and all its children, returning the updated folder IDs"""
         folder.path = self._build_path(folder)
         self.db.flush()
+        updated_ids = [folder.id]
         
         # Recursively update children paths
         children = self.db.query(Folder).filter(Folder.parent_folder_id == folder.id).all()
         for child in children:
-            self._update_path(child)
+            remember(self.db, (Folder, child.id, child.user_id), child)
+            updated_ids.extend(self._update_path(child))
+        return updated_ids
 
-    def create_folder(self, user_id: UUID, name: str, parent_folder_id: Optional[UUID] = None) -> Folder:
+    def create_folder(
+        self,
+        user_id: UUID,
+        name: str,
+        parent_folder_id: Optional[UUID] = None,
+        on_conflict: NameConflict = NameConflict.ERROR
+    ) -> Folder:
         """
         Create a new folder.
         
@@ -41,39 +68,21 @@ class FolderService:
             user_id: ID of the user creating the folder
             name: Name of the folder
             parent_folder_id: Optional parent folder ID for nested folders
+            on_conflict: Fail if the name is taken, or create "name (1)" instead
             
         Returns:
             Created Folder object
         """
         # Validate parent folder exists and belongs to user
+        parent = None
         if parent_folder_id:
             parent = self.get_folder_by_id(parent_folder_id, user_id)
             if not parent:
                 raise FileUploadException("Parent folder not found or access denied")
         
-        # Check if folder with same name already exists in the same parent
-        existing = self.db.query(Folder).filter(
-            and_(
-                Folder.user_id == user_id,
-                Folder.name == name,
-                Folder.parent_folder_id == parent_folder_id
-            )
-        ).first()
-        
-        if existing:
-            raise FileUploadException(f"Folder '{name}' already exists in this location")
-        
         # Create folder with initial path to avoid null constraint violation
         # We'll calculate the proper path after flush when we have the folder ID
-        if parent_folder_id is None:
-            initial_path = f"/{name}"
-        else:
-            # Get parent path for initial calculation
-            parent = self.db.query(Folder).filter(Folder.id == parent_folder_id).first()
-            if parent:
-                initial_path = f"{parent.path}/{name}"
-            else:
-                initial_path = f"/{name}"
+        initial_path = f"{parent.path}/{name}" if parent else f"/{name}"
         
         folder = Folder(
             user_id=user_id,
@@ -82,21 +91,31 @@ class FolderService:
             path=initial_path  # Set initial path to avoid null constraint violation
         )
         
-        self.db.add(folder)
-        self.db.flush()
+        # The unique name indexes reject a taken name, so there is no lookup beforehand
+        if on_conflict == NameConflict.RENAME:
+            add_with_free_name(
+                self.db, folder, Folder.name,
+                [Folder.user_id == user_id, Folder.parent_folder_id == parent_folder_id],
+                keep_extension=False
+            )
+        else:
+            self.db.add(folder)
+            flush_or_conflict(self.db, FileUploadException(f"Folder '{name}' already exists in this location"))
+        remember(self.db, (Folder, folder.id, user_id), folder)
         
         # Build and set proper path (now that folder has an ID and can be referenced)
-        self._update_path(folder)
+        updated_ids = self._update_path(folder)
+        self.changes.folders_changed(user_id, updated_ids)
         self.db.commit()
         
         return folder
 
     def get_folder_by_id(self, folder_id: UUID, user_id: UUID) -> Optional[Folder]:
-        """Get a folder by ID, ensuring it belongs to the user"""
-        return self.db.query(Folder).filter(
-            Folder.id == folder_id,
-            Folder.user_id == user_id
-        ).first()
+        """Get a folder by ID, ensuring it belongs to the user; loaded at most once per request"""
+        return cached_lookup(
+            self.db, (Folder, folder_id, user_id),
+            lambda: self.db.execute(_folder_by_id_stmt(folder_id, user_id)).scalars().first()
+        )
 
     def get_user_folders(
         self,
@@ -150,16 +169,6 @@ class FolderService:
         
         result = []
         for folder in folders:
-            # Count files in this folder
-            from models.file import File, FileStatus
-            files_count = self.db.query(File).filter(
-                and_(
-                    File.folder_id == folder.id,
-                    File.status != FileStatus.DELETED,
-                    File.status != FileStatus.FAILED
-                )
-            ).count()
-            
             # Recursively get children
             children = self.get_folder_tree(user_id, folder.id)
             
@@ -168,7 +177,9 @@ class FolderService:
                 "name": folder.name,
                 "path": folder.path,
                 "parent_folder_id": folder.parent_folder_id,
-                "files_count": files_count,
+                "files_count": folder.files_count,
+                "total_files": folder.total_files,
+                "total_bytes": folder.total_bytes,
                 "children": children,
                 "created_at": folder.created_at,
                 "updated_at": folder.updated_at
@@ -176,6 +187,210 @@ class FolderService:
         
         return result
 
+    def get_folder_tree_rows(self, user_id: UUID, parent_folder_id: Optional[UUID] = None) -> List[dict]:
+        """
+        Same tree as get_folder_tree, built from one query over the needed columns.
+
+        Children keep get_folder_tree's name ordering. Dict keys follow the field
+        order of FolderTreeResponse so the result serializes to identical JSON.
+        
+        Args:
+            user_id: ID of the user
+            parent_folder_id: Optional parent folder ID to start from (None for root)
+            
+        Returns:
+            List of folder dictionaries with nested children
+        """
+        rows = self.db.query(
+            Folder.id,
+            Folder.name,
+            Folder.path,
+            Folder.parent_folder_id,
+            Folder.files_count,
+            Folder.total_files,
+            Folder.total_bytes
+        ).filter(Folder.user_id == user_id).order_by(Folder.name.asc()).all()
+
+        children = {}
+        for row in rows:
+            children.setdefault(row.parent_folder_id, []).append({
+                "id": row.id,
+                "name": row.name,
+                "path": row.path,
+                "parent_folder_id": row.parent_folder_id,
+                "children": [],
+                "files_count": row.files_count,
+                "total_files": row.total_files,
+                "total_bytes": row.total_bytes
+            })
+        for nodes in children.values():
+            for node in nodes:
+                node["children"] = children.get(node["id"], [])
+        return children.get(parent_folder_id, [])
+
+    def get_all_folder_rows(self, user_id: UUID, fields: List[str]) -> List[dict]:
+        """
+        Same list as get_all_folders, as plain dicts of the requested columns.
+
+        Dict keys follow the order of fields.
+        """
+        columns = [getattr(Folder, field) for field in fields]
+        rows = self.db.query(*columns).filter(Folder.user_id == user_id).all()
+        return [dict(zip(fields, row)) for row in rows]
+
+    def get_breadcrumbs(self, folder_id: UUID, user_id: UUID) -> List[dict]:
+        """
+        Get a folder's ancestry from the root level down to the folder itself.
+
+        Args:
+            folder_id: ID of the folder
+            user_id: ID of the user
+
+        Returns:
+            List of {id, name} dicts, empty if the folder is not found or not owned
+        """
+        chain = select(
+            Folder.id, Folder.name, Folder.parent_folder_id, literal(0).label("depth")
+        ).where(Folder.id == folder_id, Folder.user_id == user_id).cte("chain", recursive=True)
+        chain = chain.union_all(
+            select(Folder.id, Folder.name, Folder.parent_folder_id, chain.c.depth + 1)
+            .where(Folder.id == chain.c.parent_folder_id, Folder.user_id == user_id)
+        )
+        rows = self.db.execute(
+            select(chain.c.id, chain.c.name).order_by(chain.c.depth.desc())
+        ).all()
+        return [{"id": row.id, "name": row.name} for row in rows]
+
+    def get_folder_contents(
+        self,
+        user_id: UUID,
+        folder_id: Optional[UUID] = None,
+        sort: ContentSort = ContentSort.NAME,
+        order: SortOrder = SortOrder.ASC,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> dict:
+        """
+        List a folder's subfolders and completed files in one query.
+
+        Folders come before files; within each group rows are ordered by the sort
+        column and then by ID. Both groups are read with a single UNION ALL whose
+        arms each stop early on a (user, parent, sort column, id) index, and pages
+        continue from an opaque (kind, sort value, id) cursor.
+
+        Args:
+            user_id: ID of the user
+            folder_id: Folder to list (None for the root level)
+            sort: Sort by name, size or modified time
+            order: Ascending or descending
+            cursor: Opaque cursor from a previous page
+            limit: Maximum number of items to return
+
+        Returns:
+            Dict with breadcrumbs, items and next_cursor
+        """
+        from models.file import File, FileStatus
+
+        breadcrumbs = []
+        if folder_id is not None:
+            breadcrumbs = self.get_breadcrumbs(folder_id, user_id)
+            if not breadcrumbs:
+                raise FileUploadException("Folder not found or access denied")
+
+        folder_sort = {
+            ContentSort.NAME: Folder.name,
+            ContentSort.SIZE: Folder.total_bytes,
+            ContentSort.MODIFIED: Folder.updated_at
+        }[sort]
+        file_sort = {
+            ContentSort.NAME: File.name,
+            ContentSort.SIZE: File.size,
+            ContentSort.MODIFIED: File.updated_at
+        }[sort]
+
+        after_kind = None
+        after = decode_cursor(cursor, 3)
+        if after:
+            after_kind, after_value, after_id = after[0], parse_sort_value(sort, after[1]), UUID(after[2])
+
+        arms = []
+        if after_kind != 1:
+            folders = select(
+                literal(0).label("kind"),
+                Folder.id,
+                Folder.name,
+                Folder.total_bytes.label("size"),
+                cast(null(), String).label("mime"),
+                Folder.files_count,
+                Folder.total_files,
+                Folder.created_at,
+                Folder.updated_at,
+                folder_sort.label("sort_key")
+            ).where(
+                Folder.user_id == user_id,
+                Folder.parent_folder_id == folder_id if folder_id else Folder.parent_folder_id.is_(None)
+            )
+            if after_kind == 0:
+                folders = folders.where(keyset_after(folder_sort, Folder.id, after_value, after_id, order))
+            arms.append(self._limit_arm(folders, folder_sort, Folder.id, order, limit + 1))
+
+        files = select(
+            literal(1).label("kind"),
+            File.id,
+            File.name,
+            File.size,
+            File.mime,
+            cast(null(), Integer).label("files_count"),
+            cast(null(), Integer).label("total_files"),
+            File.created_at,
+            File.updated_at,
+            file_sort.label("sort_key")
+        ).where(
+            File.user_id == user_id,
+            File.folder_id == folder_id if folder_id else File.folder_id.is_(None),
+            File.status == FileStatus.COMPLETED
+        )
+        if after_kind == 1:
+            files = files.where(keyset_after(file_sort, File.id, after_value, after_id, order))
+        arms.append(self._limit_arm(files, file_sort, File.id, order, limit + 1))
+
+        contents = union_all(*(select(arm) for arm in arms)).subquery("contents")
+        sort_key = contents.c.sort_key.desc() if order == SortOrder.DESC else contents.c.sort_key.asc()
+        id_key = contents.c.id.desc() if order == SortOrder.DESC else contents.c.id.asc()
+        rows = self.db.execute(
+            select(contents).order_by(contents.c.kind.asc(), sort_key, id_key).limit(limit + 1)
+        ).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor([last.kind, last.sort_key, str(last.id)])
+
+        items = [
+            {
+                "type": "folder" if row.kind == 0 else "file",
+                "id": row.id,
+                "name": row.name,
+                "size": row.size,
+                "mime": row.mime,
+                "files_count": row.files_count,
+                "total_files": row.total_files,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at
+            }
+            for row in rows[:limit]
+        ]
+        return {"breadcrumbs": breadcrumbs, "items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _limit_arm(stmt, sort_column, id_column, order: SortOrder, limit: int):
+        """Order and limit one UNION arm inside a subquery so each arm stops early"""
+        if order == SortOrder.DESC:
+            stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+        else:
+            stmt = stmt.order_by(sort_column.asc(), id_column.asc())
+        return stmt.limit(limit).subquery()
+
     def update_folder(
         self,
         folder_id: UUID,
@@ -205,7 +420,7 @@ class FolderService:
                 raise FileUploadException("Cannot move folder into itself")
             
             # Check if new parent is a descendant
-            if self._is_descendant(folder_id, parent_folder_id):
+            if self._is_descendant(folder_id, parent_folder_id, user_id):
                 raise FileUploadException("Cannot move folder into its own descendant")
             
             # Validate new parent exists and belongs to user
@@ -213,31 +428,18 @@ class FolderService:
             if not new_parent:
                 raise FileUploadException("Parent folder not found or access denied")
         
-        # Check for name conflicts if name or parent is changing
-        if name or parent_folder_id is not None:
-            new_name = name if name else folder.name
-            new_parent_id = parent_folder_id if parent_folder_id is not None else folder.parent_folder_id
-            
-            existing = self.db.query(Folder).filter(
-                and_(
-                    Folder.user_id == user_id,
-                    Folder.name == new_name,
-                    Folder.parent_folder_id == new_parent_id,
-                    Folder.id != folder_id
-                )
-            ).first()
-            
-            if existing:
-                raise FileUploadException(f"Folder '{new_name}' already exists in this location")
-        
-        # Update folder
+        # Update folder; a taken name is rejected by the unique name indexes
         if name:
             folder.name = name
+        old_parent_id = folder.parent_folder_id
         if parent_folder_id is not None:
             folder.parent_folder_id = parent_folder_id
+        flush_or_conflict(self.db, FileUploadException(f"Folder '{folder.name}' already exists in this location"))
+        self.usage.folder_moved(folder, old_parent_id)
         
         # Update path for folder and all descendants
-        self._update_path(folder)
+        updated_ids = self._update_path(folder)
+        self.changes.folders_changed(user_id, updated_ids)
         self.db.commit()
         
         return folder
@@ -267,7 +469,7 @@ class FolderService:
         if parent_folder_id == folder_id:
             raise FileUploadException("Cannot move folder into itself")
         
-        if parent_folder_id and self._is_descendant(folder_id, parent_folder_id):
+        if parent_folder_id and self._is_descendant(folder_id, parent_folder_id, user_id):
             raise FileUploadException("Cannot move folder into its own descendant")
         
         # Validate new parent exists and belongs to user
@@ -276,39 +478,28 @@ class FolderService:
             if not new_parent:
                 raise FileUploadException("Parent folder not found or access denied")
         
-        # Check for name conflicts in the destination folder
-        existing = self.db.query(Folder).filter(
-            and_(
-                Folder.user_id == user_id,
-                Folder.name == folder.name,
-                Folder.parent_folder_id == parent_folder_id,
-                Folder.id != folder_id
-            )
-        ).first()
-        
-        if existing:
-            folder_name = "root"
-            if parent_folder_id:
-                parent = self.get_folder_by_id(parent_folder_id, user_id)
-                folder_name = parent.name if parent else "selected folder"
-            raise FileUploadException(f"Folder '{folder.name}' already exists in {folder_name}")
-        
-        # Update parent_folder_id (can be None)
+        # Update parent_folder_id (can be None); a taken name is rejected by the unique name indexes
+        old_parent_id = folder.parent_folder_id
         folder.parent_folder_id = parent_folder_id
+        flush_or_conflict(self.db, FileUploadException(
+            f"Folder '{folder.name}' already exists in {new_parent.name if parent_folder_id else 'root'}"
+        ))
+        self.usage.folder_moved(folder, old_parent_id)
         
         # Update path for folder and all descendants
-        self._update_path(folder)
+        updated_ids = self._update_path(folder)
+        self.changes.folders_changed(user_id, updated_ids)
         self.db.commit()
         
         return folder
 
-    def _is_descendant(self, ancestor_id: UUID, potential_descendant_id: UUID) -> bool:
+    def _is_descendant(self, ancestor_id: UUID, potential_descendant_id: UUID, user_id: UUID) -> bool:
         """Check if potential_descendant_id is a descendant of ancestor_id"""
-        current = self.db.query(Folder).filter(Folder.id == potential_descendant_id).first()
+        current = self.get_folder_by_id(potential_descendant_id, user_id)
         while current and current.parent_folder_id:
             if current.parent_folder_id == ancestor_id:
                 return True
-            current = self.db.query(Folder).filter(Folder.id == current.parent_folder_id).first()
+            current = self.get_folder_by_id(current.parent_folder_id, user_id)
         return False
 
     def delete_folder(self, folder_id: UUID, user_id: UUID, force: bool = False) -> bool:
@@ -335,8 +526,7 @@ class FolderService:
         files_count = self.db.query(File).filter(
             and_(
                 File.folder_id == folder_id,
-                File.status != FileStatus.DELETED,
-                File.status != FileStatus.FAILED
+                File.status != FileStatus.DELETED
             )
         ).count()
         
@@ -346,6 +536,7 @@ class FolderService:
                 "Use force=true to delete anyway."
             )
         
+        changed = []
         # If force is True, delete all children and files first
         if force:
             # Delete all child folders recursively
@@ -355,11 +546,21 @@ class FolderService:
             
             # Mark all files as deleted
             files = self.db.query(File).filter(File.folder_id == folder_id).all()
+            removed_files, removed_bytes = 0, 0
             for file in files:
+                if file.status == FileStatus.COMPLETED:
+                    removed_files += 1
+                    removed_bytes += file.size
+                if file.status != FileStatus.DELETED:
+                    changed.append((ChangeItemType.FILE, file.id, ChangeAction.DELETE))
                 file.status = FileStatus.DELETED
+            self.usage.apply_file_deltas(user_id, {folder_id: (-removed_files, -removed_bytes)})
         
         # Delete the folder
         self.db.delete(folder)
+        forget(self.db, (Folder, folder_id, user_id))
+        changed.append((ChangeItemType.FOLDER, folder.id, ChangeAction.DELETE))
+        self.changes.record(user_id, changed)
         self.db.commit()
         
         return True
@@ -382,6 +583,50 @@ class FolderService:
             )
         ).first()
     
+    def search_folders(
+        self,
+        user_id: UUID,
+        query: str,
+        mode: SearchMode = SearchMode.SUBSTRING,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> dict:
+        """
+        Search a user's folders by name across the whole tree.
+
+        Args:
+            user_id: ID of the user
+            query: Search text
+            mode: Prefix, substring or fuzzy matching
+            cursor: Opaque cursor from a previous page
+            limit: Maximum number of results to return
+
+        Returns:
+            Dict with items (Folder objects) and next_cursor
+        """
+        dialect_name = self.db.get_bind().dialect.name
+        stmt = self.db.query(Folder).filter(
+            Folder.user_id == user_id,
+            build_name_filter(Folder.name, query, mode, dialect_name)
+        )
+
+        after = decode_cursor(cursor, 2)
+        if after:
+            after_name, after_id = after[0], UUID(after[1])
+            stmt = stmt.filter(or_(
+                Folder.name > after_name,
+                and_(Folder.name == after_name, Folder.id > after_id)
+            ))
+
+        folders = stmt.order_by(Folder.name.asc(), Folder.id.asc()).limit(limit + 1).all()
+
+        next_cursor = None
+        if len(folders) > limit:
+            last = folders[limit - 1]
+            next_cursor = encode_cursor([last.name, str(last.id)])
+
+        return {"items": folders[:limit], "next_cursor": next_cursor}
+
     def get_all_folders(self, user_id: UUID) -> List[Folder]:
         """
         Get all folders for a user (flat list, no hierarchy).
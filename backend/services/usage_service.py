@@ -0,0 +1,212 @@
+from collections import defaultdict
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, func
+from typing import Optional
+from uuid import UUID
+
+from models.file import File, FileStatus
+from models.folder import Folder
+from models.usage import UserUsage
+from services.change_service import ChangeService
+
+
+class UsageService:
+    """
+    Maintains denormalized file counts and byte totals per folder and per user.
+
+    Every method issues atomic SQL increments inside the caller's transaction and
+    never commits, so counters change together with the mutation that caused them.
+    Only COMPLETED files are counted. reconcile_user recomputes everything from
+    the files table to repair drift.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def apply_file_deltas(self, user_id: UUID, deltas: dict) -> None:
+        """
+        Apply file count/byte changes for files added to or removed from folders.
+
+        Args:
+            user_id: Owner of the files
+            deltas: {folder_id (None for root): (file_delta, byte_delta)}
+        """
+        deltas = {fid: d for fid, d in deltas.items() if d[0] or d[1]}
+        if not deltas:
+            return
+
+        folder_deltas = {fid: d for fid, d in deltas.items() if fid is not None}
+        for (files, size), ids in self._group_by_delta(folder_deltas).items():
+            self.db.execute(
+                update(Folder)
+                .where(Folder.id.in_(ids))
+                .values(files_count=Folder.files_count + files)
+            )
+        self._apply_recursive(folder_deltas)
+
+        total_files = sum(d[0] for d in deltas.values())
+        total_bytes = sum(d[1] for d in deltas.values())
+        if total_files or total_bytes:
+            self._apply_user(user_id, total_files, total_bytes)
+
+    def file_added(self, user_id: UUID, folder_id: Optional[UUID], size: int) -> None:
+        """Count a newly completed file"""
+        self.apply_file_deltas(user_id, {folder_id: (1, size or 0)})
+
+    def file_removed(self, user_id: UUID, folder_id: Optional[UUID], size: int) -> None:
+        """Uncount a completed file that was deleted"""
+        self.apply_file_deltas(user_id, {folder_id: (-1, -(size or 0))})
+
+    def file_moved(self, user_id: UUID, size: int, old_folder_id: Optional[UUID], new_folder_id: Optional[UUID]) -> None:
+        """Move a completed file's contribution between folders"""
+        if old_folder_id == new_folder_id:
+            return
+        self.apply_file_deltas(user_id, {
+            old_folder_id: (-1, -(size or 0)),
+            new_folder_id: (1, size or 0)
+        })
+
+    def folder_moved(self, folder: Folder, old_parent_id: Optional[UUID]) -> None:
+        """Move a folder subtree's totals from its old ancestors to its new ones"""
+        new_parent_id = folder.parent_folder_id
+        if old_parent_id == new_parent_id:
+            return
+        files, size = folder.total_files or 0, folder.total_bytes or 0
+        deltas = {}
+        if old_parent_id is not None:
+            deltas[old_parent_id] = (-files, -size)
+        if new_parent_id is not None:
+            deltas[new_parent_id] = (files, size)
+        self._apply_recursive(deltas)
+
+    def get_user_usage(self, user_id: UUID) -> dict:
+        """Get a user's total file count and bytes"""
+        usage = self.db.get(UserUsage, user_id)
+        return {
+            "file_count": usage.file_count if usage else 0,
+            "total_bytes": usage.total_bytes if usage else 0
+        }
+
+    def reconcile_user(self, user_id: UUID) -> dict:
+        """
+        Recompute a user's counters from the files table and fix any drift.
+
+        Corrected folders are recorded in the change feed, which also bumps the
+        change version that listing ETags and cached responses are keyed on.
+
+        Args:
+            user_id: ID of the user
+
+        Returns:
+            Dict with folders_fixed count and whether user totals were fixed
+        """
+        # Lock the counters before counting, folders first and then usage like the
+        # mutation paths, so a concurrent file change either commits before the count
+        # sees it or waits and applies its increment on top of the corrected values
+        folders = self.db.query(Folder).filter(
+            Folder.user_id == user_id
+        ).order_by(Folder.id).with_for_update().populate_existing().all()
+        usage = self.db.get(UserUsage, user_id, with_for_update=True)
+
+        direct = defaultdict(lambda: (0, 0))
+        for folder_id, files, size in self.db.query(
+            File.folder_id, func.count(File.id), func.coalesce(func.sum(File.size), 0)
+        ).filter(
+            File.user_id == user_id,
+            File.status == FileStatus.COMPLETED
+        ).group_by(File.folder_id).all():
+            direct[folder_id] = (int(files), int(size))
+
+        children = defaultdict(list)
+        for folder in folders:
+            children[folder.parent_folder_id].append(folder)
+
+        # Post-order walk from the root level so each folder sums its children's totals
+        totals = {}
+        stack = [(folder, False) for folder in children[None]]
+        while stack:
+            folder, expanded = stack.pop()
+            if not expanded:
+                stack.append((folder, True))
+                stack.extend((child, False) for child in children[folder.id])
+                continue
+            files, size = direct[folder.id]
+            for child in children[folder.id]:
+                files += totals[child.id][0]
+                size += totals[child.id][1]
+            totals[folder.id] = (files, size)
+
+        fixed_ids = []
+        for folder in folders:
+            files_count = direct[folder.id][0]
+            total_files, total_bytes = totals.get(folder.id, direct[folder.id])
+            if (folder.files_count, folder.total_files, folder.total_bytes) != (files_count, total_files, total_bytes):
+                folder.files_count = files_count
+                folder.total_files = total_files
+                folder.total_bytes = total_bytes
+                fixed_ids.append(folder.id)
+        if fixed_ids:
+            # Listings embed the counters: a new change version expires their ETags and
+            # cached bodies, and sync clients pick the corrected folders up from the feed
+            ChangeService(self.db).folders_changed(user_id, fixed_ids)
+
+        user_files = sum(d[0] for d in direct.values())
+        user_bytes = sum(d[1] for d in direct.values())
+        user_fixed = usage is None or (usage.file_count, usage.total_bytes) != (user_files, user_bytes)
+        if usage is None:
+            self.db.add(UserUsage(user_id=user_id, file_count=user_files, total_bytes=user_bytes))
+        elif user_fixed:
+            usage.file_count = user_files
+            usage.total_bytes = user_bytes
+
+        self.db.commit()
+        return {"folders_fixed": len(fixed_ids), "user_fixed": user_fixed}
+
+    # Private helper methods
+    def _apply_recursive(self, deltas: dict) -> None:
+        """Add (files, bytes) deltas to each starting folder and all of its ancestors"""
+        deltas = {fid: d for fid, d in deltas.items() if fid is not None and (d[0] or d[1])}
+        if not deltas:
+            return
+
+        # One recursive query walks every starting folder's ancestor chain
+        chain = select(
+            Folder.id.label("origin"),
+            Folder.id.label("id"),
+            Folder.parent_folder_id.label("parent_id")
+        ).where(Folder.id.in_(deltas.keys())).cte("chain", recursive=True)
+        chain = chain.union_all(
+            select(chain.c.origin, Folder.id, Folder.parent_folder_id)
+            .where(Folder.id == chain.c.parent_id)
+        )
+
+        per_folder = defaultdict(lambda: [0, 0])
+        for origin, folder_id in self.db.execute(select(chain.c.origin, chain.c.id)).all():
+            per_folder[folder_id][0] += deltas[origin][0]
+            per_folder[folder_id][1] += deltas[origin][1]
+
+        for (files, size), ids in self._group_by_delta(per_folder).items():
+            self.db.execute(
+                update(Folder)
+                .where(Folder.id.in_(ids))
+                .values(total_files=Folder.total_files + files, total_bytes=Folder.total_bytes + size)
+            )
+
+    def _apply_user(self, user_id: UUID, files: int, size: int) -> None:
+        result = self.db.execute(
+            update(UserUsage)
+            .where(UserUsage.user_id == user_id)
+            .values(file_count=UserUsage.file_count + files, total_bytes=UserUsage.total_bytes + size)
+        )
+        if result.rowcount == 0:
+            # First counted file for this user; reconciliation repairs any race here
+            self.db.add(UserUsage(user_id=user_id, file_count=max(files, 0), total_bytes=max(size, 0)))
+
+    @staticmethod
+    def _group_by_delta(deltas: dict) -> dict:
+        """Group folder ids sharing the same delta so each distinct delta is one UPDATE"""
+        grouped = defaultdict(list)
+        for folder_id, (files, size) in deltas.items():
+            if files or size:
+                grouped[(files, size)].append(folder_id)
+        return grouped
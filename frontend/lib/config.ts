@@ -12,18 +12,32 @@ export const api = axios.create({
     },
 });
 
+// Time of our last write, as sent by the API; echoed back so reads that follow it
+// are served from the primary database rather than a lagging replica
+const LAST_WRITE_HEADER = 'x-last-write';
+let lastWrite: string | undefined;
+
 // Request interceptor: Add JWT token to requests
 api.interceptors.request.use((config: InternalAxiosRequestConfig) => {
     const token = Cookies.get('access_token');
     if (token && config.headers) {
         config.headers.Authorization = `Bearer ${token}`;
     }
+    if (lastWrite && config.headers) {
+        config.headers[LAST_WRITE_HEADER] = lastWrite;
+    }
     return config;
 });
 
-// Response interceptor: Handle 401 errors (unauthorized)
+// Response interceptor: Remember the last write and handle 401 errors (unauthorized)
 api.interceptors.response.use(
-    (response: AxiosResponse) => response,
+    (response: AxiosResponse) => {
+        const written = response.headers?.[LAST_WRITE_HEADER];
+        if (written) {
+            lastWrite = written;
+        }
+        return response;
+    },
     (error: AxiosError) => {
         if (error.response?.status === 401) {
             const requestUrl = error.config?.url || '';